@@ -0,0 +1 @@
+"""Benchmark harness: a fake Docker daemon and an endpoint runner."""
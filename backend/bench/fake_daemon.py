@@ -0,0 +1,666 @@
+"""
+Fake Docker Engine API served over a unix socket.
+
+Serves a synthetic inventory of containers, images, networks and volumes with
+the endpoints the backend uses: list and inspect, streaming stats, multiplexed
+logs, events, lifecycle actions and /system/df. Every request is counted per
+endpoint template, and latency can be injected to mimic a busy or remote
+daemon. Only the standard library is used.
+
+    python -m bench.fake_daemon --socket /tmp/docker.sock --containers 500
+    DOCKER_HOST=unix:///tmp/docker.sock uvicorn main:app
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+API_VERSION = '1.43'
+CREATED = '2024-03-20T10:00:00.000000000Z'
+CREATED_EPOCH = 1710928800
+ACTIONS = {'start', 'stop', 'restart', 'kill', 'pause', 'unpause'}
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def endpoint_template(method, path):
+    """Collapse ids and names so calls are counted per endpoint."""
+    path = re.sub(r'^/v[0-9.]+', '', path)
+    path = re.sub(r'^/(containers|networks|volumes)/(?!json$|create$|prune$)[^/]+', r'/\1/{id}', path)
+    path = re.sub(r'^/images/(?!json$|create$|prune$|search$).+?(/json|/history)?$', r'/images/{id}\1', path)
+    return f'{method} {path}'
+
+
+class FakeState:
+    """Synthetic daemon objects, shaped like the Engine API's inspect payloads."""
+
+    def __init__(self, containers=20, images=10, networks=2, volumes=5, running_ratio=0.75, seed=0):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.events = []
+        self.events_changed = threading.Condition(self.lock)
+
+        shared_layers = [f'sha256:{_digest(f"base-layer-{i}")}' for i in range(3)]
+        # Diff id -> size; images built on the same base share its layers
+        self.layer_sizes = {layer: rng.randint(5, 100) * 1024 * 1024 for layer in shared_layers}
+        self.images = {}
+        for i in range(images):
+            image_id = f'sha256:{_digest(f"image-{i}")}'
+            layers = shared_layers[:1 + i % 3] + [f'sha256:{_digest(f"image-layer-{i}")}']
+            self.layer_sizes[layers[-1]] = rng.randint(1, 400) * 1024 * 1024
+            self.images[image_id] = {
+                'Id': image_id,
+                # Every third image is untagged, like dangling build leftovers
+                'RepoTags': [f'image{i}:latest'] if i % 3 else [],
+                'RepoDigests': [],
+                'Parent': '',
+                'Created': CREATED,
+                'Size': sum(self.layer_sizes[layer] for layer in layers),
+                'Architecture': 'amd64',
+                'Os': 'linux',
+                'Author': '',
+                'Config': {'Labels': {'tier': f't{i % 4}'}},
+                'RootFS': {
+                    'Type': 'layers',
+                    'Layers': layers,
+                },
+            }
+
+        self.networks = {}
+        for i in range(max(networks, 1)):
+            name = 'bridge' if i == 0 else f'net{i}'
+            network_id = _digest(f'network-{name}')
+            self.networks[network_id] = {
+                'Id': network_id,
+                'Name': name,
+                'Created': CREATED,
+                'Scope': 'local',
+                'Driver': 'bridge',
+                'EnableIPv6': False,
+                'IPAM': {'Driver': 'default', 'Config': [{'Subnet': f'172.{18 + i % 200}.0.0/16'}]},
+                'Internal': False,
+                'Attachable': False,
+                'Options': {},
+                'Labels': {},
+                'Containers': {},
+            }
+
+        self.volumes = {}
+        for i in range(volumes):
+            name = f'volume{i}'
+            self.volumes[name] = {
+                'Name': name,
+                'Driver': 'local',
+                'Mountpoint': f'/var/lib/docker/volumes/{name}/_data',
+                'CreatedAt': CREATED,
+                'Labels': {},
+                'Scope': 'local',
+                'Options': {},
+            }
+
+        image_ids = list(self.images) or [f'sha256:{_digest("missing")}']
+        network_ids = list(self.networks)
+        volume_names = list(self.volumes)
+        self.containers = {}
+        for i in range(containers):
+            container_id = _digest(f'container-{i}')
+            name = f'container{i}'
+            running = rng.random() < running_ratio
+            image_id = image_ids[i % len(image_ids)]
+            image = self.images.get(image_id)
+            attached = {network_ids[0]} | ({network_ids[1 + i % (len(network_ids) - 1)]} if len(network_ids) > 1 else set())
+            networks_attrs = {}
+            for n, network_id in enumerate(sorted(attached)):
+                network = self.networks[network_id]
+                address = f'172.{18 + n}.{i // 250}.{i % 250 + 2}'
+                networks_attrs[network['Name']] = {
+                    'NetworkID': network_id,
+                    'IPAddress': address,
+                    'MacAddress': '02:42:ac:%02x:%02x:%02x' % (n, i // 250 % 256, i % 250),
+                }
+                if running:
+                    network['Containers'][container_id] = {
+                        'Name': name,
+                        'IPv4Address': f'{address}/16',
+                        'IPv6Address': '',
+                        'MacAddress': networks_attrs[network['Name']]['MacAddress'],
+                    }
+            mounts = []
+            if volume_names and i % 2 == 0:
+                volume = self.volumes[volume_names[i % len(volume_names)]]
+                mounts.append({
+                    'Type': 'volume', 'Name': volume['Name'], 'Source': volume['Mountpoint'],
+                    'Destination': '/data', 'Driver': 'local', 'RW': True,
+                })
+            self.containers[container_id] = {
+                'Id': container_id,
+                'Name': f'/{name}',
+                'Image': image_id,
+                'Created': CREATED,
+                'State': self._state('running' if running else 'exited'),
+                'Config': {
+                    'Image': (image['RepoTags'] or [image_id])[0] if image else image_id,
+                    'Labels': {'app': f'app{i % 5}', 'com.example.team': f'team{i % 3}'},
+                    'Tty': False,
+                },
+                'HostConfig': {'NetworkMode': 'bridge'},
+                'Mounts': mounts,
+                'NetworkSettings': {
+                    'Ports': {
+                        '80/tcp': [{'HostIp': '0.0.0.0', 'HostPort': str(20000 + i)}] if running else None,
+                        '443/tcp': None,
+                    },
+                    'Networks': networks_attrs,
+                },
+            }
+
+    @staticmethod
+    def _state(status):
+        return {
+            'Status': status,
+            'Running': status in ('running', 'paused'),
+            'Paused': status == 'paused',
+            'Restarting': False,
+            'Dead': False,
+            'ExitCode': 0,
+            'StartedAt': CREATED,
+        }
+
+    def find(self, collection, ref):
+        """Look an object up by id, unique id prefix, name or tag."""
+        if ref in collection:
+            return collection[ref]
+        ref = ref.lstrip('/')
+        for key, attrs in collection.items():
+            if key.startswith(ref) or key.startswith(f'sha256:{ref}'):
+                return attrs
+            if (attrs.get('Name') or '').lstrip('/') == ref or ref in (attrs.get('RepoTags') or ()):
+                return attrs
+        return None
+
+    def container_summary(self, attrs):
+        ports = []
+        for spec, bindings in (attrs['NetworkSettings']['Ports'] or {}).items():
+            port, proto = spec.split('/')
+            if bindings:
+                for binding in bindings:
+                    ports.append({'IP': binding['HostIp'], 'PrivatePort': int(port),
+                                  'PublicPort': int(binding['HostPort']), 'Type': proto})
+            else:
+                ports.append({'PrivatePort': int(port), 'Type': proto})
+        state = attrs['State']
+        return {
+            'Id': attrs['Id'],
+            'Names': [attrs['Name']],
+            'Image': attrs['Config']['Image'],
+            'ImageID': attrs['Image'],
+            'Command': 'sleep infinity',
+            'Created': CREATED_EPOCH,
+            'Ports': ports,
+            'Labels': attrs['Config']['Labels'],
+            'State': state['Status'],
+            'Status': 'Up 1 hour' if state['Running'] else 'Exited (0) 1 hour ago',
+            'HostConfig': attrs['HostConfig'],
+            'NetworkSettings': {'Networks': attrs['NetworkSettings']['Networks']},
+            'Mounts': attrs['Mounts'],
+        }
+
+    def emit(self, kind, action, actor_id, attributes=None):
+        with self.events_changed:
+            self.events.append({
+                'Type': kind,
+                'Action': action,
+                'Actor': {'ID': actor_id, 'Attributes': attributes or {}},
+                'time': int(time.time()),
+                'timeNano': time.time_ns(),
+            })
+            self.events_changed.notify_all()
+
+    def apply_action(self, attrs, action):
+        with self.lock:
+            status = {'start': 'running', 'restart': 'running', 'unpause': 'running', 'pause': 'paused'}.get(action, 'exited')
+            attrs['State'] = self._state(status)
+        self.emit('container', {'stop': 'die', 'kill': 'die'}.get(action, action), attrs['Id'],
+                  {'name': attrs['Name'].lstrip('/')})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # One stats stream per running container plus bursts of actions
+    request_queue_size = 1024
+
+
+class FakeDaemon:
+    """A fake Engine API on `socket_path`, run in a background thread.
+
+    `latency` (seconds, plus up to `jitter` more) is added to every request;
+    streaming stats emit a frame every `stats_interval` seconds and container
+    logs have `log_lines` lines, `log_interval` seconds apart and ending when
+    the daemon was created, so a log reads the same every time.
+    """
+
+    def __init__(self, socket_path, state=None, latency=0.0, jitter=0.0, stats_interval=1.0, log_lines=200,
+                 log_interval=1.0):
+        self.socket_path = socket_path
+        self.state = state or FakeState()
+        self.latency = latency
+        self.jitter = jitter
+        self.stats_interval = stats_interval
+        self.log_lines = log_lines
+        self.log_interval = log_interval
+        self.log_start = time.time() - log_lines * log_interval
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+        # Bumped by drop_events()
+        self.events_epoch = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'unix://{self.socket_path}'
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        daemon = self
+
+        class Handler(_Handler):
+            fake = daemon
+
+        self._server = _Server(self.socket_path, Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-daemon', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def count(self, method, path):
+        key = endpoint_template(method, path)
+        with self._calls_lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+    def calls(self):
+        with self._calls_lock:
+            return dict(self._calls)
+
+    def reset_calls(self):
+        """Clear the call counts; return them as they were."""
+        with self._calls_lock:
+            calls, self._calls = self._calls, {}
+            return calls
+
+    def drop_events(self):
+        """End every open event stream, as a daemon restart or network blip would."""
+        state = self.state
+        with state.events_changed:
+            self.events_epoch += 1
+            state.events_changed.notify_all()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.random() * self.jitter)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        return 'unix'
+
+    # Responses
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status=204):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def not_found(self, message):
+        self.send_json({'message': message}, 404)
+
+    def start_stream(self, content_type='application/json'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b'0\r\n\r\n')
+
+    # Dispatch
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_HEAD(self):
+        self.dispatch('HEAD')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        path = re.sub(r'^/v[0-9.]+', '', url.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.fake.count(method, path)
+        self.fake.delay()
+        try:
+            self.route(method, path, query)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def route(self, method, path, query):
+        state = self.fake.state
+        if path == '/_ping':
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            if method != 'HEAD':
+                self.wfile.write(b'OK')
+            return
+        if path == '/version':
+            return self.send_json({'ApiVersion': API_VERSION, 'MinAPIVersion': '1.12', 'Version': '24.0.0',
+                                   'Os': 'linux', 'Arch': 'amd64'})
+        if path == '/info':
+            return self.send_json({'Containers': len(state.containers), 'Images': len(state.images),
+                                   'ServerVersion': '24.0.0', 'NCPU': os.cpu_count()})
+        if path == '/events':
+            return self.events(query)
+        if path == '/system/df':
+            # `type` repeats, so it isn't in the single-valued query
+            return self.disk_usage(parse_qs(urlsplit(self.path).query).get('type'))
+
+        if path == '/containers/json':
+            return self.list_containers(query)
+        match = re.match(r'^/containers/([^/]+)(/[a-z]+)?$', path)
+        if match:
+            return self.container(method, match.group(1), match.group(2) or '', query)
+
+        if path == '/images/json':
+            return self.send_json([
+                {'Id': image['Id'], 'ParentId': '', 'RepoTags': image['RepoTags'], 'RepoDigests': [],
+                 'Created': CREATED_EPOCH, 'Size': image['Size'], 'SharedSize': -1,
+                 'Labels': image['Config']['Labels'], 'Containers': -1}
+                for image in list(state.images.values())
+            ])
+        match = re.match(r'^/images/(.+?)(/json|/history)?$', path)
+        if match:
+            image = state.find(state.images, match.group(1))
+            if image is None:
+                return self.not_found(f'No such image: {match.group(1)}')
+            if match.group(2) == '/history':
+                # Newest first, one entry per layer plus a metadata-only step
+                layers = image['RootFS']['Layers']
+                return self.send_json([
+                    {'Id': image['Id'], 'Created': CREATED_EPOCH, 'CreatedBy': '/bin/sh -c #(nop)  CMD ["app"]',
+                     'Tags': image['RepoTags'], 'Size': 0, 'Comment': ''},
+                ] + [
+                    {'Id': '<missing>', 'Created': CREATED_EPOCH, 'CreatedBy': f'/bin/sh -c layer {n}',
+                     'Tags': None, 'Size': state.layer_sizes[layers[n]], 'Comment': ''}
+                    for n in reversed(range(len(layers)))
+                ])
+            return self.send_json(image)
+
+        if path == '/networks':
+            # The list payload doesn't include attached containers
+            return self.send_json([dict(network, Containers={}) for network in list(state.networks.values())])
+        match = re.match(r'^/networks/([^/]+)$', path)
+        if match:
+            network = state.find(state.networks, match.group(1))
+            return self.send_json(network) if network else self.not_found(f'network {match.group(1)} not found')
+
+        if path == '/volumes':
+            return self.send_json({'Volumes': list(state.volumes.values()), 'Warnings': None})
+        match = re.match(r'^/volumes/([^/]+)$', path)
+        if match:
+            volume = state.volumes.get(match.group(1))
+            return self.send_json(volume) if volume else self.not_found(f'get {match.group(1)}: no such volume')
+
+        self.not_found(f'page not found: {path}')
+
+    # Handlers
+
+    def list_containers(self, query):
+        state = self.fake.state
+        filters = json.loads(query.get('filters') or '{}')
+        show_all = query.get('all') in ('1', 'true', 'True')
+        rows = []
+        for attrs in list(state.containers.values()):
+            if not show_all and not attrs['State']['Running']:
+                continue
+            if 'id' in filters and not any(attrs['Id'].startswith(ref) for ref in filters['id']):
+                continue
+            if 'name' in filters and not any(ref.lstrip('/') in attrs['Name'] for ref in filters['name']):
+                continue
+            if 'status' in filters and attrs['State']['Status'] not in filters['status']:
+                continue
+            rows.append(state.container_summary(attrs))
+        self.send_json(rows)
+
+    def container(self, method, ref, action, query):
+        state = self.fake.state
+        attrs = state.find(state.containers, ref)
+        if attrs is None:
+            return self.not_found(f'No such container: {ref}')
+        if method == 'DELETE' and not action:
+            with state.lock:
+                state.containers.pop(attrs['Id'], None)
+            state.emit('container', 'destroy', attrs['Id'], {'name': attrs['Name'].lstrip('/')})
+            return self.send_empty()
+        if action == '/json':
+            return self.send_json(attrs)
+        if action == '/stats':
+            return self.stats(attrs, query)
+        if action == '/logs':
+            return self.logs(query)
+        if method == 'POST' and action[1:] in ACTIONS:
+            state.apply_action(attrs, action[1:])
+            return self.send_empty()
+        self.not_found(f'page not found: {action}')
+
+    def stats(self, attrs, query):
+        seed = int(attrs['Id'][:6], 16)
+
+        def frame(n):
+            return {
+                'read': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'cpu_stats': {'cpu_usage': {'total_usage': (seed % 50 + 1) * 1000 * n},
+                              'system_cpu_usage': 200000 * n, 'online_cpus': 2},
+                'precpu_stats': {'cpu_usage': {'total_usage': (seed % 50 + 1) * 1000 * (n - 1)},
+                                 'system_cpu_usage': 200000 * (n - 1)},
+                'memory_stats': {'usage': (seed % 512 + 16) * 1024 * 1024, 'limit': 2 * 1024 ** 3},
+                'networks': {'eth0': {'rx_bytes': 1500 * n, 'tx_bytes': 700 * n}},
+                'blkio_stats': {'io_service_bytes_recursive': [
+                    {'op': 'Read', 'value': 4096 * n}, {'op': 'Write', 'value': 8192 * n},
+                ]},
+            }
+
+        if query.get('stream') in ('0', 'false', 'False'):
+            return self.send_json(frame(2))
+        self.start_stream()
+        n = 1
+        try:
+            while attrs['State']['Running']:
+                self.write_chunk(json.dumps(frame(n)).encode('utf-8') + b'\n')
+                n += 1
+                time.sleep(self.fake.stats_interval)
+            self.end_stream()
+        except OSError:
+            pass
+
+    def logs(self, query):
+        fake = self.fake
+        interval = fake.log_interval
+        since = float(query.get('since') or 0)
+        until = float(query.get('until') or 0)
+        tail = query.get('tail', 'all')
+        # Line n was written at log_start + n * interval; generated as it's sent
+        first = max(0, math.ceil((since - fake.log_start) / interval)) if since else 0
+        last = fake.log_lines
+        if until:
+            last = max(first, min(last, math.floor((until - fake.log_start) / interval) + 1))
+        if tail != 'all':
+            first = max(first, last - int(tail))
+        timestamps = query.get('timestamps') in ('1', 'true', 'True')
+
+        def encode(n, at):
+            word = 'panic' if n % 100003 == 50000 else 'error' if n % 7 == 0 else 'ok'
+            text = f'line {n} {word} request served in {n % 100}ms\n'
+            if timestamps:
+                stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(at)) + '.%09dZ' % int(at % 1 * 1e9)
+                text = f'{stamp} {text}'
+            data = text.encode('utf-8')
+            return struct.pack('>BxxxL', 2 if n % 5 == 0 else 1, len(data)) + data
+
+        self.start_stream('application/vnd.docker.raw-stream')
+        try:
+            frames = []
+            size = 0
+            for n in range(first, last):
+                frames.append(encode(n, fake.log_start + n * interval))
+                size += len(frames[-1])
+                if size >= 65536:
+                    self.write_chunk(b''.join(frames))
+                    frames = []
+                    size = 0
+            if frames:
+                self.write_chunk(b''.join(frames))
+            n = fake.log_lines
+            while query.get('follow') in ('1', 'true', 'True'):
+                time.sleep(0.5)
+                self.write_chunk(encode(n, time.time()))
+                n += 1
+            self.end_stream()
+        except OSError:
+            pass
+
+    def events(self, query):
+        state = self.fake.state
+        until = float(query.get('until') or 0)
+        epoch = self.fake.events_epoch
+        self.start_stream()
+        with state.lock:
+            position = len(state.events)
+        try:
+            while (not until or time.time() < until) and self.fake.events_epoch == epoch:
+                with state.events_changed:
+                    state.events_changed.wait(0.5)
+                    new = state.events[position:]
+                    position = len(state.events)
+                for event in new:
+                    self.write_chunk(json.dumps(event).encode('utf-8') + b'\n')
+            self.end_stream()
+        except OSError:
+            pass
+
+    def disk_usage(self, types=None):
+        state = self.fake.state
+        users = {}
+        for attrs in state.containers.values():
+            users[attrs['Image']] = users.get(attrs['Image'], 0) + 1
+        volume_users = {}
+        for attrs in state.containers.values():
+            for mount in attrs['Mounts']:
+                if mount.get('Type') == 'volume':
+                    volume_users[mount['Name']] = volume_users.get(mount['Name'], 0) + 1
+        layer_users = {}
+        for image in state.images.values():
+            for layer in image['RootFS']['Layers']:
+                layer_users[layer] = layer_users.get(layer, 0) + 1
+        df = {
+            'LayersSize': sum(state.layer_sizes[layer] for layer in layer_users),
+            'Images': [
+                {'Id': image['Id'], 'ParentId': '', 'RepoTags': image['RepoTags'], 'RepoDigests': [],
+                 'Created': CREATED_EPOCH, 'Size': image['Size'],
+                 'SharedSize': sum(state.layer_sizes[layer] for layer in image['RootFS']['Layers'] if layer_users[layer] > 1),
+                 'Labels': image['Config']['Labels'], 'Containers': users.get(image['Id'], 0)}
+                for image in state.images.values()
+            ],
+            'Containers': [
+                dict(state.container_summary(attrs), SizeRw=4096, SizeRootFs=(state.images.get(attrs['Image']) or {}).get('Size', 0))
+                for attrs in state.containers.values()
+            ],
+            'Volumes': [
+                dict(volume, UsageData={'Size': 1024 * 1024 * (n + 1), 'RefCount': volume_users.get(volume['Name'], 0)})
+                for n, volume in enumerate(state.volumes.values())
+            ],
+            'BuildCache': [
+                {'ID': _digest(f'cache-{n}')[:25], 'Type': 'regular', 'Size': 1024 * 1024 * (n + 1),
+                 'Shared': n % 2 == 0, 'InUse': False, 'CreatedAt': CREATED, 'LastUsedAt': CREATED, 'UsageCount': n}
+                for n in range(3)
+            ],
+        }
+        if types:
+            # API 1.42+: only the requested sections
+            sections = {'image': ('LayersSize', 'Images'), 'container': ('Containers',), 'volume': ('Volumes',),
+                        'build-cache': ('BuildCache',)}
+            df = {key: df[key] for kind in types for key in sections.get(kind, ())}
+        self.send_json(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a fake Docker Engine API on a unix socket.')
+    parser.add_argument('--socket', default='/tmp/dockeranium-bench.sock')
+    parser.add_argument('--containers', type=int, default=20)
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--networks', type=int, default=2)
+    parser.add_argument('--volumes', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds, at random')
+    parser.add_argument('--stats-interval', type=float, default=1.0)
+    parser.add_argument('--log-lines', type=int, default=200)
+    args = parser.parse_args()
+
+    state = FakeState(args.containers, args.images, args.networks, args.volumes)
+    daemon = FakeDaemon(args.socket, state, args.latency, args.jitter, args.stats_interval, args.log_lines).start()
+    print(f'Serving {len(state.containers)} containers, {len(state.images)} images, '
+          f'{len(state.networks)} networks and {len(state.volumes)} volumes on {daemon.url}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,661 @@
+"""
+Benchmark every API endpoint against a fake Docker daemon.
+
+Starts `bench.fake_daemon` in-process and the API under uvicorn in a
+subprocess pointed at it, then drives each endpoint with concurrent
+keep-alive clients and reports throughput, p50/p99 latency, Docker daemon
+calls per request and the server's RSS. GET routes found in the API's
+OpenAPI schema but missing from `ENDPOINTS` are listed, so new routes don't
+go unmeasured. Run from the backend directory:
+
+    python -m bench.run --containers 2000 --images 500 --concurrency 16
+    python -m bench.run --latency 0.005 --max-calls 2 --json results.json
+
+With `--max-calls`, the run fails when an endpoint averages more daemon calls
+per request than allowed, which catches N+1 regressions.
+
+Other scenarios are picked with `--scenario`:
+
+    # Log search over ~5 GB of synthetic log: full scan, then a cold and a
+    # warm indexed search, each with time to first match and total time
+    python -m bench.run --scenario log-search --log-bytes 5368709120
+
+    # /api/containers p99 alone and while the stats endpoints are hammered
+    # from another process; fails unless it stays within --max-slowdown of
+    # idle, or --max-p99-ms on machines with fewer than 3 CPUs
+    python -m bench.run --scenario stats-load --containers 500
+
+    # Image endpoints at --containers/--images and at --scale times that;
+    # fails unless daemon calls per request, and those of the initial load
+    # and a resync, are the same at both sizes
+    python -m bench.run --scenario image-scaling --containers 200 --images 150 --scale 10
+
+    # Daemon calls per request against CALL_BUDGETS, and --max-calls if given,
+    # at two sizes; load and resync calls must not grow with the inventory
+    python -m bench.run --scenario call-counts --containers 2000 --max-calls 1
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import psutil
+
+from bench.fake_daemon import FakeDaemon, FakeState
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Paths to measure, with route parameters filled in from the fake inventory.
+# Streaming and WebSocket routes are left out.
+ENDPOINTS = [
+    '/api/containers',
+    '/api/containers?sort=name&limit=50',
+    '/api/containers?label=app=app1&fields=id,name,status',
+    '/api/containers/running',
+    '/api/containers/stats',
+    '/api/containers/{container_id}',
+    '/api/containers/{container_id}/logs?tail=100',
+    '/api/containers/{container_id}/logs/search?q=error&limit=100',
+    '/api/images',
+    '/api/images/unused',
+    '/api/images/layers',
+    '/api/images/{image_id}',
+    '/api/networks',
+    '/api/networks/{network_id}',
+    '/api/networks/{network_id}/disconnected',
+    '/api/volumes',
+    '/api/volumes/usage?limit=50',
+    '/api/ports',
+    '/api/ports/owner?port=20000',
+    '/api/ports/free?count=10',
+    '/api/ports/conflicts',
+    '/api/stats',
+    '/api/live/stats',
+    '/api/metrics/history',
+    '/api/metrics/history?ids={container_id}',
+    '/api/system/executor',
+    '/api/system/http-cache',
+    '/api/system/coalescing',
+    '/api/system/stats',
+    '/api/system/df',
+    '/api/health/live',
+    '/api/health/ready',
+    '/api/_debug/perf',
+    '/api/_debug/profile',
+    '/metrics',
+]
+
+# Daemon calls that are long-lived streams rather than per-request work: the
+# event stream and the stats collector's per-container subscriptions
+BACKGROUND_CALLS = {'GET /events', 'GET /containers/{id}/stats'}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Server:
+    """The API under uvicorn in a subprocess, talking to the fake daemon."""
+
+    def __init__(self, docker_url, port, env=None):
+        self.port = port
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+             '--port', str(port), '--log-level', 'warning'],
+            cwd=BACKEND_DIR,
+            env={**os.environ, 'DOCKER_HOST': docker_url, 'DOCKER_HOSTS': '', **(env or {})},
+        )
+        self.psutil = psutil.Process(self.process.pid)
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'Server exited with status {self.process.returncode}')
+            try:
+                status, _ = self.get('/api/health/ready')
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError('Server did not become ready')
+
+    def get(self, path, connection=None):
+        return request(self.port, path, connection)
+
+    def rss(self):
+        return self.psutil.memory_info().rss
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def request(port, path, connection=None):
+    own = connection is None
+    connection = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+        response = connection.getresponse()
+        body = response.read()
+        return response.status, body
+    finally:
+        if own:
+            connection.close()
+
+
+def wait_idle(daemon, quiet=1.0, timeout=300, after=None):
+    """Wait until startup work, like the image history fill, stops calling the daemon.
+
+    Stats subscriptions count too: the history fill only starts once the
+    inventory is loaded, while the collector is still opening streams. With
+    `after`, a call to that endpoint must be seen first. Returns the calls
+    made since the counts were last reset, by endpoint.
+    """
+    total = daemon.reset_calls()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(quiet)
+        window = daemon.reset_calls()
+        for key, count in window.items():
+            total[key] = total.get(key, 0) + count
+        if (after is None or after in total) and set(window) <= {'GET /events'}:
+            return total
+    raise RuntimeError(f'Server still calling the daemon after {timeout}s')
+
+
+def measure(server, daemon, path, requests, concurrency):
+    """Run `requests` GETs of `path` over `concurrency` connections."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        own = []
+        try:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+                started = time.perf_counter()
+                try:
+                    status, _ = server.get(path, connection)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+                    status = 'error'
+                own.append((time.perf_counter() - started, status))
+        finally:
+            connection.close()
+        with lock:
+            for elapsed, status in own:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    daemon.reset_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+    calls = {key: count for key, count in daemon.calls().items() if key not in BACKGROUND_CALLS}
+
+    return {
+        'path': path,
+        'requests': len(latencies),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 0.5) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+        'daemon_calls': sum(calls.values()),
+        'daemon_calls_per_request': round(sum(calls.values()) / len(latencies), 2) if latencies else 0.0,
+        'daemon_endpoints': calls,
+        'rss_mb': round(server.rss() / 1024 / 1024, 1),
+    }
+
+
+def uncovered_routes(server):
+    status, body = server.get('/openapi.json')
+    if status != 200:
+        return []
+    schema = json.loads(body)
+    measured = {path.split('?')[0] for path in ENDPOINTS}
+    return sorted(
+        path for path, operations in schema.get('paths', {}).items()
+        if 'get' in operations and path not in measured
+    )
+
+
+def run_endpoints(args):
+    """Measure every endpoint in `ENDPOINTS`; False when one is over --max-calls."""
+    state = FakeState(args.containers, args.images, args.networks, args.volumes)
+    daemon = FakeDaemon(args.socket, state, args.latency, args.jitter, log_lines=args.log_lines).start()
+    running = next(attrs for attrs in state.containers.values() if attrs['State']['Running'])
+    names = {
+        'container_id': running['Name'].lstrip('/'),
+        'image_id': quote(next((image['RepoTags'][0] for image in state.images.values() if image['RepoTags']),
+                            next(iter(state.images), 'none')), safe=':'),
+        'network_id': next((network['Name'] for network in state.networks.values() if network['Name'] != 'bridge'), 'bridge'),
+    }
+
+    server = Server(daemon.url, _free_port())
+    failed = False
+    try:
+        server.wait_ready()
+        time.sleep(args.warmup)
+        rss_start = server.rss()
+        print(f'{len(state.containers)} containers, {len(state.images)} images, {len(state.networks)} networks, '
+              f'{len(state.volumes)} volumes; daemon latency {args.latency * 1000:g}ms; '
+              f'{args.requests} requests per endpoint at concurrency {args.concurrency}')
+        print(f'RSS after startup: {rss_start / 1024 / 1024:.1f} MB\n')
+        header = f'{"endpoint":<62} {"status":<12} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"calls/req":>9} {"RSS MB":>7}'
+        print(header)
+        print('-' * len(header))
+
+        filters = [f for f in (args.only or '').split(',') if f]
+        results = []
+        for template in ENDPOINTS:
+            path = template.format(**names)
+            if filters and not any(f in path for f in filters):
+                continue
+            result = measure(server, daemon, path, args.requests, args.concurrency)
+            results.append(result)
+            statuses = ','.join(f'{status}x{count}' for status, count in result['statuses'].items())
+            over = args.max_calls is not None and result['daemon_calls_per_request'] > args.max_calls
+            failed = failed or over
+            print(f'{template[:62]:<62} {statuses[:12]:<12} {result["throughput"]:>8} {result["p50_ms"]:>8} '
+                  f'{result["p99_ms"]:>8} {result["daemon_calls_per_request"]:>9} {result["rss_mb"]:>7}'
+                  + ('  <-- over --max-calls' if over else ''))
+
+        missing = uncovered_routes(server)
+        if missing:
+            print(f'\nGET routes not benchmarked: {", ".join(missing)}')
+        rss_end = server.rss()
+        print(f'\nRSS at end: {rss_end / 1024 / 1024:.1f} MB')
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({
+                    'config': vars(args),
+                    'rss_start': rss_start,
+                    'rss_end': rss_end,
+                    'results': results,
+                    'uncovered': missing,
+                }, f, indent=2)
+    finally:
+        server.stop()
+        daemon.stop()
+    return not failed
+
+
+def timed_search(server, path):
+    """Stream an NDJSON search; return (matches, seconds to first match, total seconds)."""
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=3600)
+    started = time.perf_counter()
+    first = None
+    matches = 0
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f'{path} returned {response.status}: {response.read()[:200]!r}')
+        for line in response:
+            if line.strip():
+                matches += 1
+                if first is None:
+                    first = time.perf_counter() - started
+    finally:
+        connection.close()
+    return matches, first, time.perf_counter() - started
+
+
+def run_log_search(args):
+    """Search one container's `--log-bytes` log: scan, cold index, warm index."""
+    # A fake log line with its timestamp and frame header is about 80 bytes
+    lines = max(1, args.log_bytes // 80)
+    state = FakeState(2, 1, 1, 0)
+    daemon = FakeDaemon(args.socket, state, args.latency, args.jitter, log_lines=lines,
+                        log_interval=args.log_span / lines).start()
+    container = next(attrs for attrs in state.containers.values() if attrs['State']['Running'])
+    index_dir = tempfile.mkdtemp(prefix='dockeranium-bench-index-')
+    server = Server(daemon.url, _free_port(), env={
+        'LOG_INDEX_DIR': index_dir,
+        'LOG_INDEX_MAX_BYTES': str(args.log_bytes * 2),
+    })
+    path = f'/api/containers/{container["Name"].lstrip("/")}/logs/search?q=panic&limit=0'
+    results = []
+    try:
+        server.wait_ready()
+        print(f'{lines} log lines (~{args.log_bytes / 1024 ** 3:.2f} GB) over {args.log_span / 3600:g}h; '
+              f'query "panic" matches about one line in 100003\n')
+        header = f'{"run":<14} {"matches":>8} {"first match s":>14} {"total s":>9} {"RSS MB":>7}'
+        print(header)
+        print('-' * len(header))
+        for name, query in (('scan', '&index=false'), ('index (cold)', ''), ('index (warm)', '')):
+            matches, first, total = timed_search(server, path + query)
+            result = {
+                'run': name,
+                'matches': matches,
+                'first_match_s': round(first, 3) if first is not None else None,
+                'total_s': round(total, 3),
+                'rss_mb': round(server.rss() / 1024 / 1024, 1),
+            }
+            results.append(result)
+            first = f'{result["first_match_s"]:.3f}' if first is not None else '-'
+            print(f'{name:<14} {matches:>8} {first:>14} {result["total_s"]:>9.3f} {result["rss_mb"]:>7}')
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'config': vars(args), 'lines': lines, 'results': results}, f, indent=2)
+    finally:
+        server.stop()
+        daemon.stop()
+        shutil.rmtree(index_dir, ignore_errors=True)
+    # Every run must find the same lines
+    return len({result['matches'] for result in results}) == 1
+
+
+def hammer(port, path, stop, counts):
+    """GET `path` in a loop until `stop` is set, counting responses by status."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        while not stop.is_set():
+            try:
+                status, _ = request(port, path, connection)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = 'error'
+            counts[status] = counts.get(status, 0) + 1
+    finally:
+        connection.close()
+
+
+def load_clients(port, paths, concurrency, stop, results):
+    """Hammer each path over `concurrency` connections until `stop`; put {path: {status: count}}."""
+    # One tally per thread, merged per path afterwards
+    tallies = [(path, {}) for path in paths for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=hammer, args=(port, path, stop, tally), daemon=True)
+        for path, tally in tallies
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counts = {path: {} for path in paths}
+    for path, tally in tallies:
+        for status, count in tally.items():
+            counts[path][status] = counts[path].get(status, 0) + count
+    results.put(counts)
+
+
+# CPUs the relative stats-load gate needs: the server, the load clients, and
+# this process with the fake daemon and the measuring clients, one each
+STATS_LOAD_CPUS = 3
+
+
+def run_stats_load(args):
+    """Compare /api/containers latency alone and under load on the stats endpoints.
+
+    The load clients run in their own process so they don't hold this
+    process's GIL, which the fake daemon and the measuring clients share.
+    With at least STATS_LOAD_CPUS CPUs the run fails if p99 under load
+    exceeds --max-slowdown times idle. With fewer, the server shares a CPU
+    with the load, so its p99 grows with the load itself; the run then fails
+    only if p99 under load exceeds the absolute --max-p99-ms budget.
+    """
+    state = FakeState(args.containers, args.images, args.networks, args.volumes)
+    daemon = FakeDaemon(args.socket, state, args.latency, args.jitter, log_lines=args.log_lines).start()
+    server = Server(daemon.url, _free_port())
+    loads = ('/api/system/stats', '/api/containers/stats')
+    try:
+        server.wait_ready()
+        time.sleep(args.warmup)
+        print(f'{len(state.containers)} containers; {args.requests} requests to /api/containers at concurrency '
+              f'{args.concurrency}, with and without {args.concurrency} clients on each of {", ".join(loads)}\n')
+        idle = measure(server, daemon, '/api/containers', args.requests, args.concurrency)
+
+        # Spawned, not forked: this process already runs the fake daemon's threads
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        results = context.Queue()
+        clients = context.Process(
+            target=load_clients, args=(server.port, loads, args.concurrency, stop, results), daemon=True
+        )
+        clients.start()
+        try:
+            # Let the load reach a steady state before measuring
+            time.sleep(2.0)
+            loaded = measure(server, daemon, '/api/containers', args.requests, args.concurrency)
+        finally:
+            stop.set()
+            counts = results.get(timeout=120)
+            clients.join()
+    finally:
+        server.stop()
+        daemon.stop()
+
+    header = f'{"/api/containers":<16} {"status":<12} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}'
+    print(header)
+    print('-' * len(header))
+    for name, result in (('idle', idle), ('under load', loaded)):
+        statuses = ','.join(f'{status}x{count}' for status, count in result['statuses'].items())
+        print(f'{name:<16} {statuses[:12]:<12} {result["throughput"]:>8} {result["p50_ms"]:>8} {result["p99_ms"]:>8}')
+    for path in loads:
+        statuses = ','.join(f'{status}x{count}' for status, count in sorted(counts[path].items(), key=str))
+        print(f'load on {path}: {statuses}')
+
+    cpus = os.cpu_count() or 1
+    if cpus >= STATS_LOAD_CPUS:
+        # A millisecond of slack keeps sub-millisecond idle runs from failing on noise
+        limit = idle['p99_ms'] * args.max_slowdown + 1.0
+        gate = f'{args.max_slowdown}x idle'
+    else:
+        limit = args.max_p99_ms
+        gate = f'absolute budget, {cpus} of {STATS_LOAD_CPUS} CPUs for the relative gate'
+    flat = loaded['p99_ms'] <= limit and set(loaded['statuses']) == {'200'}
+    print(f'\np99 under load {loaded["p99_ms"]}ms, limit {limit:.2f}ms ({gate}): {"ok" if flat else "FAILED"}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'idle': idle, 'loaded': loaded, 'load': counts}, f, indent=2)
+    return flat
+
+
+IMAGE_ENDPOINTS = [
+    '/api/images',
+    '/api/images/unused',
+    '/api/images/layers',
+    '/api/images/{image_id}',
+]
+
+
+# Daemon calls that may grow with the inventory while it loads: new images are
+# inspected, their history fetched and running containers' stats followed.
+# Everything else, and everything in a resync, must not depend on its size.
+PER_OBJECT_CALLS = {
+    'load': {'GET /images/{id}/json', 'GET /images/{id}/history', 'GET /containers/{id}/stats'},
+    'resync': set(),
+}
+
+# Most daemon calls a request may make once caches are warm. Lists are served
+# from the inventory; detail views inspect at most once.
+CALL_BUDGETS = {
+    '/api/containers': 0,
+    '/api/containers?sort=name&limit=50': 0,
+    '/api/containers?label=app=app1&fields=id,name,status': 0,
+    '/api/containers/running': 0,
+    '/api/containers/stats': 0,
+    '/api/containers/{container_id}': 1,
+    '/api/images': 0,
+    '/api/images/{image_id}': 1,
+    '/api/networks': 0,
+    '/api/volumes': 0,
+    '/api/ports': 0,
+}
+
+
+def measure_inventory(args, containers, images, templates):
+    """Start a daemon with this many containers and images and measure `templates`.
+
+    Also returns the daemon calls of the initial load and of the full resync
+    that follows dropping the event stream.
+    """
+    state = FakeState(containers, images, args.networks, args.volumes)
+    daemon = FakeDaemon(args.socket, state, args.latency, args.jitter, log_lines=args.log_lines).start()
+    running = next(attrs for attrs in state.containers.values() if attrs['State']['Running'])
+    names = {
+        'container_id': running['Name'].lstrip('/'),
+        'image_id': quote(next((image['RepoTags'][0] for image in state.images.values() if image['RepoTags']),
+                            next(iter(state.images), 'none')), safe=':'),
+    }
+    server = Server(daemon.url, _free_port())
+    try:
+        server.wait_ready()
+        time.sleep(args.warmup)
+        load = wait_idle(daemon)
+        daemon.drop_events()
+        resync = wait_idle(daemon, after='GET /events')
+        results = {}
+        for template in templates:
+            path = template.format(**names)
+            # Fill per-object caches first, so racing cold misses don't skew the count
+            server.get(path)
+            results[template] = measure(server, daemon, path, args.requests, args.concurrency)
+        return {'requests': results, 'load': load, 'resync': resync}
+    finally:
+        server.stop()
+        daemon.stop()
+
+
+def check_sync_calls(sizes, runs):
+    """Print load and resync daemon calls per size; False if any grow where they shouldn't."""
+    header = f'{"sync calls":<36}' + ''.join(f' {f"{c}c/{i}i":>14}' for c, i in sizes)
+    print(header)
+    print('-' * len(header))
+    ok = True
+    for phase in ('load', 'resync'):
+        for key in sorted(set().union(*(run[phase] for run in runs))):
+            counts = [run[phase].get(key, 0) for run in runs]
+            flat = key in PER_OBJECT_CALLS[phase] or len(set(counts)) == 1
+            ok = ok and flat
+            print(f'{f"{phase} {key}"[:36]:<36}' + ''.join(f' {c:>14}' for c in counts)
+                  + ('' if flat else '  <-- grows with inventory'))
+    print()
+    return ok
+
+
+def run_image_scaling(args):
+    """Daemon calls per image request, load and resync must not grow with the inventory."""
+    sizes = [(args.containers, args.images), (args.containers * args.scale, args.images * args.scale)]
+    runs = [measure_inventory(args, containers, images, IMAGE_ENDPOINTS) for containers, images in sizes]
+    ok = check_sync_calls(sizes, runs)
+    header = f'{"endpoint":<26}' + ''.join(f' {f"{c}c/{i}i calls/req":>22}' for c, i in sizes)
+    print(header)
+    print('-' * len(header))
+    for template in IMAGE_ENDPOINTS:
+        calls = [run['requests'][template]['daemon_calls_per_request'] for run in runs]
+        flat = len(set(calls)) == 1 and all(set(run['requests'][template]['statuses']) == {'200'} for run in runs)
+        over = args.max_calls is not None and max(calls) > args.max_calls
+        ok = ok and flat and not over
+        print(f'{template:<26}' + ''.join(f' {c:>22}' for c in calls)
+              + ('' if flat else '  <-- grows with inventory or failed') + ('  <-- over --max-calls' if over else ''))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'sizes': sizes, 'results': runs}, f, indent=2)
+    return ok
+
+
+def run_call_counts(args):
+    """Daemon calls per request must stay within CALL_BUDGETS and --max-calls, at
+    --containers/--images and --scale times that, and load and resync calls
+    must not grow between the two."""
+    sizes = [(args.containers, args.images), (args.containers * args.scale, args.images * args.scale)]
+    runs = [measure_inventory(args, containers, images, CALL_BUDGETS) for containers, images in sizes]
+    ok = check_sync_calls(sizes, runs)
+    header = f'{"endpoint":<56} {"size":>12} {"status":<12} {"calls/req":>9} {"budget":>7}'
+    print(header)
+    print('-' * len(header))
+    for template, budget in CALL_BUDGETS.items():
+        if args.max_calls is not None:
+            budget = min(budget, args.max_calls)
+        for (containers, images), run in zip(sizes, runs):
+            result = run['requests'][template]
+            statuses = ','.join(f'{status}x{count}' for status, count in result['statuses'].items())
+            within = result['daemon_calls_per_request'] <= budget and set(result['statuses']) == {'200'}
+            ok = ok and within
+            print(f'{template[:56]:<56} {f"{containers}c/{images}i":>12} {statuses[:12]:<12} '
+                  f'{result["daemon_calls_per_request"]:>9} {budget:>7g}'
+                  + ('' if within else '  <-- over budget or failed'))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'budgets': CALL_BUDGETS, 'sizes': sizes, 'results': runs}, f, indent=2)
+    return ok
+
+
+SCENARIOS = {
+    'endpoints': run_endpoints,
+    'log-search': run_log_search,
+    'stats-load': run_stats_load,
+    'image-scaling': run_image_scaling,
+    'call-counts': run_call_counts,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API against a fake Docker daemon.')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='endpoints')
+    parser.add_argument('--containers', type=int, default=500)
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--networks', type=int, default=10)
+    parser.add_argument('--volumes', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every daemon call')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--log-lines', type=int, default=2000)
+    parser.add_argument('--log-bytes', type=int, default=5 * 1024 ** 3, help='log size for the log-search scenario')
+    parser.add_argument('--log-span', type=float, default=7 * 86400,
+                        help='seconds the log-search log is spread over')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds to wait after startup')
+    parser.add_argument('--only', help='comma-separated substrings; measure matching paths only')
+    parser.add_argument('--socket', default=f'/tmp/dockeranium-bench-{os.getpid()}.sock')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--max-calls', type=float, help='fail if any endpoint averages more daemon calls per request')
+    parser.add_argument('--scale', type=int, default=10, help='image-scaling: size multiplier of the second run')
+    parser.add_argument('--max-slowdown', type=float, default=2.0,
+                        help='stats-load: fail if /api/containers p99 under load exceeds this multiple of idle')
+    parser.add_argument('--max-p99-ms', type=float, default=250.0,
+                        help='stats-load: p99 budget under load used instead with fewer than 3 CPUs')
+    args = parser.parse_args()
+    sys.exit(0 if SCENARIOS[args.scenario](args) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Bulk container lifecycle actions.
+
+A `BulkOperation` applies one action to a set of containers with bounded
+parallelism, on its own executor so a large rollout can't starve the read
+endpoints of worker threads. Each container is bounded by a per-item
+timeout, counted from when its call starts rather than while it waits for a
+worker, and progress is reported per container as it finishes:
+
+    {"event": "start", "action": "restart", "total": 300, "parallelism": 20}
+    {"event": "result", "id": ..., "name": ..., "status": "ok", "duration": 1.42}
+    {"event": "done", "succeeded": 299, "failed": 1, "skipped": 0, "duration": 21.7}
+
+A container is skipped when `max_failures` is reached before it starts.
+When the client disconnects, containers that haven't started are dropped.
+Calls that are already running on the daemon complete.
+
+`remove` and `kill` can't be undone, and the API has no authentication of
+its own, so they are refused unless BULK_DESTRUCTIVE_ACTIONS=1.
+"""
+import asyncio
+import time
+
+import docker
+
+from executor import BlockingExecutor, ExecutorTimeout
+from utils import WARNING, debug_print, env_float, env_int
+
+ACTIONS = ('start', 'stop', 'restart', 'kill', 'remove', 'pause', 'unpause')
+# Actions that lose containers or their state; opt-in only
+DESTRUCTIVE_ACTIONS = ('kill', 'remove')
+ALLOW_DESTRUCTIVE = env_int('BULK_DESTRUCTIVE_ACTIONS', 0) == 1
+
+# Actions get their own pool; parallelism per operation is capped by its size
+bulk_executor = BlockingExecutor(
+    max_workers=env_int('BULK_MAX_PARALLELISM', 32),
+    timeout=env_float('BULK_ITEM_TIMEOUT', 60.0),
+)
+
+
+def apply_action(client, container_id, action, stop_timeout=10, signal='SIGKILL', force=False):
+    api = client.api
+    if action == 'start':
+        api.start(container_id)
+    elif action == 'stop':
+        api.stop(container_id, timeout=stop_timeout)
+    elif action == 'restart':
+        api.restart(container_id, timeout=stop_timeout)
+    elif action == 'kill':
+        api.kill(container_id, signal=signal)
+    elif action == 'remove':
+        api.remove_container(container_id, force=force)
+    elif action == 'pause':
+        api.pause(container_id)
+    elif action == 'unpause':
+        api.unpause(container_id)
+    else:
+        raise ValueError(f"Unsupported action: {action}")
+
+
+class ActionNotAllowed(Exception):
+    """Raised for a destructive action while BULK_DESTRUCTIVE_ACTIONS is off."""
+
+
+class BulkOperation:
+    def __init__(self, docker_host, action, containers, missing=(), parallelism=10, item_timeout=None,
+                 stop_timeout=10, signal='SIGKILL', force=False, max_failures=None):
+        if action not in ACTIONS:
+            raise ValueError(f"Unsupported action: {action}; expected one of {', '.join(ACTIONS)}")
+        if action in DESTRUCTIVE_ACTIONS and not ALLOW_DESTRUCTIVE:
+            raise ActionNotAllowed(f"Bulk {action} is disabled; set BULK_DESTRUCTIVE_ACTIONS=1 to allow it")
+        self.docker_host = docker_host
+        self.action = action
+        self.containers = containers
+        # Requested ids the inventory doesn't know; reported as failures
+        self.missing = list(missing)
+        self.parallelism = max(1, min(parallelism, bulk_executor.max_workers))
+        self.item_timeout = item_timeout or bulk_executor.timeout
+        self.stop_timeout = stop_timeout
+        self.signal = signal
+        self.force = force
+        self.max_failures = max_failures
+
+    def _result(self, container_id, name, status, started, error=None):
+        result = {
+            'event': 'result',
+            'host': self.docker_host.name,
+            'id': container_id,
+            'name': name,
+            'action': self.action,
+            'status': status,
+            'duration': round(time.monotonic() - started, 3),
+        }
+        if error is not None:
+            result['error'] = error
+        return result
+
+    async def _run_one(self, attrs, slots, state):
+        container_id = attrs['Id']
+        name = attrs.get('Name', '').lstrip('/')
+        async with slots:
+            started = time.monotonic()
+            if self.max_failures is not None and state['failed'] >= self.max_failures:
+                return self._result(container_id, name, 'skipped', started, 'max_failures reached')
+            try:
+                await bulk_executor.run(
+                    apply_action, self.docker_host.client, container_id, self.action,
+                    self.stop_timeout, self.signal, self.force,
+                    timeout=self.item_timeout, from_start=True,
+                )
+                return self._result(container_id, name, 'ok', started)
+            except ExecutorTimeout:
+                state['failed'] += 1
+                return self._result(container_id, name, 'timeout', started,
+                                    f"No response within {self.item_timeout}s")
+            except docker.errors.NotFound as e:
+                state['failed'] += 1
+                return self._result(container_id, name, 'not_found', started, str(e))
+            except Exception as e:
+                state['failed'] += 1
+                return self._result(container_id, name, 'error', started, str(e))
+
+    async def batches(self):
+        """Yield one-event batches as containers finish, for `ndjson_lines`."""
+        started = time.monotonic()
+        yield [{
+            'event': 'start',
+            'host': self.docker_host.name,
+            'action': self.action,
+            'total': len(self.containers) + len(self.missing),
+            'parallelism': self.parallelism,
+        }]
+        counts = {'ok': 0, 'skipped': 0}
+        state = {'failed': 0}
+        for ref in self.missing:
+            state['failed'] += 1
+            yield [self._result(ref, None, 'not_found', time.monotonic(), f"Container not found: {ref}")]
+
+        slots = asyncio.Semaphore(self.parallelism)
+        tasks = [asyncio.ensure_future(self._run_one(attrs, slots, state)) for attrs in self.containers]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if result['status'] in counts:
+                    counts[result['status']] += 1
+                yield [result]
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                debug_print(f"Bulk {self.action} interrupted with {len(pending)} containers left", WARNING)
+                for task in pending:
+                    task.cancel()
+
+        yield [{
+            'event': 'done',
+            'host': self.docker_host.name,
+            'action': self.action,
+            'succeeded': counts['ok'],
+            'failed': state['failed'],
+            'skipped': counts['skipped'],
+            'duration': round(time.monotonic() - started, 3),
+        }]
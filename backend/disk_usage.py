@@ -0,0 +1,293 @@
+"""
+Disk usage of images, build cache and volumes.
+
+Image and build-cache usage comes from the daemon's /system/df, refreshed in
+the background every `DISK_USAGE_INTERVAL` seconds. Volume sizes are measured
+by a background scanner that walks each volume's mountpoint at no more than
+`VOLUME_SCAN_RATE` entries per second. Results are cached against the
+mountpoint's mtime, and a volume is rescanned only when that changes or the
+result is older than `VOLUME_SCAN_MAX_AGE`. Reads are always answered from
+the cache.
+
+The backend usually runs in a container, so the scanner needs the host's
+volume directory mounted. `VOLUME_SCAN_ROOT=/var/lib/docker/volumes:/host/volumes`
+maps host mountpoints to local paths; the docker-compose files mount it
+read-only there. Volumes the scan can't reach, such as those of remote
+hosts, are sized by the daemon instead. That makes it walk every volume
+itself, unthrottled, so it is only asked every `VOLUME_DF_INTERVAL` (an
+hour by default; 0 disables it).
+Daemons before API 1.42 ignore the df `type` filter and always measure
+volumes; their figures are used when present.
+"""
+import os
+import stat
+import threading
+import time
+
+from inventory import CONTAINER, VOLUME
+from utils import ERROR, debug_print, env_float, env_int
+
+
+def _root_mapping(spec):
+    if not spec:
+        return None
+    host_root, _, local_root = spec.partition(':')
+    return host_root.rstrip('/'), (local_root or host_root).rstrip('/')
+
+
+class _Throttle:
+    """Sleeps as needed to keep a walk under `rate` entries per second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.count = 0
+
+    def tick(self, stop):
+        self.count += 1
+        if self.rate <= 0 or self.count % 256:
+            return
+        ahead = self.count / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            stop.wait(ahead)
+
+
+def scan_directory(path, throttle, stop):
+    """Return (bytes on disk, files) under path, like `du -s`."""
+    size = 0
+    files = 0
+    pending = [path]
+    seen = set()
+    while pending and not stop.is_set():
+        directory = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                throttle.tick(stop)
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.S_ISDIR(info.st_mode):
+                    pending.append(entry.path)
+                    size += info.st_blocks * 512
+                    continue
+                if info.st_nlink > 1:
+                    # Count hard-linked files once
+                    key = (info.st_dev, info.st_ino)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                size += info.st_blocks * 512
+                files += 1
+    return size, files
+
+
+class DiskUsage:
+    def __init__(self, client, inventory, scan=True, interval=None, scan_rate=None, max_age=None):
+        self.client = client
+        self.inventory = inventory
+        self.interval = interval if interval is not None else env_float('DISK_USAGE_INTERVAL', 300.0)
+        self.scan_rate = scan_rate if scan_rate is not None else env_int('VOLUME_SCAN_RATE', 20000)
+        self.max_age = max_age if max_age is not None else env_float('VOLUME_SCAN_MAX_AGE', 3600.0)
+        # Daemon-measured volume sizes, for volumes the local scan can't reach; 0 disables
+        self.volume_interval = env_float('VOLUME_DF_INTERVAL', 3600.0)
+        self.root = _root_mapping(os.environ.get('VOLUME_SCAN_ROOT')) if scan else None
+        self._lock = threading.Lock()
+        self._df = None
+        self._df_at = None
+        self._volume_df = None
+        self._volume_df_at = None
+        # volume name -> {'mtime', 'size', 'files', 'scanned_at', 'duration'}
+        self._scans = {}
+        self._scanning = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='disk-usage', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_df()
+            except Exception as e:
+                debug_print(f"Error reading disk usage: {str(e)}", ERROR)
+            unscanned = True
+            if self.root is not None:
+                try:
+                    unscanned = self.scan_volumes()
+                except Exception as e:
+                    debug_print(f"Error scanning volumes: {str(e)}", ERROR)
+            if unscanned and self.volume_interval > 0 and (
+                self._volume_df_at is None or time.time() - self._volume_df_at >= self.volume_interval
+            ):
+                try:
+                    self.refresh_volume_df()
+                except Exception as e:
+                    debug_print(f"Error reading volume sizes: {str(e)}", ERROR)
+            self._stop.wait(self.interval)
+
+    # Daemon figures
+
+    def _system_df(self, types):
+        api = self.client.api
+        return api._result(api._get(api._url('/system/df'), params={'type': types}), True)
+
+    def refresh_df(self):
+        # Never volume (or container) sizes, which the daemon computes by
+        # walking every volume; see refresh_volume_df
+        df = self._system_df(['image', 'build-cache'])
+        with self._lock:
+            self._df = df
+            self._df_at = time.time()
+
+    def refresh_volume_df(self):
+        df = self._system_df(['volume'])
+        with self._lock:
+            self._volume_df = df
+            self._volume_df_at = time.time()
+
+    # Volume scans
+
+    def local_path(self, mountpoint):
+        if self.root is None or not mountpoint:
+            return None
+        host_root, local_root = self.root
+        if mountpoint != host_root and not mountpoint.startswith(host_root + '/'):
+            return None
+        return local_root + mountpoint[len(host_root):]
+
+    def scan_volumes(self):
+        """Rescan volumes whose mountpoint changed or whose result is too old.
+
+        Returns whether some volume has no local path to scan.
+        """
+        throttle = _Throttle(self.scan_rate)
+        volumes = self.inventory.snapshot(VOLUME)
+        with self._lock:
+            for name in set(self._scans) - set(volumes):
+                del self._scans[name]
+        unscanned = False
+        for name, volume in volumes.items():
+            if self._stop.is_set():
+                return unscanned
+            path = self.local_path(volume.get('Mountpoint'))
+            if path is None:
+                unscanned = True
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                unscanned = True
+                continue
+            with self._lock:
+                cached = self._scans.get(name)
+            if cached and cached['mtime'] == mtime and time.time() - cached['scanned_at'] < self.max_age:
+                continue
+            self._scanning = name
+            started = time.monotonic()
+            size, files = scan_directory(path, throttle, self._stop)
+            self._scanning = None
+            if self._stop.is_set():
+                return unscanned
+            with self._lock:
+                self._scans[name] = {
+                    'mtime': mtime,
+                    'size': size,
+                    'files': files,
+                    'scanned_at': time.time(),
+                    'duration': round(time.monotonic() - started, 3),
+                }
+        return unscanned
+
+    # Reads
+
+    def volume_users(self):
+        """Return {volume name: number of containers mounting it} from the inventory."""
+        users = {}
+        for attrs in self.inventory.snapshot(CONTAINER).values():
+            for mount in attrs.get('Mounts') or []:
+                if mount.get('Type') == 'volume' and mount.get('Name'):
+                    users[mount['Name']] = users.get(mount['Name'], 0) + 1
+        return users
+
+    def volumes(self):
+        """Volume rows with size, users and where the size came from."""
+        with self._lock:
+            scans = dict(self._scans)
+            # Old daemons include volumes in every df
+            df, df_at = (self._volume_df, self._volume_df_at) if self._volume_df else (self._df or {}, self._df_at)
+        daemon_sizes = {
+            volume['Name']: (volume.get('UsageData') or {}).get('Size')
+            for volume in df.get('Volumes') or []
+        }
+        users = self.volume_users()
+        rows = []
+        for name, volume in self.inventory.snapshot(VOLUME).items():
+            scan = scans.get(name)
+            size = scan['size'] if scan else daemon_sizes.get(name)
+            if size is not None and size < 0:
+                # The daemon reports -1 when it didn't compute a size
+                size = None
+            rows.append({
+                'name': name,
+                'driver': volume.get('Driver'),
+                'mountpoint': volume.get('Mountpoint'),
+                'size': size,
+                'files': scan['files'] if scan else None,
+                'containers': users.get(name, 0),
+                'source': 'scan' if scan else 'daemon' if size is not None else None,
+                'measured_at': scan['scanned_at'] if scan else df_at if size is not None else None,
+            })
+        return rows
+
+    def summary(self):
+        with self._lock:
+            df = self._df
+            df_at = self._df_at
+        volumes = self.volumes()
+        known = [volume for volume in volumes if volume['size'] is not None]
+        result = {
+            'updated_at': df_at,
+            'scanning': self._scanning,
+            'volumes': {
+                'count': len(volumes),
+                'active': sum(1 for volume in volumes if volume['containers']),
+                'measured': len(known),
+                'size': sum(volume['size'] for volume in known),
+                'reclaimable': sum(volume['size'] for volume in known if not volume['containers']),
+            },
+            'images': None,
+            'build_cache': None,
+        }
+        if df is None:
+            return result
+
+        images = df.get('Images') or []
+        unused = [image for image in images if not image.get('Containers')]
+        result['images'] = {
+            'count': len(images),
+            'active': len(images) - len(unused),
+            'size': df.get('LayersSize') or sum(image.get('Size') or 0 for image in images),
+            # Layers shared with other images stay on disk
+            'reclaimable': sum(max(0, (image.get('Size') or 0) - max(0, image.get('SharedSize') or 0)) for image in unused),
+        }
+        cache = df.get('BuildCache') or []
+        result['build_cache'] = {
+            'count': len(cache),
+            'active': sum(1 for entry in cache if entry.get('InUse')),
+            'size': sum(entry.get('Size') or 0 for entry in cache),
+            'reclaimable': sum(entry.get('Size') or 0 for entry in cache if not entry.get('InUse') and not entry.get('Shared')),
+        }
+        return result
@@ -0,0 +1,154 @@
+"""
+Bounded thread pool for blocking Docker SDK and psutil calls.
+
+Route handlers are plain functions wrapped with `@blocking`, which runs them
+on this pool with a per-call timeout so one slow daemon call never stalls the
+event loop. Queue depth and latency counters are exposed for monitoring.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import env_float, env_int
+
+
+class ExecutorBusy(Exception):
+    """Raised when the pending-call queue is full."""
+
+
+class ExecutorTimeout(Exception):
+    """Raised when a call does not finish within its timeout."""
+
+
+class BlockingExecutor:
+    def __init__(self, max_workers=None, timeout=None, max_queue=None):
+        self.max_workers = max_workers or env_int('DOCKER_EXECUTOR_WORKERS', 16)
+        self.timeout = timeout or env_float('DOCKER_CALL_TIMEOUT', 30.0)
+        self.max_queue = max_queue or env_int('DOCKER_EXECUTOR_MAX_QUEUE', 1000)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='docker-call'
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    async def run(self, fn, *args, timeout=None, from_start=False, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and return its result.
+
+        The timeout covers queueing and running, or with `from_start` only
+        the running, so a call isn't failed for time it spent waiting behind
+        others for a worker.
+        """
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorBusy(f"{self._queued} calls already queued")
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        submitted = time.monotonic()
+        loop = asyncio.get_running_loop()
+        began = asyncio.Event() if from_start else None
+
+        def call():
+            started = time.monotonic()
+            if began is not None:
+                loop.call_soon_threadsafe(began.set)
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_seconds += started - submitted
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._run_seconds += time.monotonic() - started
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+
+        # Carry the caller's context so per-request instrumentation sees the call
+        future = self._pool.submit(contextvars.copy_context().run, call)
+        if began is not None:
+            def dropped(future):
+                # Shut down before the call started; wake the wait below
+                if future.cancelled() and not loop.is_closed():
+                    loop.call_soon_threadsafe(began.set)
+            future.add_done_callback(dropped)
+        try:
+            if began is not None:
+                await began.wait()
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout or self.timeout
+            )
+        except asyncio.CancelledError:
+            self._forget(future)
+            raise
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            self._forget(future)
+            raise ExecutorTimeout(
+                f"{getattr(fn, '__name__', 'call')} timed out after {timeout or self.timeout}s"
+            )
+
+    def _forget(self, future):
+        with self._lock:
+            if future.cancel():
+                # Never started, so call() won't decrement the queue
+                self._queued -= 1
+
+    def stats(self):
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                'workers': self.max_workers,
+                'timeout': self.timeout,
+                'max_queue': self.max_queue,
+                'queued': self._queued,
+                'active': self._active,
+                'peak_queued': self._peak_queued,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timeouts': self._timeouts,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._wait_seconds / finished * 1000, 3) if finished else 0.0,
+                'avg_run_ms': round(self._run_seconds / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executor = BlockingExecutor()
+
+
+def blocking(fn=None, *, timeout=None):
+    """Run a synchronous route handler on the bounded executor.
+
+    The wrapper keeps the handler's signature so FastAPI still sees its
+    path and query parameters.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await executor.run(func, *args, timeout=timeout, **kwargs)
+        return wrapper
+
+    if fn is not None:
+        return decorate(fn)
+    return decorate
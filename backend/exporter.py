@@ -0,0 +1,266 @@
+"""
+Prometheus/OpenMetrics exporter for container and host metrics.
+
+The exposition text is rendered in the background every
+`METRICS_EXPORT_INTERVAL` seconds from the stats collectors' latest samples
+and the host recorder's snapshot, and kept as ready-to-send bytes (plain and
+gzip). A scrape only copies the buffer, so its cost doesn't grow with the
+number of containers and it never reaches the Docker daemon.
+
+Label cardinality is configurable:
+    METRICS_SERIES_LABELS     built-in container labels (host,id,name,image)
+    METRICS_CONTAINER_LABELS  Docker label keys copied as `label_<key>`
+    METRICS_ID_LENGTH         characters of the container id kept in `id`
+    METRICS_MAX_CONTAINERS    containers exported per host; the rest are
+                              counted in dockeranium_exporter_containers_dropped
+
+Containers that end up with the same labels, e.g. two replicas of one image
+when `id` and `name` are left out, are summed into a single series, since a
+scrape with duplicate series is rejected. Docker label keys that map to the
+same `label_<key>` name get a numeric suffix.
+"""
+import gzip
+import os
+import re
+import threading
+import time
+
+from inventory import CONTAINER
+from utils import ERROR, debug_print, env_float, env_int
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+SERIES_LABELS = ('host', 'id', 'name', 'image')
+
+# name, type, help, sample field
+CONTAINER_METRICS = (
+    ('dockeranium_container_cpu_usage_percent', 'gauge',
+     'CPU usage of the container, in percent of one core', 'cpu_percentage'),
+    ('dockeranium_container_memory_usage_bytes', 'gauge',
+     'Memory used by the container', 'memory_usage'),
+    ('dockeranium_container_memory_limit_bytes', 'gauge',
+     'Memory limit of the container, or host memory when unlimited', 'memory_limit'),
+    ('dockeranium_container_network_receive_bytes', 'counter',
+     'Bytes received on all container interfaces', 'network_rx'),
+    ('dockeranium_container_network_transmit_bytes', 'counter',
+     'Bytes sent on all container interfaces', 'network_tx'),
+    ('dockeranium_container_blkio_read_bytes', 'counter',
+     'Bytes read from block devices by the container', 'block_read'),
+    ('dockeranium_container_blkio_write_bytes', 'counter',
+     'Bytes written to block devices by the container', 'block_write'),
+)
+
+
+def _label_name(key):
+    name = re.sub(r'[^a-zA-Z0-9_]', '_', key)
+    return f'label_{name}'
+
+
+def _docker_label_names(keys):
+    """Return [(Docker label key, metric label name)], with distinct names."""
+    pairs = []
+    used = set()
+    for key in dict.fromkeys(keys):
+        name = base = _label_name(key)
+        n = 2
+        while name in used:
+            # `app.name` and `app_name` would both be label_app_name
+            name = f'{base}_{n}'
+            n += 1
+        used.add(name)
+        pairs.append((key, name))
+    return pairs
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _Family:
+    __slots__ = ('name', 'type', 'help', 'samples')
+
+    def __init__(self, name, kind, help):
+        self.name = name
+        self.type = kind
+        self.help = help
+        # Label pairs -> value; samples with the same labels are summed
+        self.samples = {}
+
+    def add(self, labels, value):
+        if value is not None:
+            labels = tuple(labels)
+            self.samples[labels] = self.samples.get(labels, 0) + value
+
+    def render(self, lines):
+        if not self.samples:
+            return
+        lines.append(f'# TYPE {self.name} {self.type}')
+        lines.append(f'# HELP {self.name} {self.help}')
+        suffix = '_total' if self.type == 'counter' else ''
+        for labels, value in self.samples.items():
+            lines.append(f'{self.name}{suffix}{_labels(labels)} {_value(value)}')
+
+
+class MetricsExporter:
+    def __init__(self, hosts, host_recorder, container_image, interval=None):
+        self.hosts = hosts
+        self.host_recorder = host_recorder
+        # container_image(attrs, docker_host) -> image tag for the `image` label
+        self.container_image = container_image
+        self.interval = interval or env_float('METRICS_EXPORT_INTERVAL', 5.0)
+        series_labels = os.environ.get('METRICS_SERIES_LABELS')
+        names = [n.strip() for n in series_labels.split(',')] if series_labels is not None else SERIES_LABELS
+        self.series_labels = tuple(name for name in names if name in SERIES_LABELS)
+        self.docker_labels = _docker_label_names(
+            key.strip() for key in os.environ.get('METRICS_CONTAINER_LABELS', '').split(',') if key.strip()
+        )
+        self.id_length = env_int('METRICS_ID_LENGTH', 12)
+        self.max_containers = env_int('METRICS_MAX_CONTAINERS', 1000)
+        self.body = None
+        self.gzipped = None
+        self.rendered_at = None
+        self._render_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def refresh(self):
+        try:
+            started = time.perf_counter()
+            body = self.render().encode('utf-8')
+            gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+            # Scrapes read one attribute each, so plain swaps need no lock
+            self.body, self.gzipped = body, gzipped
+            self.rendered_at = time.time()
+            self._render_seconds = time.perf_counter() - started
+        except Exception as e:
+            debug_print(f"Error rendering metrics: {str(e)}", ERROR)
+
+    def _container_labels(self, docker_host, attrs):
+        values = {
+            'host': docker_host.name,
+            'id': attrs['Id'][:self.id_length] if self.id_length > 0 else attrs['Id'],
+            'name': attrs.get('Name', '').lstrip('/'),
+        }
+        labels = []
+        for name in self.series_labels:
+            if name == 'image':
+                labels.append(('image', self.container_image(attrs, docker_host)))
+            else:
+                labels.append((name, values[name]))
+        if self.docker_labels:
+            docker_labels = (attrs.get('Config') or {}).get('Labels') or {}
+            for key, name in self.docker_labels:
+                labels.append((name, docker_labels.get(key, '')))
+        return labels
+
+    def render(self):
+        families = [_Family(name, kind, help) for name, kind, help, _ in CONTAINER_METRICS]
+        containers = _Family('dockeranium_containers', 'gauge', 'Containers per state')
+        up = _Family('dockeranium_host_up', 'gauge', 'Whether the Docker host inventory is current')
+        dropped = _Family('dockeranium_exporter_containers_dropped', 'gauge',
+                          'Running containers left out by METRICS_MAX_CONTAINERS')
+
+        for docker_host in self.hosts.select():
+            host_label = [('host', docker_host.name)]
+            up.add(host_label, 0 if docker_host.inventory.is_stale() else 1)
+            states = {}
+            running = []
+            # Cached objects as-is; rendering never waits on a daemon
+            for attrs in docker_host.inventory.snapshot(CONTAINER).values():
+                status = (attrs.get('State') or {}).get('Status', '')
+                states[status] = states.get(status, 0) + 1
+                if status == 'running':
+                    running.append(attrs)
+            for status, count in sorted(states.items()):
+                containers.add(host_label + [('state', status)], count)
+
+            running.sort(key=lambda attrs: attrs.get('Name', ''))
+            if self.max_containers > 0 and len(running) > self.max_containers:
+                dropped.add(host_label, len(running) - self.max_containers)
+                running = running[:self.max_containers]
+            else:
+                dropped.add(host_label, 0)
+
+            for attrs in running:
+                # Containers without a first sample are left out rather than reported as zero
+                sample = docker_host.stats_collector.latest(attrs['Id'])
+                if sample is None:
+                    continue
+                labels = self._container_labels(docker_host, attrs)
+                for family, (_, _, _, field) in zip(families, CONTAINER_METRICS):
+                    family.add(labels, sample.get(field))
+
+        families = [containers, up] + families + self._host_families()
+        exporter = _Family('dockeranium_exporter_render_seconds', 'gauge',
+                           'Time spent rendering the previous exposition')
+        exporter.add([], round(self._render_seconds, 6))
+        families += [dropped, exporter]
+
+        lines = []
+        for family in families:
+            family.render(lines)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def _host_families(self):
+        snapshot = self.host_recorder.snapshot
+        if snapshot is None:
+            return []
+        cpu = snapshot['cpu']
+        memory = snapshot['memory']
+        network = snapshot['network']
+
+        cpu_usage = _Family('dockeranium_host_cpu_usage_percent', 'gauge', 'Average CPU usage of the host')
+        cpu_usage.add([], round(cpu['average_usage'], 2))
+        cores = _Family('dockeranium_host_cpu_cores', 'gauge', 'Logical CPUs of the host')
+        cores.add([], cpu['cores'])
+        load = _Family('dockeranium_host_load_average', 'gauge', 'Host load average')
+        for period, value in (cpu.get('load') or {}).items():
+            load.add([('period', period)], value)
+
+        memory_families = []
+        for field in ('total', 'available', 'used'):
+            family = _Family(f'dockeranium_host_memory_{field}_bytes', 'gauge', f'Host memory {field}')
+            family.add([], memory[field])
+            memory_families.append(family)
+
+        disk_families = []
+        for field in ('total', 'used', 'free'):
+            family = _Family(f'dockeranium_host_disk_{field}_bytes', 'gauge', f'Filesystem space {field}')
+            for disk in snapshot.get('disks') or []:
+                family.add([('device', disk['device']), ('mountpoint', disk['mountpoint'])], disk[field])
+            disk_families.append(family)
+
+        receive = _Family('dockeranium_host_network_receive_bytes', 'counter', 'Bytes received per host interface')
+        transmit = _Family('dockeranium_host_network_transmit_bytes', 'counter', 'Bytes sent per host interface')
+        for name, interface in sorted(network['interfaces'].items()):
+            receive.add([('interface', name)], interface['bytes_recv'])
+            transmit.add([('interface', name)], interface['bytes_sent'])
+
+        return [cpu_usage, cores, load] + memory_families + disk_families + [receive, transmit]
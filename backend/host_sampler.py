@@ -0,0 +1,172 @@
+"""
+Host CPU, memory, disk and network sampler.
+
+`HostSampler.sample()` is called at a fixed cadence by the host recorder and
+builds the full system snapshot served by /api/system/stats. CPU usage is
+measured between consecutive calls instead of blocking for an interval, and
+network rates come from the counter deltas. Interface addresses and the
+mount table are only re-read when the interface set changes or every
+`SYSTEM_ADDRESS_REFRESH` seconds.
+"""
+import os
+import time
+
+import psutil
+
+from utils import ERROR, debug_print, env_float
+
+
+def _disk_info(usage):
+    return {
+        'total': usage.total,
+        'used': usage.used,
+        'free': usage.free,
+        'percent': usage.percent
+    }
+
+
+class HostSampler:
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval or env_float('SYSTEM_ADDRESS_REFRESH', 60.0)
+        self._addresses = {}
+        self._partitions = []
+        self._interface_state = None
+        self._refreshed_at = 0
+        self._last_io = None
+        self._last_nics = {}
+        self._last_time = None
+
+    def prime(self):
+        # The first interval=None reading is meaningless; start the clocks
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def _refresh_static(self, interface_stats):
+        state = tuple(sorted((name, stats.isup) for name, stats in interface_stats.items()))
+        now = time.monotonic()
+        if state == self._interface_state and now - self._refreshed_at < self.refresh_interval:
+            return
+        self._interface_state = state
+        self._refreshed_at = now
+        self._addresses = {
+            interface: [
+                {
+                    'address': addr.address,
+                    'family': str(addr.family),
+                    'netmask': addr.netmask if hasattr(addr, 'netmask') else None
+                }
+                for addr in addrs
+            ]
+            for interface, addrs in psutil.net_if_addrs().items()
+        }
+        partitions = {}
+        for partition in psutil.disk_partitions(all=False):
+            # Bind mounts of the same device report the same usage
+            partitions.setdefault(partition.device, partition)
+        self._partitions = list(partitions.values())
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = now - self._last_time if self._last_time is not None else None
+        self._last_time = now
+
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
+        cpu_freq = psutil.cpu_freq()
+        load = psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
+        cpu_info = {
+            'cores': psutil.cpu_count(),
+            'usage_per_core': per_core,
+            'average_usage': sum(per_core) / len(per_core) if per_core else 0.0,
+            'frequency': {
+                'current': cpu_freq.current,
+                'min': cpu_freq.min,
+                'max': cpu_freq.max
+            } if cpu_freq else None,
+            'load': {'1m': load[0], '5m': load[1], '15m': load[2]} if load else None
+        }
+
+        memory = psutil.virtual_memory()
+        memory_info = {
+            'total': memory.total,
+            'available': memory.available,
+            'used': memory.used,
+            'free': memory.free,
+            'percent': memory.percent
+        }
+
+        interface_stats = psutil.net_if_stats()
+        self._refresh_static(interface_stats)
+
+        disks = []
+        for partition in self._partitions:
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+            except OSError as e:
+                debug_print(f"Error reading disk usage for {partition.mountpoint}: {str(e)}", ERROR)
+                continue
+            disks.append({
+                'device': partition.device,
+                'mountpoint': partition.mountpoint,
+                'fstype': partition.fstype,
+                **_disk_info(usage)
+            })
+
+        net_io = psutil.net_io_counters()
+        nics = psutil.net_io_counters(pernic=True)
+        interfaces = {}
+        for name in set(self._addresses) | set(nics):
+            counters = nics.get(name)
+            stats = interface_stats.get(name)
+            previous = self._last_nics.get(name)
+            interfaces[name] = {
+                'addresses': self._addresses.get(name, []),
+                'is_up': stats.isup if stats else None,
+                'speed': stats.speed if stats else None,
+                'bytes_sent': counters.bytes_sent if counters else None,
+                'bytes_recv': counters.bytes_recv if counters else None,
+                'sent_rate': _rate(counters, previous, 'bytes_sent', elapsed),
+                'recv_rate': _rate(counters, previous, 'bytes_recv', elapsed),
+            }
+        io_info = {
+            'bytes_sent': net_io.bytes_sent,
+            'bytes_recv': net_io.bytes_recv,
+            'packets_sent': net_io.packets_sent,
+            'packets_recv': net_io.packets_recv,
+            'sent_rate': _rate(net_io, self._last_io, 'bytes_sent', elapsed),
+            'recv_rate': _rate(net_io, self._last_io, 'bytes_recv', elapsed),
+        }
+        self._last_io = net_io
+        self._last_nics = nics
+
+        return {
+            'cpu': cpu_info,
+            'memory': memory_info,
+            'disk': _disk_info(psutil.disk_usage(os.sep)),
+            'disks': disks,
+            'network': {
+                'interfaces': interfaces,
+                'io': io_info
+            },
+            'timestamp': time.time()
+        }
+
+
+def _rate(current, previous, field, elapsed):
+    if current is None or previous is None or not elapsed:
+        return None
+    # Counters reset when an interface is recreated
+    delta = getattr(current, field) - getattr(previous, field)
+    return round(delta / elapsed, 1) if delta >= 0 else None
+
+
+def summary_fields(snapshot):
+    """Flat host figures matching the SystemStats model."""
+    return {
+        'cpu_usage': round(snapshot['cpu']['average_usage'], 2),
+        'memory_total': snapshot['memory']['total'],
+        'memory_used': snapshot['memory']['used'],
+        'memory_free': snapshot['memory']['free'],
+        'disk_total': snapshot['disk']['total'],
+        'disk_used': snapshot['disk']['used'],
+        'disk_free': snapshot['disk']['free'],
+    }
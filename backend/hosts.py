@@ -0,0 +1,256 @@
+"""
+Registry of Docker hosts for fleet mode.
+
+`DOCKER_HOSTS` lists the daemons to manage as comma-separated `name=url`
+pairs, e.g. `node1=unix:///var/run/docker.sock,node2=tcp://10.0.0.2:2375,
+node3=ssh://admin@10.0.0.3`. When it is unset, the single host `local` is
+built from the usual DOCKER_HOST environment. Each host has its own pooled
+client, inventory cache, stats collector and image layer graph, so a slow or
+unreachable node only affects its own slice of a fleet-wide response.
+
+Fleet requests fan out on their own pool, sized so every host has
+`FLEET_HOST_CONCURRENCY` workers. A host that already has that many calls
+running, e.g. stuck on a hung daemon after their callers timed out, fails
+new calls at once instead of taking workers the other hosts need. Hosts
+that haven't loaded their inventory yet are reported as errors without
+being called.
+
+Clients are created without touching the daemon. When the app starts, each
+host connects in its own thread, retrying with backoff until the daemon
+answers, settles the API version and only then starts its background
+components, so a slow or missing socket never blocks startup.
+"""
+import asyncio
+import os
+import threading
+
+import docker
+from docker.utils import version_lt
+
+from disk_usage import DiskUsage
+from executor import BlockingExecutor
+from inventory import Inventory, InventoryUnavailable
+from layers import LayerGraph
+from perf import perf
+from stats_collector import StatsCollector
+from utils import DEBUG, ERROR, WARNING, debug_print, env_float, env_int
+
+DEFAULT_HOST = 'local'
+
+
+class UnknownHost(Exception):
+    """Raised when a request names a host that is not configured."""
+
+
+class HostBusy(Exception):
+    """Raised when a host already has as many fleet calls running as it may."""
+
+
+def parse_hosts(spec):
+    hosts = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, url = part.partition('=')
+        if not sep:
+            # Bare URL; name it after its address
+            name, url = part.split('://', 1)[-1].split('@')[-1].split(':')[0], part
+        hosts.append((name.strip(), url.strip()))
+    return hosts
+
+
+class Host:
+    def __init__(self, name, url=None, pool_size=None, max_calls=None):
+        self.name = name
+        self.url = url
+        # Fleet calls allowed to run against this host at once
+        self.max_calls = max_calls or env_int('FLEET_HOST_CONCURRENCY', 4)
+        self._calls = 0
+        self._calls_lock = threading.Lock()
+        self.pinned_version = os.environ.get('DOCKER_API_VERSION')
+        # Without a url, DOCKER_HOST, DOCKER_TLS_VERIFY and DOCKER_CERT_PATH apply
+        kwargs = {'base_url': url} if url else docker.utils.kwargs_from_env()
+        self.client = docker.DockerClient(
+            **kwargs,
+            # A fixed version avoids the client's version probe on creation;
+            # connect() settles the real one in the background
+            version=self.pinned_version or docker.constants.DEFAULT_DOCKER_API_VERSION,
+            max_pool_size=pool_size or env_int('DOCKER_POOL_SIZE', 10),
+            # Use the system ssh client so ssh:// hosts don't need paramiko
+            use_ssh_client=(kwargs.get('base_url') or '').startswith('ssh://'),
+        )
+        perf.instrument_client(self.client)
+        self.inventory = Inventory(self.client)
+        self.stats_collector = StatsCollector(self.client, self.inventory)
+        self.layers = LayerGraph(self.client, self.inventory)
+        # Volume mountpoints can only be scanned on the machine we run on
+        self.disk_usage = DiskUsage(self.client, self.inventory, scan=not url or url.startswith('unix://'))
+        self.connected = False
+        self.attempts = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Connect and start the background components, without blocking."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._start, name=f'host-{self.name}', daemon=True)
+        self._thread.start()
+
+    def _start(self):
+        if not self.connect():
+            return
+        self.stats_collector.start()
+        self.inventory.start()
+        self.disk_usage.start()
+        self.layers.start()
+
+    def connect(self, max_backoff=30):
+        """Ping the daemon until it answers, then settle the API version.
+
+        Returns False if the host was stopped first.
+        """
+        backoff = 0.5
+        while not self._stop.is_set():
+            self.attempts += 1
+            try:
+                server = self.client.api.version(api_version=False)
+            except Exception as e:
+                self.error = str(e)
+                debug_print(f"Host {self.name} unreachable, retrying in {backoff}s: {str(e)}", WARNING)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, max_backoff)
+                continue
+            if not self.pinned_version and server.get('ApiVersion'):
+                # Like `version='auto'`, capped at what the library supports
+                default = docker.constants.DEFAULT_DOCKER_API_VERSION
+                self.client.api._version = server['ApiVersion'] if version_lt(server['ApiVersion'], default) else default
+            self.connected = True
+            self.error = None
+            debug_print(f"Connected to host {self.name}", host=self.name, api_version=self.client.api._version,
+                        attempts=self.attempts)
+            return True
+        return False
+
+    @property
+    def busy(self):
+        return self._calls >= self.max_calls
+
+    def call(self, fn):
+        """Return fn(self), counted against max_calls until it returns."""
+        with self._calls_lock:
+            if self._calls >= self.max_calls:
+                raise HostBusy(f"Host {self.name} already has {self._calls} calls running")
+            self._calls += 1
+        try:
+            return fn(self)
+        finally:
+            with self._calls_lock:
+                self._calls -= 1
+
+    @property
+    def ready(self):
+        # Serving from the cache: loaded once and not past its staleness bound
+        return self.connected and self.inventory.loaded and not self.inventory.is_stale()
+
+    def status(self):
+        return {
+            'name': self.name,
+            'ready': self.ready,
+            'connected': self.connected,
+            'loaded': self.inventory.loaded,
+            'stale': self.inventory.is_stale(),
+            'apiVersion': self.client.api._version if self.connected else None,
+            'attempts': self.attempts,
+            'calls': self._calls,
+            'error': self.error,
+        }
+
+    def stop(self):
+        self._stop.set()
+        self.layers.stop()
+        self.disk_usage.stop()
+        self.stats_collector.stop()
+        self.inventory.stop()
+
+
+class HostRegistry:
+    def __init__(self, spec=None, timeout=None):
+        spec = spec if spec is not None else os.environ.get('DOCKER_HOSTS')
+        self.timeout = timeout or env_float('FLEET_HOST_TIMEOUT', 10.0)
+        self._hosts = {}
+        for name, url in parse_hosts(spec):
+            self._hosts[name] = Host(name, url)
+        if not self._hosts:
+            self._hosts[DEFAULT_HOST] = Host(DEFAULT_HOST)
+        # Enough workers for every host's quota, so stuck hosts can't starve the rest
+        self.executor = BlockingExecutor(
+            max_workers=sum(host.max_calls for host in self._hosts.values()),
+            timeout=self.timeout,
+        )
+
+    @property
+    def default(self):
+        # The first configured host serves requests that don't name one
+        return next(iter(self._hosts.values()))
+
+    def names(self):
+        return list(self._hosts)
+
+    def get(self, name=None):
+        if not name:
+            return self.default
+        host = self._hosts.get(name)
+        if host is None:
+            raise UnknownHost(f"Unknown host: {name}")
+        return host
+
+    def select(self, names=None):
+        """Hosts named in a comma-separated list, or every host if empty."""
+        if not names:
+            return list(self._hosts.values())
+        return [self.get(name) for name in dict.fromkeys(n.strip() for n in names.split(',') if n.strip())]
+
+    def start(self):
+        for host in self._hosts.values():
+            host.start()
+
+    def stop(self):
+        for host in self._hosts.values():
+            host.stop()
+        self.executor.shutdown()
+
+    def loaded(self):
+        """Whether every host has connected and loaded its inventory once."""
+        return all(host.inventory.loaded for host in self._hosts.values())
+
+    async def _run(self, fn, host):
+        if not host.inventory.loaded:
+            # The host's own thread does the first load; never from a request
+            raise InventoryUnavailable(f"Host {host.name} is not loaded yet")
+        if host.busy:
+            raise HostBusy(f"Host {host.name} already has {host.max_calls} calls running")
+        return await self.executor.run(host.call, fn, timeout=self.timeout)
+
+    async def gather(self, fn, hosts):
+        """Run fn(host) for each host concurrently on the fleet pool.
+
+        Returns ({host name: result}, {host name: exception}); each host is
+        bounded by the per-host timeout and call quota so one slow node can't
+        hold up the rest.
+        """
+        outcomes = await asyncio.gather(*(self._run(fn, host) for host in hosts), return_exceptions=True)
+        results = {}
+        errors = {}
+        for host, outcome in zip(hosts, outcomes):
+            if isinstance(outcome, Exception):
+                # Loading and busy hosts are expected while a node is down; don't log every request
+                level = DEBUG if isinstance(outcome, (InventoryUnavailable, HostBusy)) else ERROR
+                debug_print(f"Error on host {host.name}: {str(outcome)}", level)
+                errors[host.name] = outcome
+            else:
+                results[host.name] = outcome
+        return results, errors
@@ -0,0 +1,164 @@
+"""
+Conditional GETs and compressed, pre-serialized responses for list endpoints.
+
+Each cached entry holds a collection's JSON bytes and, lazily, its gzip or
+brotli encodings, keyed by request and tagged with a strong ETag derived from
+the inventory generation the data was built from. The inventory's random
+epoch is part of the tag too, so uvicorn workers or restarts that reach the
+same generation number with different data never share one. While the
+inventory is unchanged, polls are answered from the stored bytes, or with
+304 Not Modified when the client already has them.
+
+Responses are encoded with orjson when it is installed, and with the
+standard library otherwise.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from fastapi.responses import JSONResponse, Response
+
+from utils import env_int
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # Inventory records and other read-only mappings
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_bytes(content):
+    """Compact UTF-8 JSON, as JSONResponse would produce it."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':'), default=_default
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return json_bytes(content)
+
+
+def etag_for(key, version):
+    digest = hashlib.sha1(repr((key, version)).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Compare opaque tags; W/ prefixes are ignored for If-None-Match
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+class CachedBody:
+    __slots__ = ('etag', 'headers', 'body', 'encoded', '_lock')
+
+    def __init__(self, content, etag=None, headers=None):
+        self.etag = etag
+        self.headers = headers or {}
+        self.body = json_bytes(content)
+        self.encoded = {}
+        self._lock = threading.Lock()
+
+    def encode(self, encoding):
+        data = self.encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self.encoded.get(encoding)
+                if data is None:
+                    if encoding == 'br':
+                        data = brotli.compress(self.body, quality=5)
+                    else:
+                        data = gzip.compress(self.body, compresslevel=6, mtime=0)
+                    self.encoded[encoding] = data
+        return data
+
+
+class ResponseCache:
+    def __init__(self, max_entries=None, min_compress=None):
+        self.max_entries = max_entries or env_int('HTTP_CACHE_ENTRIES', 256)
+        self.min_compress = min_compress if min_compress is not None else env_int('HTTP_COMPRESS_MIN_BYTES', 1024)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.etag != etag:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def store(self, key, content, etag, headers=None):
+        entry = CachedBody(content, etag, headers)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, request, entry, headers=None):
+        """Build the response for an entry, honouring If-None-Match and Accept-Encoding."""
+        headers = {**entry.headers, **(headers or {})}
+        if entry.etag is not None:
+            headers['ETag'] = entry.etag
+            # Let clients keep the body but revalidate on every poll
+            headers['Cache-Control'] = 'no-cache'
+            if etag_matches(request.headers.get('if-none-match'), entry.etag):
+                with self._lock:
+                    self._not_modified += 1
+                return Response(status_code=304, headers=headers)
+
+        body = entry.body
+        if len(body) >= self.min_compress:
+            headers['Vary'] = 'Accept-Encoding'
+            accepted = accepted_encodings(request.headers.get('accept-encoding'))
+            encoding = 'br' if brotli is not None and 'br' in accepted else 'gzip' if 'gzip' in accepted else None
+            if encoding:
+                body = entry.encode(encoding)
+                headers['Content-Encoding'] = encoding
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'not_modified': self._not_modified,
+            }
@@ -0,0 +1,768 @@
+"""
+In-memory inventory of Docker containers, images, networks and volumes.
+
+The inventory is loaded once and then kept current by consuming the daemon
+event stream, refreshing or evicting only the objects an event refers to.
+A full resync happens when the stream reconnects after a drop, and every
+`resync_interval` seconds only if that is set. While the stream is down,
+cached data is served for at most `max_staleness` seconds; after that
+readers trigger a full resync from the daemon. Readers
+never wait for a sync another thread is running, and never do the first
+load themselves: that is left to the event thread.
+
+A resync lists each kind once. Images are built from the listing; only ids
+not already cached are inspected, since an image id's layers never change.
+
+Objects are kept as compact records (see records.py). The full inspect
+payload that detail views need is fetched on demand and kept in a small
+LRU, dropped whenever the object changes.
+"""
+import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import docker
+
+from records import ContainerRecord, ImageRecord, NetworkRecord, VolumeRecord, compact_host_config, compact_state
+from utils import ERROR, WARNING, debug_print, env_float, env_int
+
+CONTAINER = 'container'
+IMAGE = 'image'
+NETWORK = 'network'
+VOLUME = 'volume'
+KINDS = (CONTAINER, IMAGE, NETWORK, VOLUME)
+
+# Container event actions that do not change inspect data
+IGNORED_CONTAINER_ACTIONS = {
+    'attach', 'detach', 'resize', 'top', 'export', 'commit', 'copy',
+    'archive-path', 'extract-to-dir', 'exec_create', 'exec_start',
+    'exec_die', 'exec_detach',
+}
+IGNORED_IMAGE_ACTIONS = {'save', 'push'}
+
+
+class InventoryUnavailable(Exception):
+    """Raised when the inventory has not finished its first load."""
+
+
+def _is_hex(value):
+    return len(value) >= 4 and all(c in '0123456789abcdef' for c in value)
+
+
+def _discard(index, key, member):
+    members = index.get(key)
+    if members is not None:
+        members.discard(member)
+        if not members:
+            del index[key]
+
+
+def _is_wildcard(host_ip):
+    return host_ip in ('', '0.0.0.0', '::')
+
+
+def host_ips_overlap(a, b):
+    """Whether two bindings of the same port/proto would compete for it."""
+    if a == b or a == '' or b == '':
+        return True
+    if (':' in a) != (':' in b):
+        return False
+    return _is_wildcard(a) or _is_wildcard(b)
+
+
+def published_ports(attrs):
+    """Return [(host ip, host port, proto, container port)] a running container publishes."""
+    if not (attrs.get('State') or {}).get('Running'):
+        return []
+    ports = (attrs.get('NetworkSettings') or {}).get('Ports') or {}
+    published = []
+    for key, bindings in ports.items():
+        container_port, _, proto = key.partition('/')
+        for binding in bindings or []:
+            try:
+                host_port = int(binding.get('HostPort') or 0)
+            except ValueError:
+                continue
+            if host_port:
+                published.append((binding.get('HostIp') or '', host_port, proto or 'tcp', container_port))
+    return published
+
+
+def summary_ports(ports):
+    """Convert the list payload's port list to the inspect `Ports` mapping."""
+    mapping = {}
+    for port in ports or []:
+        key = f"{port['PrivatePort']}/{port.get('Type', 'tcp')}"
+        bindings = mapping.setdefault(key, None)
+        if port.get('PublicPort'):
+            if bindings is None:
+                bindings = mapping[key] = []
+            bindings.append({'HostIp': port.get('IP', ''), 'HostPort': str(port['PublicPort'])})
+    return mapping
+
+
+def container_from_summary(summary):
+    """Build an inspect-shaped container record from a `/containers/json` entry.
+
+    Only the fields the list endpoints use are filled in; `State` is the
+    compact form {Status, Running, Paused, Restarting, Dead}.
+    """
+    names = summary.get('Names') or []
+    created = summary.get('Created')
+    if isinstance(created, (int, float)):
+        created = datetime.datetime.fromtimestamp(created, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    network_mode = (summary.get('HostConfig') or {}).get('NetworkMode')
+    networks = (summary.get('NetworkSettings') or {}).get('Networks') or {}
+    return ContainerRecord(
+        Id=summary['Id'],
+        Name=names[0] if names else '',
+        Image=summary.get('ImageID', ''),
+        Created=created or '',
+        State=compact_state(summary.get('State') or ''),
+        Config={
+            'Image': summary.get('Image', ''),
+            'Labels': summary.get('Labels') or {},
+        },
+        HostConfig=compact_host_config(network_mode),
+        Mounts=[
+            {key: mount.get(key) for key in ('Type', 'Name', 'Source', 'Destination')}
+            for mount in summary.get('Mounts') or []
+        ],
+        NetworkSettings={
+            'Ports': summary_ports(summary.get('Ports')),
+            # Endpoint ids, gateways and the like are in the full inspect
+            'Networks': {
+                name: {
+                    'NetworkID': endpoint.get('NetworkID', ''),
+                    'IPAddress': endpoint.get('IPAddress', ''),
+                    'GlobalIPv6Address': endpoint.get('GlobalIPv6Address', ''),
+                    'MacAddress': endpoint.get('MacAddress', ''),
+                }
+                for name, endpoint in networks.items() if endpoint
+            },
+        },
+    )
+
+
+class Inventory:
+    def __init__(self, client, max_staleness=None, resync_interval=None):
+        self.client = client
+        self.max_staleness = (
+            max_staleness if max_staleness is not None
+            else env_float('INVENTORY_MAX_STALENESS', 30.0)
+        )
+        self.resync_interval = (
+            resync_interval if resync_interval is not None
+            else env_float('INVENTORY_RESYNC_INTERVAL', 0.0)
+        )
+        self._objects = {kind: {} for kind in KINDS}
+        # Reverse index: image id -> ids of containers created from it
+        self._image_users = {}
+        # Reverse index: network id -> ids of containers attached to it
+        self._network_users = {}
+        # Container id -> ports it publishes on the host, see published_ports()
+        self._published = {}
+        # Reverse index: (host port, proto) -> {(host ip, container id, container port)}
+        self._host_ports = {}
+        # (host port, proto) keys bound by more than one container on overlapping IPs
+        self._port_conflicts = set()
+        # Memoized image id -> display tag, dropped when the image changes
+        self._image_tags = {}
+        # (kind, key) -> full inspect payload, least recently used first
+        self._inspected = OrderedDict()
+        self.inspect_cache_size = env_int('INSPECT_CACHE_SIZE', 256)
+        self._inspect_hits = 0
+        self._inspect_misses = 0
+        # Bumped whenever inspect entries are dropped; a fetch that raced one isn't kept
+        self._inspect_invalidations = 0
+        # Bumped on every change to the cached objects; lets callers tell
+        # whether anything changed since they last looked
+        self.generation = 0
+        # Random per instance: generations only compare within one process,
+        # and uvicorn workers or restarts each count from 0
+        self.epoch = uuid.uuid4().hex
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._listeners = []
+        # Monotonic time at which the cache was last known to be current
+        self._synced_at = None
+        # Set once the first full load has completed
+        self._loaded = threading.Event()
+        self._stream_alive = False
+        self._stream = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name='inventory-events', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def add_listener(self, callback):
+        """Register callback(kind, action, key, attrs) for every change.
+
+        `action` is 'update' or 'remove'; `attrs` is None for removals.
+        Callbacks run on the event thread and must not block.
+        """
+        self._listeners.append(callback)
+
+    # Reads
+
+    def is_stale(self):
+        if self._synced_at is None:
+            return True
+        if self._stream_alive:
+            return False
+        return time.monotonic() - self._synced_at > self.max_staleness
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set()
+
+    def wait_loaded(self, timeout=None):
+        """Block until the first full load completes; return whether it has."""
+        return self._loaded.wait(timeout)
+
+    def ensure_fresh(self):
+        """Resync a stale cache from the caller's thread, unless a sync is already running.
+
+        While one is, the cached objects are served as they are. Raises
+        InventoryUnavailable before the first load, which the event thread does.
+        """
+        if not self.is_stale():
+            return
+        if not self.loaded:
+            raise InventoryUnavailable("Inventory has not loaded yet")
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.is_stale():
+                return
+            changes = self._sync()
+        finally:
+            self._sync_lock.release()
+        self._notify_changes(*changes)
+
+    def list(self, kind):
+        self.ensure_fresh()
+        with self._lock:
+            return list(self._objects[kind].values())
+
+    def get(self, kind, ref):
+        """Return attrs for an id, name, tag or unique id prefix.
+
+        Falls back to a single daemon inspect for objects the cache has not
+        seen yet; raises docker.errors.NotFound if the daemon doesn't know it.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            attrs = self._lookup(kind, ref)
+        if attrs is None:
+            attrs = self._fetch(kind, ref)
+            self._store(kind, attrs)
+        return attrs
+
+    def peek(self, kind, key):
+        """Return cached attrs for an exact key without touching the daemon."""
+        with self._lock:
+            return self._objects[kind].get(key)
+
+    def inspect(self, kind, ref):
+        """Return the full inspect payload for an object, for detail views.
+
+        Served from an LRU while the event stream keeps it current; raises
+        docker.errors.NotFound if the daemon doesn't know the object.
+        """
+        with self._lock:
+            attrs = self._lookup(kind, ref)
+            cache_key = (kind, self._key(kind, attrs)) if attrs is not None else None
+            if cache_key in self._inspected and not self.is_stale():
+                self._inspected.move_to_end(cache_key)
+                self._inspect_hits += 1
+                return self._inspected[cache_key]
+            self._inspect_misses += 1
+            invalidations = self._inspect_invalidations
+        api = self.client.api
+        ref = cache_key[1] if cache_key else ref
+        if kind == CONTAINER:
+            full = api.inspect_container(ref)
+        elif kind == IMAGE:
+            full = api.inspect_image(ref)
+        elif kind == NETWORK:
+            full = api.inspect_network(ref)
+        else:
+            full = api.inspect_volume(ref)
+        with self._lock:
+            cache_key = (kind, self._key(kind, full))
+            # Only objects the inventory tracks get invalidated, so only they are
+            # kept, and not if an event or resync during the fetch dropped entries
+            if (cache_key[1] in self._objects[kind] and self.inspect_cache_size > 0
+                    and self._inspect_invalidations == invalidations):
+                self._inspected[cache_key] = full
+                self._inspected.move_to_end(cache_key)
+                while len(self._inspected) > self.inspect_cache_size:
+                    self._inspected.popitem(last=False)
+        return full
+
+    def inspect_stats(self):
+        with self._lock:
+            return {
+                'size': len(self._inspected),
+                'max_size': self.inspect_cache_size,
+                'hits': self._inspect_hits,
+                'misses': self._inspect_misses,
+            }
+
+    def touch(self):
+        """Bump `generation` when data derived from the cache changed."""
+        with self._lock:
+            self.generation += 1
+
+    def snapshot(self, kind):
+        """Return a copy of the cached objects of a kind, keyed by id, as-is."""
+        with self._lock:
+            return dict(self._objects[kind])
+
+    def image_users(self, image_id):
+        """Return the cached containers created from an image."""
+        self.ensure_fresh()
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            return [containers[key] for key in self._image_users.get(image_id, ())]
+
+    def network_users(self, network_id):
+        """Return the cached containers attached to a network."""
+        self.ensure_fresh()
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            return [containers[key] for key in self._network_users.get(network_id, ())]
+
+    def resolve_containers(self, ids):
+        """Return {id: attrs} for container ids, with one listing call for cache misses.
+
+        Ids the daemon does not know (e.g. remote swarm endpoints) are left out.
+        """
+        self.ensure_fresh()
+        found = {}
+        missing = []
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            for container_id in ids:
+                if container_id in containers:
+                    found[container_id] = containers[container_id]
+                else:
+                    missing.append(container_id)
+        if missing:
+            for summary in self.client.api.containers(all=True, filters={'id': missing}):
+                if summary['Id'] in missing:
+                    attrs = container_from_summary(summary)
+                    self._store(CONTAINER, attrs)
+                    found[attrs['Id']] = attrs
+        return found
+
+    def image_tag(self, image_id):
+        """Return the first tag of a cached image, or None if it has none."""
+        try:
+            return self._image_tags[image_id]
+        except KeyError:
+            pass
+        with self._lock:
+            image = self._objects[IMAGE].get(image_id)
+            tag = (image.get('RepoTags') or [None])[0] if image else None
+            if image is not None:
+                self._image_tags[image_id] = tag
+        return tag
+
+    def image_usage(self):
+        """Return {image id: number of containers} for images in use."""
+        self.ensure_fresh()
+        with self._lock:
+            return {image_id: len(keys) for image_id, keys in self._image_users.items()}
+
+    def publishing_containers(self):
+        """Return the cached running containers that publish host ports."""
+        self.ensure_fresh()
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            return [containers[key] for key in self._published]
+
+    def port_owners(self, port, proto='tcp', host_ip=None):
+        """Return [(host ip, container attrs, container port)] bound to a host port.
+
+        With host_ip, only bindings that would compete with that address.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            return [
+                (ip, containers[key], container_port)
+                for ip, key, container_port in sorted(self._host_ports.get((port, proto), ()))
+                if host_ip is None or host_ips_overlap(ip, host_ip)
+            ]
+
+    def port_conflicts(self):
+        """Return {(host port, proto): [(host ip, container attrs, container port)]}
+        for ports bound by more than one container on overlapping addresses."""
+        self.ensure_fresh()
+        with self._lock:
+            containers = self._objects[CONTAINER]
+            return {
+                port_key: [
+                    (ip, containers[key], container_port)
+                    for ip, key, container_port in sorted(self._host_ports[port_key])
+                ]
+                for port_key in sorted(self._port_conflicts)
+            }
+
+    def free_ports(self, count=1, start=1024, end=65535, proto='tcp', host_ip=''):
+        """Return up to `count` ports in [start, end] no container publishes.
+
+        Only Docker's own bindings are known; a port may still be taken by a
+        process on the host outside Docker.
+        """
+        self.ensure_fresh()
+        free = []
+        with self._lock:
+            for port in range(max(start, 1), min(end, 65535) + 1):
+                bindings = self._host_ports.get((port, proto))
+                if not bindings or not any(host_ips_overlap(ip, host_ip) for ip, _, _ in bindings):
+                    free.append(port)
+                    if len(free) >= count:
+                        break
+        return free
+
+    def containers(self):
+        return self.list(CONTAINER)
+
+    def images(self):
+        return self.list(IMAGE)
+
+    def networks(self):
+        return self.list(NETWORK)
+
+    def volumes(self):
+        return self.list(VOLUME)
+
+    def container(self, ref):
+        return self.get(CONTAINER, ref)
+
+    def image(self, ref):
+        return self.get(IMAGE, ref)
+
+    def network(self, ref):
+        return self.get(NETWORK, ref)
+
+    def volume(self, ref):
+        return self.get(VOLUME, ref)
+
+    # Full resync
+
+    def resync(self, force=True):
+        with self._sync_lock:
+            if not force and not self.is_stale():
+                # Another thread resynced while we were waiting
+                return
+            changes = self._sync()
+        self._notify_changes(*changes)
+
+    def _sync(self):
+        """Reload everything; called with the sync lock held. Returns (previous, fresh)."""
+        started = time.monotonic()
+        fresh = {kind: self._load(kind) for kind in KINDS}
+        with self._lock:
+            previous = self._objects
+            self._objects = fresh
+            self._image_users = {}
+            self._network_users = {}
+            self._published = {}
+            self._host_ports = {}
+            self._port_conflicts = set()
+            self._image_tags = {}
+            self._inspected.clear()
+            self._inspect_invalidations += 1
+            for key, attrs in fresh[CONTAINER].items():
+                self._index_container(key, attrs)
+            if fresh != previous:
+                self.generation += 1
+            self._synced_at = started
+            self._loaded.set()
+        debug_print(
+            "Inventory synced: "
+            + ", ".join(f"{len(fresh[kind])} {kind}s" for kind in KINDS)
+        )
+        return previous, fresh
+
+    def _notify_changes(self, previous, fresh):
+        for kind in KINDS:
+            for key, attrs in fresh[kind].items():
+                if previous[kind].get(key) != attrs:
+                    self._notify(kind, 'update', key, attrs)
+            for key in previous[kind].keys() - fresh[kind].keys():
+                self._notify(kind, 'remove', key, None)
+
+    def _load(self, kind):
+        api = self.client.api
+        if kind == CONTAINER:
+            # One listing call; the summary has everything the list views need
+            summaries = api.containers(all=True)
+            return {summary['Id']: container_from_summary(summary) for summary in summaries}
+        if kind == VOLUME:
+            # The volume list payload already carries the inspect fields
+            volumes = api.volumes().get('Volumes') or []
+            return {volume['Name']: VolumeRecord(volume) for volume in volumes}
+
+        if kind == IMAGE:
+            summaries = api.images()
+            with self._lock:
+                cached = dict(self._objects[IMAGE])
+        else:
+            summaries = api.networks()
+            cached = {}
+        objects = {}
+        for summary in summaries:
+            record = cached.get(summary['Id'])
+            if record is not None:
+                # Only tags and size change for an image id
+                objects[summary['Id']] = record.with_summary(summary)
+                continue
+            try:
+                attrs = self._fetch(kind, summary['Id'])
+            except docker.errors.NotFound:
+                # Removed between the listing and the inspect
+                continue
+            objects[self._key(kind, attrs)] = attrs
+        return objects
+
+    # Event stream
+
+    def _watch(self):
+        backoff = 1
+        while not self._stop.is_set():
+            since = int(time.time())
+            # With a resync interval, ask the daemon to close the stream then so
+            # a periodic full resync catches anything the events missed
+            until = since + max(int(self.resync_interval), 1) if self.resync_interval > 0 else None
+            try:
+                self.resync(force=True)
+                self._stream = self.client.events(decode=True, since=since, until=until)
+                self._stream_alive = True
+                backoff = 1
+                for event in self._stream:
+                    self._apply(event)
+            except Exception as e:
+                debug_print(f"Error in inventory event stream: {str(e)}", ERROR)
+            finally:
+                if self._stream_alive:
+                    # Everything up to the drop was seen; the staleness window starts now
+                    self._synced_at = time.monotonic()
+                self._stream_alive = False
+                self._stream = None
+
+            if self._stop.is_set():
+                break
+            if until is None or time.time() < until - 1:
+                debug_print(f"Inventory event stream dropped, reconnecting in {backoff}s", WARNING)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _apply(self, event):
+        kind = event.get('Type')
+        action = (event.get('Action') or event.get('status') or '').split(':')[0].strip()
+        actor = event.get('Actor') or {}
+        object_id = actor.get('ID') or event.get('id')
+        if not object_id:
+            return
+
+        if kind == CONTAINER:
+            if action in IGNORED_CONTAINER_ACTIONS:
+                return
+            if action == 'destroy':
+                self._evict(CONTAINER, object_id)
+            else:
+                self._refresh(CONTAINER, object_id)
+        elif kind == IMAGE:
+            if action in IGNORED_IMAGE_ACTIONS:
+                return
+            if action == 'delete':
+                self._evict(IMAGE, object_id)
+                return
+            attrs = self._refresh(IMAGE, object_id)
+            if attrs is not None:
+                # A pull or tag can move tags away from an older image
+                tags = set(attrs.get('RepoTags') or [])
+                with self._lock:
+                    previous_owners = [
+                        key for key, image in self._objects[IMAGE].items()
+                        if key != attrs['Id'] and tags.intersection(image.get('RepoTags') or [])
+                    ]
+                for key in previous_owners:
+                    self._refresh(IMAGE, key)
+        elif kind == NETWORK:
+            if action in ('destroy', 'remove'):
+                self._evict(NETWORK, object_id)
+            else:
+                self._refresh(NETWORK, object_id)
+            container_id = (actor.get('Attributes') or {}).get('container')
+            if container_id and action in ('connect', 'disconnect'):
+                self._refresh(CONTAINER, container_id)
+        elif kind == VOLUME:
+            if action == 'destroy':
+                self._evict(VOLUME, object_id)
+            elif action == 'create':
+                self._refresh(VOLUME, object_id)
+
+    def _refresh(self, kind, ref):
+        try:
+            attrs = self._fetch(kind, ref)
+        except docker.errors.NotFound:
+            self._evict(kind, ref)
+            return None
+        self._store(kind, attrs)
+        return attrs
+
+    # Storage helpers
+
+    def _fetch(self, kind, ref):
+        api = self.client.api
+        if kind == CONTAINER:
+            summary = self._container_summary(ref)
+            if summary is None:
+                raise docker.errors.NotFound(f"No such container: {ref}")
+            return container_from_summary(summary)
+        if kind == IMAGE:
+            return ImageRecord(api.inspect_image(ref))
+        if kind == NETWORK:
+            return NetworkRecord(api.inspect_network(ref))
+        return VolumeRecord(api.inspect_volume(ref))
+
+    def _container_summary(self, ref):
+        api = self.client.api
+        ref = ref.lstrip('/')
+        for summary in api.containers(all=True, filters={'id': ref}):
+            if summary['Id'].startswith(ref):
+                return summary
+        # The name filter is a substring match; keep only the exact name
+        for summary in api.containers(all=True, filters={'name': ref}):
+            if f"/{ref}" in (summary.get('Names') or []):
+                return summary
+        return None
+
+    @staticmethod
+    def _key(kind, attrs):
+        return attrs['Name'] if kind == VOLUME else attrs['Id']
+
+    def _lookup(self, kind, ref):
+        objects = self._objects[kind]
+        if ref in objects:
+            return objects[ref]
+        if kind == VOLUME:
+            return None
+
+        matches = []
+        for key, attrs in objects.items():
+            if kind == IMAGE:
+                tags = attrs.get('RepoTags') or []
+                if ref in tags or f"{ref}:latest" in tags:
+                    return attrs
+                short_ref = ref[len('sha256:'):] if ref.startswith('sha256:') else ref
+                if _is_hex(short_ref) and key.split(':', 1)[-1].startswith(short_ref):
+                    matches.append(attrs)
+            else:
+                if attrs.get('Name', '').lstrip('/') == ref.lstrip('/'):
+                    return attrs
+                if key.startswith(ref):
+                    matches.append(attrs)
+        return matches[0] if len(matches) == 1 else None
+
+    def _store(self, kind, attrs):
+        key = self._key(kind, attrs)
+        with self._lock:
+            previous = self._objects[kind].get(key)
+            if kind == CONTAINER:
+                if previous is not None:
+                    self._unindex_container(key, previous)
+                self._index_container(key, attrs)
+            elif kind == IMAGE:
+                self._image_tags.pop(key, None)
+            # Events can change inspect-only fields the record doesn't hold
+            self._inspected.pop((kind, key), None)
+            self._inspect_invalidations += 1
+            self._objects[kind][key] = attrs
+            if attrs != previous:
+                self.generation += 1
+        self._notify(kind, 'update', key, attrs)
+
+    def _evict(self, kind, ref):
+        with self._lock:
+            attrs = self._lookup(kind, ref)
+            if attrs is None:
+                return
+            key = self._key(kind, attrs)
+            self._objects[kind].pop(key, None)
+            self._inspected.pop((kind, key), None)
+            self._inspect_invalidations += 1
+            self.generation += 1
+            if kind == CONTAINER:
+                self._unindex_container(key, attrs)
+            elif kind == IMAGE:
+                self._image_tags.pop(key, None)
+        self._notify(kind, 'remove', key, None)
+
+    def _index_container(self, key, attrs):
+        self._image_users.setdefault(attrs.get('Image'), set()).add(key)
+        for network_id in self._container_networks(attrs):
+            self._network_users.setdefault(network_id, set()).add(key)
+        published = published_ports(attrs)
+        if published:
+            self._published[key] = published
+            for host_ip, host_port, proto, container_port in published:
+                self._host_ports.setdefault((host_port, proto), set()).add((host_ip, key, container_port))
+                self._check_conflict((host_port, proto))
+
+    def _unindex_container(self, key, attrs):
+        _discard(self._image_users, attrs.get('Image'), key)
+        for network_id in self._container_networks(attrs):
+            _discard(self._network_users, network_id, key)
+        for host_ip, host_port, proto, container_port in self._published.pop(key, ()):
+            _discard(self._host_ports, (host_port, proto), (host_ip, key, container_port))
+            self._check_conflict((host_port, proto))
+
+    def _check_conflict(self, port_key):
+        bindings = list(self._host_ports.get(port_key, ()))
+        conflict = any(
+            a[1] != b[1] and host_ips_overlap(a[0], b[0])
+            for i, a in enumerate(bindings) for b in bindings[i + 1:]
+        )
+        if conflict:
+            self._port_conflicts.add(port_key)
+        else:
+            self._port_conflicts.discard(port_key)
+
+    @staticmethod
+    def _container_networks(attrs):
+        networks = (attrs.get('NetworkSettings') or {}).get('Networks') or {}
+        return [network['NetworkID'] for network in networks.values() if network and network.get('NetworkID')]
+
+    def _notify(self, kind, action, key, attrs):
+        for callback in self._listeners:
+            try:
+                callback(kind, action, key, attrs)
+            except Exception as e:
+                debug_print(f"Error in inventory listener: {str(e)}", ERROR)
@@ -0,0 +1,268 @@
+"""
+Image layer graph.
+
+Images share base layers, so summing image sizes overstates disk usage. The
+graph maps each image to its layer chain and works out, per image, how many
+of its bytes are shared with other images, how many would be freed by
+removing it, and which image it was built on (its parent: the image whose
+whole chain is the longest prefix of this one's) and which were built on it.
+
+Layers are identified by ChainID, a digest of a layer's diff id and every
+layer below it, which is how the daemon stores them: the same diff on a
+different base is a different layer on disk. `RootFS.Layers` comes from the
+inventory's cached inspect data; layer sizes come from the image history.
+An image id's layers and history never change, so each image's history is
+fetched once, in the background when the image first appears, and kept
+until the image is removed. The graph is rebuilt from those caches only
+when the set of images changes.
+"""
+import hashlib
+import threading
+
+import docker
+
+from inventory import IMAGE
+from utils import ERROR, debug_print
+
+
+def chain_ids(diff_ids):
+    """ChainIDs for a layer stack, as the daemon computes them."""
+    chain = []
+    for diff_id in diff_ids:
+        if chain:
+            diff_id = 'sha256:' + hashlib.sha256(f"{chain[-1]} {diff_id}".encode('ascii')).hexdigest()
+        chain.append(diff_id)
+    return chain
+
+
+def layer_sizes(diff_ids, history):
+    """Sizes of an image's layers, bottom first, from its history; None if they can't be matched.
+
+    History is newest first and also has entries for steps that only change
+    metadata. Those have no layer and a size of 0.
+    """
+    sizes = [entry.get('Size') or 0 for entry in reversed(history or [])]
+    if len(sizes) != len(diff_ids):
+        sizes = [size for size in sizes if size > 0]
+    if len(sizes) != len(diff_ids):
+        # Zero-size layers can't be told apart from metadata steps
+        return None
+    return sizes
+
+
+def _estimated(graph, image_ids):
+    # Unique bytes of images whose layer sizes aren't known yet
+    nodes = graph['images']
+    return sum(nodes[image_id]['unique'] for image_id in image_ids if not nodes[image_id]['known'])
+
+
+class LayerGraph:
+    def __init__(self, client, inventory):
+        self.client = client
+        self.inventory = inventory
+        self._lock = threading.Lock()
+        # Image id -> history; immutable for the image's lifetime
+        self._history = {}
+        self._graph = None
+        # Bumped whenever the graph must be rebuilt
+        self._version = 0
+        self._wanted = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        inventory.add_listener(self._on_change)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='layer-graph', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wanted.set()
+
+    def _on_change(self, kind, action, key, attrs):
+        if kind != IMAGE:
+            return
+        with self._lock:
+            if action == 'remove':
+                self._history.pop(key, None)
+            elif key in self._history:
+                # Retagged or otherwise updated, same layers
+                return
+            self._invalidate()
+        if action != 'remove':
+            self._wanted.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wanted.wait()
+            self._wanted.clear()
+            try:
+                self.fill()
+            except Exception as e:
+                debug_print(f"Error reading image history: {str(e)}", ERROR)
+                self._stop.wait(5)
+
+    def fill(self):
+        """Fetch the history of every cached image that doesn't have one yet."""
+        fetched = 0
+        for image_id in self.inventory.snapshot(IMAGE):
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if image_id in self._history:
+                    continue
+            try:
+                self._store(image_id, self.client.api.history(image_id))
+            except docker.errors.NotFound:
+                continue
+            fetched += 1
+        if fetched:
+            # Rows built from the graph are cached by inventory generation
+            self.inventory.touch()
+
+    def _store(self, image_id, history):
+        with self._lock:
+            self._history[image_id] = history
+            self._invalidate()
+
+    def _invalidate(self):
+        self._graph = None
+        self._version += 1
+
+    def history(self, image_id):
+        """Return an image's history, from the cache when possible."""
+        with self._lock:
+            history = self._history.get(image_id)
+        if history is None:
+            history = self.client.api.history(image_id)
+            self._store(image_id, history)
+            self.inventory.touch()
+        return history
+
+    # Graph
+
+    def graph(self):
+        """Return {'images': {id: node}, 'layers': {chain id: layer}} from the caches."""
+        with self._lock:
+            if self._graph is not None:
+                return self._graph
+            version = self._version
+            histories = dict(self._history)
+        graph = self._build(self.inventory.snapshot(IMAGE), histories)
+        with self._lock:
+            # Only keep it if nothing changed while building
+            if version == self._version:
+                self._graph = graph
+        return graph
+
+    @staticmethod
+    def _build(images, histories):
+        layers = {}
+        nodes = {}
+        tops = {}
+        for image_id, image in images.items():
+            diff_ids = (image.get('RootFS') or {}).get('Layers') or []
+            chain = chain_ids(diff_ids)
+            sizes = layer_sizes(diff_ids, histories[image_id]) if image_id in histories else None
+            for n, chain_id in enumerate(chain):
+                layer = layers.get(chain_id)
+                if layer is None:
+                    layer = layers[chain_id] = {'diffId': diff_ids[n], 'size': None, 'images': []}
+                layer['images'].append(image_id)
+                if sizes is not None:
+                    layer['size'] = sizes[n]
+            nodes[image_id] = {'chain': chain, 'size': image.get('Size') or 0, 'known': sizes is not None}
+            if chain:
+                tops.setdefault(chain[-1], []).append(image_id)
+
+        for image_id, node in nodes.items():
+            shared = 0
+            unique = 0
+            for chain_id in node['chain']:
+                layer = layers[chain_id]
+                if len(layer['images']) > 1:
+                    shared += layer['size'] or 0
+                else:
+                    unique += layer['size'] or 0
+            if not node['known']:
+                # Without layer sizes, only layers other images use are known to be shared
+                unique = max(0, node['size'] - shared)
+            node['shared'] = shared
+            node['unique'] = unique
+            node['parent'] = None
+            node['children'] = []
+            for chain_id in reversed(node['chain'][:-1]):
+                candidates = tops.get(chain_id)
+                if candidates:
+                    node['parent'] = min(candidates)
+                    break
+        for image_id, node in nodes.items():
+            if node['parent'] is not None:
+                nodes[node['parent']]['children'].append(image_id)
+        return {'images': nodes, 'layers': layers}
+
+    # Reads
+
+    def image(self, image_id):
+        """Layer breakdown of one image, or None if the image isn't cached."""
+        graph = self.graph()
+        node = graph['images'].get(image_id)
+        if node is None:
+            return None
+        layers = graph['layers']
+        return {
+            'size': node['size'],
+            'sharedSize': node['shared'],
+            'uniqueSize': node['unique'],
+            # Removing the image frees the layers no other image uses
+            'reclaimable': node['unique'],
+            'complete': node['known'],
+            'parent': node['parent'],
+            'children': sorted(node['children']),
+            'layers': [
+                {
+                    'chainId': chain_id,
+                    'diffId': layers[chain_id]['diffId'],
+                    'size': layers[chain_id]['size'],
+                    'images': len(layers[chain_id]['images']),
+                }
+                for chain_id in node['chain']
+            ],
+        }
+
+    def sizes(self, image_id):
+        """Return (shared bytes, unique bytes) of an image, or (None, None)."""
+        node = self.graph()['images'].get(image_id)
+        return (node['shared'], node['unique']) if node else (None, None)
+
+    def reclaimable(self, image_ids):
+        """Bytes freed by removing all of image_ids: layers only they use."""
+        return self._reclaimable(self.graph(), set(image_ids))
+
+    @staticmethod
+    def _reclaimable(graph, image_ids):
+        return sum(
+            layer['size'] or 0 for layer in graph['layers'].values()
+            if image_ids.issuperset(layer['images'])
+        ) + _estimated(graph, image_ids)
+
+    def summary(self, in_use=()):
+        graph = self.graph()
+        nodes = graph['images']
+        unused = {image_id for image_id in nodes if image_id not in in_use}
+        return {
+            'images': len(nodes),
+            'complete': sum(1 for node in nodes.values() if node['known']),
+            'layers': len(graph['layers']),
+            # What summing image sizes would report
+            'apparentSize': sum(node['size'] for node in nodes.values()),
+            'size': sum(layer['size'] or 0 for layer in graph['layers'].values()) + _estimated(graph, nodes),
+            'sharedSize': sum(
+                layer['size'] or 0 for layer in graph['layers'].values() if len(layer['images']) > 1
+            ),
+            'unused': len(unused),
+            'reclaimable': self._reclaimable(graph, unused),
+        }
@@ -0,0 +1,184 @@
+"""
+Server-side filtering, sorting, cursor pagination and field projection for
+list endpoints.
+
+Filters are applied to cached inventory objects before rows are built, using
+the inventory's image and network indexes where possible. Sorting and paging
+run on the merged rows, so they also work across fleet hosts. Cursors are
+opaque: they encode the sort key of the last row returned, so pages stay
+stable while objects are added or removed.
+"""
+import base64
+import json
+
+import docker
+
+from inventory import CONTAINER, IMAGE, NETWORK, VOLUME
+
+# Filters each kind supports
+FILTERS = {
+    CONTAINER: {'name', 'status', 'label', 'network', 'image'},
+    IMAGE: {'name', 'label'},
+    NETWORK: {'name', 'label'},
+    VOLUME: {'name', 'label'},
+}
+
+# Row fields each kind can be sorted by
+SORTS = {
+    CONTAINER: {'host', 'id', 'name', 'image', 'status', 'state', 'created', 'ports', 'networks'},
+    IMAGE: {'host', 'id', 'tags', 'created', 'size', 'sharedSize', 'uniqueSize', 'containers'},
+    NETWORK: {'host', 'id', 'name', 'driver', 'scope', 'ipam', 'internal', 'containers', 'inUse'},
+    VOLUME: {'host', 'id', 'name', 'driver', 'mountpoint', 'created', 'status', 'labels'},
+}
+
+
+def _labels(kind, attrs):
+    if kind in (CONTAINER, IMAGE):
+        return (attrs.get('Config') or {}).get('Labels') or {}
+    return attrs.get('Labels') or {}
+
+
+def _names(kind, attrs):
+    if kind == CONTAINER:
+        return [attrs.get('Name', '').lstrip('/')]
+    if kind == IMAGE:
+        return attrs.get('RepoTags') or []
+    return [attrs.get('Name', '')]
+
+
+def _sort_value(value):
+    # Numbers sort numerically, everything else as text; missing values last
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        value = '' if value is None else value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+        return (value == '', 1, value)
+    return (False, 0, value)
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _valid_key(key, sort):
+    # [sort value, host, id] as built by ListQuery._key, so it compares with row keys
+    if not isinstance(key, list) or len(key) != 3:
+        return False
+    value, host, row_id = key
+    if not isinstance(host, str) or not isinstance(row_id, str):
+        return False
+    if not isinstance(value, list) or len(value) != 3:
+        return False
+    if not sort:
+        return value == [False, 0, 0]
+    missing, numeric, sort_value = value
+    if numeric == 0:
+        return missing is False and isinstance(sort_value, (int, float)) and not isinstance(sort_value, bool)
+    return numeric == 1 and isinstance(sort_value, str) and missing is (sort_value == '')
+
+
+def decode_cursor(cursor, sort=None):
+    """Decode a cursor of a listing sorted by `sort`; ValueError unless it could have come from one."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not _valid_key(key, sort):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return [tuple(key[0]), key[1], key[2]]
+
+
+def project(row, fields):
+    """Keep only `fields` of a row; dotted names select nested keys."""
+    if not fields:
+        return row
+    out = {}
+    for field in fields:
+        source, target = row, out
+        parts = field.split('.')
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return out
+
+
+class ListQuery:
+    """Filter, sort, page and projection parameters of one list request."""
+
+    def __init__(self, kind, name=None, status=None, label=None, network=None, image=None,
+                 sort=None, cursor=None, limit=None, fields=None):
+        self.kind = kind
+        self.filters = {
+            key: value for key, value in (
+                ('name', name), ('status', status), ('label', label),
+                ('network', network), ('image', image),
+            ) if value
+        }
+        unsupported = set(self.filters) - FILTERS[kind]
+        if unsupported:
+            raise ValueError(f"Unsupported filter for {kind}s: {', '.join(sorted(unsupported))}")
+        label_key, _, label_value = (label or '').partition('=')
+        self.label = (label_key, label_value if '=' in (label or '') else None)
+        self.descending = bool(sort) and sort.startswith('-')
+        self.sort = sort.lstrip('-+') if sort else None
+        if self.sort and self.sort not in SORTS[kind]:
+            raise ValueError(f"Unsupported sort for {kind}s: {self.sort}")
+        self.cursor = decode_cursor(cursor, self.sort) if cursor else None
+        self.limit = limit
+        self.fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+    def select(self, inventory):
+        """Return the cached objects of a host that pass the filters."""
+        kind = self.kind
+        filters = self.filters
+        try:
+            # Narrow with the reverse indexes before scanning
+            if 'image' in filters:
+                objects = inventory.image_users(inventory.image(filters['image'])['Id'])
+            elif 'network' in filters:
+                objects = inventory.network_users(inventory.network(filters['network'])['Id'])
+            else:
+                objects = inventory.list(kind)
+        except docker.errors.NotFound:
+            # The referenced image or network doesn't exist on this host
+            return []
+
+        name = filters.get('name')
+        status = filters.get('status')
+        label_key, label_value = self.label
+        selected = []
+        for attrs in objects:
+            if name and not any(n.startswith(name) for n in _names(kind, attrs)):
+                continue
+            if status and (attrs.get('State') or {}).get('Status') != status:
+                continue
+            if label_key:
+                labels = _labels(kind, attrs)
+                if label_key not in labels or (label_value is not None and labels[label_key] != label_value):
+                    continue
+            selected.append(attrs)
+        return selected
+
+    def _key(self, row):
+        return [_sort_value(row.get(self.sort)) if self.sort else (False, 0, 0), row.get('host', ''), row.get('id', '')]
+
+    def page(self, rows):
+        """Sort, page and project merged rows; return (rows, response headers)."""
+        headers = {}
+        if self.sort or self.limit or self.cursor:
+            keyed = sorted(((self._key(row), row) for row in rows), key=lambda item: item[0], reverse=self.descending)
+            headers['X-Total-Count'] = str(len(keyed))
+            if self.cursor:
+                if self.descending:
+                    keyed = [item for item in keyed if item[0] < self.cursor]
+                else:
+                    keyed = [item for item in keyed if item[0] > self.cursor]
+            if self.limit and len(keyed) > self.limit:
+                keyed = keyed[:self.limit]
+                headers['X-Next-Cursor'] = encode_cursor(keyed[-1][0])
+            rows = [row for _, row in keyed]
+        return [project(row, self.fields) for row in rows], headers
@@ -0,0 +1,344 @@
+"""
+Multiplexed WebSocket hub for live inventory, stats, system and log updates.
+
+Upstream sources (inventory events, the stats collector, the host recorder and
+one log follower per watched container) are shared by every connected client,
+so daemon load does not grow with the number of open tabs. Each session has
+its own coalescing buffer: bursts are merged per object and flushed at most
+once per `LIVE_FLUSH_INTERVAL` seconds.
+
+Protocol (JSON text frames):
+    client -> {"action": "subscribe" | "unsubscribe", "topics": [...]}
+    server -> {"topic": ..., "snapshot": ...}          once per subscription
+    server -> {"topic": "inventory", "changes": [...]} deltas
+    server -> {"topic": "stats" | "stats:<id>", "stats": {id: sample}}
+    server -> {"topic": "system", "stats": {...}}
+    server -> {"topic": "logs:<id>", "lines": [...], "dropped": n}
+
+Topics: inventory, stats, stats:<container>, system, logs:<container>.
+
+Log lines continue exactly where a log snapshot ends. Subscriptions to one
+container's logs are taken one at a time: lines the shared follower
+publishes while a snapshot is read are held back, then lines the snapshot
+already has are dropped. A new follower starts from the snapshot's end.
+"""
+import asyncio
+
+import docker
+from fastapi import WebSocket, WebSocketDisconnect
+
+from executor import ExecutorBusy, ExecutorTimeout, executor
+from inventory import InventoryUnavailable
+from logs import LogFollower, entries_cursor, parse_cursor, parse_log_line, skip_to_cursor
+from utils import ERROR, debug_print, env_float, env_int
+
+INVENTORY = 'inventory'
+STATS = 'stats'
+SYSTEM = 'system'
+STATS_PREFIX = 'stats:'
+LOGS_PREFIX = 'logs:'
+
+
+class _Session:
+    def __init__(self, websocket, log_buffer):
+        self.websocket = websocket
+        self.log_buffer = log_buffer
+        self.topics = set()
+        self.wakeup = asyncio.Event()
+        self.outbox = []
+        self.inventory = {}
+        self.stats = {}
+        self.system = None
+        self.logs = {}
+        self.dropped = {}
+        # Log topics whose snapshot is being read -> lines published meanwhile
+        self.pending_logs = {}
+        # Log topic -> [timestamp, lines to skip] of its snapshot's end
+        self.log_boundaries = {}
+
+    def drain(self):
+        messages, self.outbox = self.outbox, []
+        if self.inventory:
+            messages.append({'topic': INVENTORY, 'changes': list(self.inventory.values())})
+            self.inventory = {}
+        for topic, samples in self.stats.items():
+            messages.append({'topic': topic, 'stats': samples})
+        self.stats = {}
+        if self.system is not None:
+            messages.append({'topic': SYSTEM, 'stats': self.system})
+            self.system = None
+        for topic, lines in self.logs.items():
+            message = {'topic': topic, 'lines': lines}
+            if self.dropped.get(topic):
+                message['dropped'] = self.dropped[topic]
+            messages.append(message)
+        self.logs = {}
+        self.dropped = {}
+        return messages
+
+
+class LiveHub:
+    def __init__(self, client, inventory, stats_collector, host_recorder, summarize, snapshot,
+                 flush_interval=None, log_buffer=None, log_tail=None):
+        self.client = client
+        self.inventory = inventory
+        self.stats_collector = stats_collector
+        self.host_recorder = host_recorder
+        # summarize(kind, attrs) -> list row; snapshot() -> full inventory rows
+        self.summarize = summarize
+        self.snapshot = snapshot
+        self.flush_interval = flush_interval or env_float('LIVE_FLUSH_INTERVAL', 0.5)
+        self.log_buffer = log_buffer or env_int('LIVE_LOG_BUFFER', 1000)
+        self.log_tail = log_tail or env_int('LIVE_LOG_TAIL', 100)
+        self._subscribers = {}
+        self._followers = {}
+        # Container id -> lock serializing its log subscriptions
+        self._log_locks = {}
+        self._loop = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.inventory.add_listener(self._on_inventory_change)
+        self.stats_collector.add_listener(self._on_stats)
+        self.host_recorder.add_listener(self._on_system)
+
+    def stop(self):
+        for follower, _ in self._followers.values():
+            follower.stop()
+        self._followers.clear()
+
+    def stats(self):
+        return {
+            'sessions': len({s for sessions in self._subscribers.values() for s in sessions}),
+            'topics': {topic: len(sessions) for topic, sessions in self._subscribers.items() if sessions},
+            'log_followers': len(self._followers),
+        }
+
+    # Upstream callbacks (run on background threads)
+
+    def _call(self, fn, *args):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(fn, *args)
+
+    def _on_inventory_change(self, kind, action, key, attrs):
+        if not self._subscribers.get(INVENTORY):
+            return
+        data = self.summarize(kind, attrs) if attrs is not None else None
+        self._call(self._publish_inventory, {'kind': kind, 'action': action, 'id': key, 'data': data})
+
+    def _on_stats(self, container_id, sample):
+        if self._subscribers.get(STATS) or self._subscribers.get(STATS_PREFIX + container_id):
+            self._call(self._publish_stats, container_id, sample)
+
+    def _on_system(self, sample):
+        if self._subscribers.get(SYSTEM):
+            self._call(self._publish_system, sample)
+
+    def _on_logs(self, container_id, entries):
+        self._call(self._publish_logs, container_id, entries)
+
+    # Fan-out into session buffers (run on the event loop)
+
+    def _publish_inventory(self, change):
+        for session in self._subscribers.get(INVENTORY, ()):
+            # Later changes to the same object replace earlier ones
+            session.inventory[(change['kind'], change['id'])] = change
+            session.wakeup.set()
+
+    def _publish_stats(self, container_id, sample):
+        for topic in (STATS, STATS_PREFIX + container_id):
+            for session in self._subscribers.get(topic, ()):
+                session.stats.setdefault(topic, {})[container_id] = sample
+                session.wakeup.set()
+
+    def _publish_system(self, sample):
+        for session in self._subscribers.get(SYSTEM, ()):
+            session.system = sample
+            session.wakeup.set()
+
+    def _publish_logs(self, container_id, entries):
+        topic = LOGS_PREFIX + container_id
+        for session in self._subscribers.get(topic, ()):
+            if topic in session.pending_logs:
+                session.pending_logs[topic].extend(entries)
+            else:
+                self._buffer_logs(session, topic, entries)
+
+    def _buffer_logs(self, session, topic, entries):
+        entries = skip_to_cursor(entries, session.log_boundaries.get(topic))
+        if entries:
+            buffer = session.logs.setdefault(topic, [])
+            buffer.extend(entries)
+            overflow = len(buffer) - session.log_buffer
+            if overflow > 0:
+                # Slow client: keep the newest lines and report the gap
+                del buffer[:overflow]
+                session.dropped[topic] = session.dropped.get(topic, 0) + overflow
+            session.wakeup.set()
+
+    # Sessions
+
+    async def serve(self, websocket: WebSocket):
+        await websocket.accept()
+        session = _Session(websocket, self.log_buffer)
+        sender = asyncio.create_task(self._send_loop(session))
+        try:
+            while True:
+                message = await websocket.receive_json()
+                await self._handle(session, message)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            debug_print(f"Error in live session: {str(e)}", ERROR)
+        finally:
+            sender.cancel()
+            for topic in list(session.topics):
+                self._unsubscribe(session, topic)
+
+    async def _send_loop(self, session):
+        try:
+            while True:
+                await session.wakeup.wait()
+                # Coalescing window: let a burst collapse into one frame
+                await asyncio.sleep(self.flush_interval)
+                session.wakeup.clear()
+                for message in session.drain():
+                    await session.websocket.send_json(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            debug_print(f"Error sending live updates: {str(e)}", ERROR)
+
+    async def _handle(self, session, message):
+        action = message.get('action') if isinstance(message, dict) else None
+        topics = (message.get('topics') or []) if action else []
+        if action == 'subscribe':
+            for topic in topics:
+                await self._subscribe(session, topic)
+        elif action == 'unsubscribe':
+            for topic in topics:
+                self._unsubscribe(session, self._match_topic(session, topic))
+        else:
+            session.outbox.append({'error': f"Unknown action: {action}"})
+            session.wakeup.set()
+
+    async def _subscribe(self, session, topic):
+        try:
+            if isinstance(topic, str) and topic.startswith(LOGS_PREFIX):
+                return await self._subscribe_logs(session, topic[len(LOGS_PREFIX):])
+            topic, snapshot = await executor.run(self._initial_state, topic)
+        except (docker.errors.NotFound, ValueError, InventoryUnavailable, ExecutorTimeout, ExecutorBusy) as e:
+            # Fails this topic only; the session and its other topics carry on
+            session.outbox.append({'topic': topic, 'error': str(e)})
+            session.wakeup.set()
+            return
+
+        if topic not in session.topics:
+            session.topics.add(topic)
+            self._subscribers.setdefault(topic, set()).add(session)
+        session.outbox.append({'topic': topic, 'snapshot': snapshot})
+        session.wakeup.set()
+
+    async def _subscribe_logs(self, session, ref):
+        container = await executor.run(self.inventory.container, ref)
+        container_id = container['Id']
+        topic = LOGS_PREFIX + container_id
+        lock = self._log_locks.setdefault(container_id, asyncio.Lock())
+        async with lock:
+            subscribed = topic in session.topics
+            session.pending_logs[topic] = []
+            session.topics.add(topic)
+            self._subscribers.setdefault(topic, set()).add(session)
+            try:
+                snapshot = await executor.run(self._log_snapshot, container_id)
+            except BaseException:
+                session.pending_logs.pop(topic, None)
+                if not subscribed:
+                    session.topics.discard(topic)
+                    self._subscribers[topic].discard(session)
+                    if not self._subscribers[topic]:
+                        del self._subscribers[topic]
+                raise
+            cursor = entries_cursor(snapshot)
+            timestamp, seen = parse_cursor(cursor)
+            session.log_boundaries[topic] = [timestamp, seen] if timestamp else []
+            # A resubscribe's snapshot replaces whatever was buffered before it
+            session.logs.pop(topic, None)
+            held = session.pending_logs.pop(topic)
+            if not subscribed:
+                self._retain_follower(container_id, cursor)
+            if held:
+                self._buffer_logs(session, topic, held)
+        session.outbox.append({'topic': topic, 'snapshot': snapshot})
+        session.wakeup.set()
+
+    def _log_snapshot(self, container_id):
+        logs = self.client.api.logs(container_id, timestamps=True, tail=self.log_tail)
+        lines = logs.decode('utf-8', errors='replace').splitlines()
+        return [parse_log_line(line) for line in lines]
+
+    def _unsubscribe(self, session, topic):
+        if topic not in session.topics:
+            return
+        session.topics.discard(topic)
+        session.log_boundaries.pop(topic, None)
+        sessions = self._subscribers.get(topic)
+        if sessions is not None:
+            sessions.discard(session)
+            if not sessions:
+                del self._subscribers[topic]
+        if topic.startswith(LOGS_PREFIX):
+            self._release_follower(topic[len(LOGS_PREFIX):])
+
+    def _match_topic(self, session, topic):
+        # Container topics are stored by full id; accept names and id prefixes too
+        if topic in session.topics:
+            return topic
+        for prefix in (STATS_PREFIX, LOGS_PREFIX):
+            if not isinstance(topic, str) or not topic.startswith(prefix):
+                continue
+            ref = topic[len(prefix):]
+            for subscribed in session.topics:
+                if not subscribed.startswith(prefix):
+                    continue
+                container_id = subscribed[len(prefix):]
+                container = self.inventory.peek('container', container_id) or {}
+                if container_id.startswith(ref) or container.get('Name', '').lstrip('/') == ref:
+                    return subscribed
+        return topic
+
+    def _initial_state(self, topic):
+        if topic == INVENTORY:
+            return topic, self.snapshot()
+        if topic == STATS:
+            return topic, self.stats_collector.snapshot()
+        if topic == SYSTEM:
+            return topic, self.host_recorder.latest
+        if isinstance(topic, str) and topic.startswith(STATS_PREFIX):
+            container = self.inventory.container(topic[len(STATS_PREFIX):])
+            return STATS_PREFIX + container['Id'], self.stats_collector.latest(container['Id'])
+        raise ValueError(f"Unknown topic: {topic}")
+
+    # Shared log followers
+
+    def _retain_follower(self, container_id, cursor):
+        entry = self._followers.get(container_id)
+        if entry is None:
+            follower = LogFollower(self.client, container_id, self._on_logs, cursor)
+            follower.start()
+            self._followers[container_id] = [follower, 1]
+        else:
+            entry[1] += 1
+
+    def _release_follower(self, container_id):
+        entry = self._followers.get(container_id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            entry[0].stop()
+            del self._followers[container_id]
+            lock = self._log_locks.get(container_id)
+            if lock is not None and not lock.locked():
+                del self._log_locks[container_id]
@@ -0,0 +1,491 @@
+"""
+Server-side container log search.
+
+Matching runs while streaming from the Docker log API, so results start
+flowing before the whole log is read and memory stays bounded. When
+LOG_INDEX_DIR is set, searches can instead use a rolling on-disk index per
+container: lines are spooled to hourly segment files with a per-minute table
+of byte ranges and a per-minute token blob, so repeat queries skip minutes
+outside the time range or that cannot contain the query's words.
+
+An indexed search reads the indexed minutes first and then the rest of the
+log from the daemon, appending it to the index as it goes. So even the first
+search on a large log streams matches as they are read instead of waiting
+for the whole log to be spooled. One search per container extends the index
+at a time; others read the unindexed tail straight from the daemon.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from logs import LogReader, parse_cursor, parse_log_line, timestamp_to_epoch
+from inventory import CONTAINER
+from utils import DEBUG, WARNING, debug_print
+
+BUCKET_SECONDS = 60
+SEGMENT_SECONDS = 3600
+# How often an extending search makes what it appended visible to others
+COMMIT_SECONDS = 5
+TOKEN_RE = re.compile(r'\w+')
+
+
+def token_checks(query):
+    """Substrings a bucket's token blob must contain for `query` to match.
+
+    The blob is every distinct lowercase token of the bucket, one per line,
+    wrapped in newlines. A query word bounded by non-word characters inside
+    the query must appear as a whole token; words at the edges of the query
+    may be the tail or head of a longer token.
+    """
+    text = query.lower()
+    checks = []
+    for match in TOKEN_RE.finditer(text):
+        start, end = match.span()
+        checks.append(
+            ('' if start == 0 else '\n') + match.group() + ('' if end == len(text) else '\n')
+        )
+    return checks
+
+
+class LogIndex:
+    def __init__(self, client, container_id, directory, max_bytes, on_release=None):
+        self.client = client
+        self.container_id = container_id
+        self.path = os.path.join(directory, container_id)
+        self.max_bytes = max_bytes
+        # Called after a search stops extending the index
+        self.on_release = on_release
+        # Guards the metadata; only ever held briefly
+        self._lock = threading.Lock()
+        # Held by the one search that is extending the index, or while it is trimmed
+        self._writer = threading.Lock()
+        self._meta = None
+
+    # Storage
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load_meta(self):
+        if self._meta is None:
+            try:
+                with open(self._file('meta.json')) as f:
+                    self._meta = json.load(f)
+            except (OSError, ValueError):
+                # buckets: minute -> [segment hour, start offset, end offset]
+                self._meta = {'cursor': None, 'buckets': {}}
+        return self._meta
+
+    def _save_meta(self):
+        tmp = self._file('meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(tmp, self._file('meta.json'))
+
+    def _load_tokens(self, hour):
+        try:
+            with open(self._file(f"{hour}.tokens.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_tokens(self, hour, tokens):
+        tmp = self._file(f"{hour}.tokens.json.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(tokens, f)
+        os.replace(tmp, self._file(f"{hour}.tokens.json"))
+
+    # Indexing
+
+    def acquire_writer(self):
+        """Take the right to extend the index, unless another search has it."""
+        return self._writer.acquire(blocking=False)
+
+    def release_writer(self):
+        self._writer.release()
+        if self.on_release is not None:
+            self.on_release(self)
+
+    def snapshot(self):
+        """Return (buckets, cursor): what is indexed, and where the log continues."""
+        with self._lock:
+            meta = self._load_meta()
+            return dict(meta['buckets']), meta['cursor']
+
+    def extend(self, batches):
+        """Append batches read from the index cursor onward, yielding each once written.
+
+        The caller holds the writer and reads the log from `snapshot()`'s
+        cursor. Appended minutes become searchable, and the cursor moves, every
+        COMMIT_SECONDS and when the batches end or the caller stops early.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            buckets = self._load_meta()['buckets']
+            # Committed end of each segment; bytes after it were never committed
+            ends = {}
+            for hour, _, end in buckets.values():
+                ends[hour] = max(ends.get(hour, 0), end)
+        pending = {'buckets': {}, 'tokens': {}, 'cursor': None}
+        handle = None
+        segment = None
+        opened = set()
+        committed_at = time.monotonic()
+        try:
+            for batch in batches:
+                indexed = []
+                for entry in batch:
+                    epoch = timestamp_to_epoch(entry['timestamp'])
+                    if epoch is None:
+                        continue
+                    minute = int(epoch // BUCKET_SECONDS * BUCKET_SECONDS)
+                    hour = minute - minute % SEGMENT_SECONDS
+                    if hour != segment:
+                        if handle is not None:
+                            handle.close()
+                        handle = open(self._file(f"{hour}.log"), 'ab')
+                        if hour not in opened:
+                            handle.truncate(ends.get(hour, 0))
+                            opened.add(hour)
+                        segment = hour
+                    data = f"{entry['timestamp']} {entry['message']}\n".encode('utf-8')
+                    offset = ends.get(hour, 0)
+                    handle.write(data)
+                    ends[hour] = offset + len(data)
+                    bucket = pending['buckets'].get(minute)
+                    if bucket is None:
+                        with self._lock:
+                            bucket = buckets.get(str(minute))
+                        begin = bucket[1] if bucket is not None else offset
+                        pending['buckets'][minute] = [hour, begin, ends[hour]]
+                    else:
+                        bucket[2] = ends[hour]
+                    pending['tokens'].setdefault(hour, {}).setdefault(minute, set()).update(
+                        TOKEN_RE.findall(entry['message'].lower())
+                    )
+                    indexed.append(entry)
+                pending['cursor'] = batch[-1]['cursor']
+                if indexed:
+                    yield indexed
+                if time.monotonic() - committed_at >= COMMIT_SECONDS:
+                    if handle is not None:
+                        handle.flush()
+                    self._commit(pending)
+                    committed_at = time.monotonic()
+        finally:
+            if handle is not None:
+                handle.close()
+            self._commit(pending, final=True)
+
+    def _commit(self, pending, final=False):
+        for hour, minutes in pending['tokens'].items():
+            tokens = self._load_tokens(hour)
+            for minute, words in minutes.items():
+                existing = tokens.get(str(minute), '').split('\n')
+                words.update(word for word in existing if word)
+                tokens[str(minute)] = '\n' + '\n'.join(sorted(words)) + '\n'
+            self._save_tokens(hour, tokens)
+        with self._lock:
+            meta = self._load_meta()
+            for minute, bucket in pending['buckets'].items():
+                # New lists, so snapshots taken earlier keep their own ranges
+                meta['buckets'][str(minute)] = list(bucket)
+            if pending['cursor'] is not None:
+                meta['cursor'] = pending['cursor']
+            if final:
+                self._enforce_retention()
+            self._save_meta()
+        pending['buckets'] = {}
+        pending['tokens'] = {}
+
+    def _segment_sizes(self):
+        sizes = {}
+        for hour in sorted({bucket[0] for bucket in self._meta['buckets'].values()}):
+            try:
+                sizes[hour] = os.path.getsize(self._file(f"{hour}.log"))
+            except OSError:
+                sizes[hour] = 0
+        return sizes
+
+    def _drop_segment(self, hour):
+        for name in (f"{hour}.log", f"{hour}.tokens.json"):
+            try:
+                os.remove(self._file(name))
+            except OSError:
+                pass
+        buckets = self._meta['buckets']
+        for minute in [m for m, bucket in buckets.items() if bucket[0] == hour]:
+            del buckets[minute]
+
+    def _enforce_retention(self):
+        sizes = self._segment_sizes()
+        hours = list(sizes)
+        total = sum(sizes.values())
+        # Drop whole hourly segments, oldest first, but keep the newest one
+        while total > self.max_bytes and len(hours) > 1:
+            hour = hours.pop(0)
+            self._drop_segment(hour)
+            total -= sizes[hour]
+
+    def segments(self):
+        """Return {hour: bytes on disk} of the committed segments, oldest first."""
+        with self._lock:
+            self._load_meta()
+            return self._segment_sizes()
+
+    def trim(self, hours):
+        """Drop segments; the caller holds the writer. An index left empty is removed."""
+        with self._lock:
+            self._load_meta()
+            for hour in hours:
+                self._drop_segment(hour)
+            if self._meta['buckets']:
+                self._save_meta()
+                return
+        self.remove()
+
+    def remove(self):
+        """Delete the index from disk; the caller holds the writer."""
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._meta = None
+
+    # Querying
+
+    def search(self, start=None, end=None, checks=(), buckets=None):
+        """Yield batches of entries from minutes that may contain a match.
+
+        `buckets` is a `snapshot()`; by default, the index as it is now.
+        """
+        if buckets is None:
+            buckets, _ = self.snapshot()
+        tokens_by_hour = {}
+        for minute in sorted(int(m) for m in buckets):
+            if start is not None and minute + BUCKET_SECONDS <= start:
+                continue
+            if end is not None and minute > end:
+                break
+            hour, begin, finish = buckets[str(minute)]
+            if checks:
+                if hour not in tokens_by_hour:
+                    tokens_by_hour[hour] = self._load_tokens(hour)
+                blob = tokens_by_hour[hour].get(str(minute), '')
+                if not all(check in blob for check in checks):
+                    continue
+            try:
+                with open(self._file(f"{hour}.log"), 'rb') as f:
+                    f.seek(begin)
+                    data = f.read(finish - begin)
+            except OSError:
+                continue
+            entries = [parse_log_line(line) for line in data.decode('utf-8', errors='replace').splitlines()]
+            edge = (start is not None and minute < start) or (end is not None and minute + BUCKET_SECONDS > end)
+            if edge:
+                entries = [
+                    entry for entry in entries
+                    if _in_range(timestamp_to_epoch(entry['timestamp']), start, end)
+                ]
+            if entries:
+                yield entries
+
+
+def _in_range(epoch, start, end):
+    if epoch is None:
+        return False
+    return (start is None or epoch >= start) and (end is None or epoch <= end)
+
+
+class LogIndexRegistry:
+    """Lazily created indexes, one per container, under a shared directory.
+
+    Besides each index's own `max_bytes`, all of them together are kept under
+    `total_bytes` by dropping the oldest hourly segments of indexes no search
+    is extending, checked whenever a search stops extending one. The index of
+    a container the inventory reports removed is deleted.
+    """
+
+    def __init__(self, client, directory, max_bytes, total_bytes=0):
+        self.client = client
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = total_bytes
+        self._indexes = {}
+        # Containers removed while a search was extending their index
+        self._removed = set()
+        self._lock = threading.Lock()
+        self._budget = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def get(self, container_id):
+        with self._lock:
+            index = self._indexes.get(container_id)
+            if index is None:
+                index = LogIndex(self.client, container_id, self.directory, self.max_bytes, self._released)
+                self._indexes[container_id] = index
+            return index
+
+    def on_inventory_change(self, kind, action, key, attrs):
+        if kind == CONTAINER and action == 'remove' and self.enabled:
+            # Listeners must not block; deleting a large index can take a while
+            threading.Thread(target=self.remove, args=(key,), name='log-index-remove', daemon=True).start()
+
+    def remove(self, container_id):
+        index = self.get(container_id)
+        if not index.acquire_writer():
+            # Removed when that search releases it
+            with self._lock:
+                self._removed.add(container_id)
+            return
+        try:
+            index.remove()
+        finally:
+            index._writer.release()
+        with self._lock:
+            self._indexes.pop(container_id, None)
+
+    def _released(self, index):
+        with self._lock:
+            removed = index.container_id in self._removed
+            self._removed.discard(index.container_id)
+        if removed:
+            self.remove(index.container_id)
+        self.enforce_budget()
+
+    def enforce_budget(self):
+        """Drop the oldest segments across indexes until they fit in `total_bytes`."""
+        if self.total_bytes <= 0 or not self._budget.acquire(blocking=False):
+            return
+        try:
+            try:
+                names = [name for name in os.listdir(self.directory)
+                         if os.path.isdir(os.path.join(self.directory, name))]
+            except OSError:
+                return
+            segments = {name: self.get(name).segments() for name in names}
+            total = sum(size for sizes in segments.values() for size in sizes.values())
+            if total <= self.total_bytes:
+                return
+            oldest = sorted((hour, name, size) for name, sizes in segments.items() for hour, size in sizes.items())
+            drop = {}
+            for hour, name, size in oldest:
+                if total <= self.total_bytes:
+                    break
+                drop.setdefault(name, []).append(hour)
+                total -= size
+            for name, hours in drop.items():
+                index = self.get(name)
+                # Indexes being extended are left alone; checked again on release
+                if not index.acquire_writer():
+                    continue
+                try:
+                    index.trim(hours)
+                finally:
+                    index._writer.release()
+                debug_print(f"Log index over budget: dropped {len(hours)} segments of {name[:12]}", DEBUG)
+        finally:
+            self._budget.release()
+
+
+class LogSearch:
+    """Reader yielding batches of matching log entries, for `iterate_batches`."""
+
+    def __init__(self, client, container_id, query, regex=False, ignore_case=False,
+                 since=None, until=None, stdout=True, stderr=True, limit=1000, index=None):
+        self.client = client
+        self.container_id = container_id
+        self.query = query
+        # 0 and earlier mean no bound; the daemon rejects them
+        self.since = since if since and since > 0 else None
+        self.until = until if until and until > 0 else None
+        self.stdout = stdout
+        self.stderr = stderr
+        self.limit = limit
+        self.index = index
+        self._reader = None
+
+        flags = re.IGNORECASE if ignore_case else 0
+        # Raises re.error for invalid patterns before anything is streamed
+        self.pattern = re.compile(query if regex else re.escape(query), flags)
+        self.literal = None if regex or ignore_case else query
+        self.checks = [] if regex else token_checks(query)
+
+    def _source(self):
+        # The index mixes stdout and stderr, so stream selection needs the daemon
+        if self.index is not None and self.stdout and self.stderr:
+            started = False
+            try:
+                for batch in self._indexed():
+                    started = True
+                    yield batch
+                return
+            except Exception as e:
+                if started:
+                    raise
+                debug_print(f"Log index unavailable for {self.container_id[:12]}, scanning: {str(e)}", WARNING)
+        self._reader = LogReader(
+            self.client, self.container_id, tail='all', stdout=self.stdout, stderr=self.stderr,
+            since=self.since, until=self.until
+        )
+        yield from self._reader.batches()
+
+    def _indexed(self):
+        """Search the indexed minutes, then the log written after them.
+
+        The rest is indexed as it is read, unless another search already is
+        extending the index; then it is read straight from the daemon.
+        """
+        writer = self.index.acquire_writer()
+        try:
+            buckets, cursor = self.index.snapshot()
+            yield from self.index.search(self.since, self.until, self.checks, buckets)
+            indexed_to = timestamp_to_epoch(parse_cursor(cursor)[0])
+            if self.until is not None and indexed_to is not None and indexed_to > self.until:
+                return
+            if not writer and self.since is not None and (indexed_to is None or indexed_to < self.since):
+                # Not indexing, so nothing before `since` is needed
+                cursor = None
+            self._reader = LogReader(
+                self.client, self.container_id, tail='all', cursor=cursor, since=self.since, until=self.until
+            )
+            source = self._reader.batches()
+            if writer:
+                source = self.index.extend(source)
+            for batch in source:
+                batch = [
+                    entry for entry in batch
+                    if _in_range(timestamp_to_epoch(entry['timestamp']), self.since, self.until)
+                ]
+                if batch:
+                    yield batch
+        finally:
+            if writer:
+                self.index.release_writer()
+
+    def batches(self):
+        found = 0
+        search = self.pattern.search
+        for batch in self._source():
+            if self.literal is not None:
+                # Cheap whole-batch check before matching line by line
+                if self.literal not in '\n'.join(entry['message'] for entry in batch):
+                    continue
+            hits = [entry for entry in batch if search(entry['message'])]
+            if not hits:
+                continue
+            for entry in hits:
+                entry.pop('cursor', None)
+            if self.limit and found + len(hits) >= self.limit:
+                yield hits[:self.limit - found]
+                return
+            found += len(hits)
+            yield hits
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
@@ -0,0 +1,323 @@
+"""
+Container log parsing, cursor-based incremental reads and shared log followers.
+
+A cursor is the timestamp of the last line a client received, optionally
+suffixed with `~<n>` when n lines share that timestamp, e.g.
+`2024-03-20T10:00:00.000000049Z~2`. Reads resuming from a cursor return only
+lines after it.
+"""
+import asyncio
+import datetime
+import json
+import threading
+
+from utils import ERROR, debug_print
+
+
+def parse_log_line(line):
+    # Docker logs format: timestamp message
+    # Split only on first space to preserve spaces in message
+    parts = line.split(' ', 1)
+    if len(parts) == 2:
+        timestamp, message = parts
+        return {
+            'timestamp': timestamp,
+            'message': message
+        }
+    return {
+        'timestamp': None,
+        'message': line
+    }
+
+
+def timestamp_to_epoch(timestamp):
+    """Convert a Docker RFC3339Nano log timestamp to float seconds, or None."""
+    if not timestamp:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(timestamp).timestamp()
+    except ValueError:
+        return None
+
+
+def parse_time(value):
+    """Accept epoch seconds or an RFC3339 timestamp; return epoch seconds."""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    epoch = timestamp_to_epoch(value)
+    if epoch is None:
+        raise ValueError(f"Invalid time: {value}")
+    return epoch
+
+
+def split_lines(chunks):
+    """Yield lists of decoded lines from a stream of byte chunks.
+
+    A chunk may end mid-line; the remainder is carried into the next chunk.
+    """
+    buffer = b''
+    for chunk in chunks:
+        buffer += chunk
+        if b'\n' not in chunk:
+            continue
+        *lines, buffer = buffer.split(b'\n')
+        yield [line.decode('utf-8', errors='replace') for line in lines]
+    if buffer:
+        yield [buffer.decode('utf-8', errors='replace')]
+
+
+def parse_cursor(cursor):
+    """Split a cursor into (timestamp, lines already seen at that timestamp)."""
+    if not cursor:
+        return None, 0
+    timestamp, _, seen = cursor.partition('~')
+    return timestamp, int(seen) if seen.isdigit() else 1
+
+
+def valid_cursor(cursor):
+    """Whether `cursor` is a log timestamp, optionally followed by ~lines seen."""
+    timestamp, _, seen = cursor.partition('~')
+    return timestamp_to_epoch(timestamp) is not None and (not seen or seen.isdigit())
+
+
+def format_cursor(timestamp, seen):
+    if timestamp is None:
+        return None
+    return timestamp if seen <= 1 else f"{timestamp}~{seen}"
+
+
+def entries_cursor(entries):
+    """Cursor just after the last timestamped entry of a list, or None."""
+    timestamps = [entry['timestamp'] for entry in entries if entry['timestamp']]
+    if not timestamps:
+        return None
+    return format_cursor(timestamps[-1], timestamps.count(timestamps[-1]))
+
+
+def skip_to_cursor(entries, boundary):
+    """Drop entries at or before a boundary, across consecutive batches.
+
+    `boundary` is [timestamp, lines at that timestamp still to skip]. It is
+    updated in place, and emptied at the first later entry, after which
+    everything passes.
+    """
+    if not boundary:
+        return entries
+    timestamp, skip = boundary
+    for n, entry in enumerate(entries):
+        current = entry['timestamp']
+        if current is None or current > timestamp or (current == timestamp and skip <= 0):
+            boundary.clear()
+            return entries[n:]
+        if current == timestamp:
+            skip -= 1
+    boundary[1] = skip
+    return []
+
+
+class LogReader:
+    """Incremental reader over one container's log stream.
+
+    `batches()` yields lists of parsed entries as chunks arrive from the
+    daemon, so memory stays bounded by the chunk size rather than `tail`.
+    `close()` may be called from another thread to abort a blocked read.
+    """
+
+    def __init__(self, client, container_id, tail='all', cursor=None, follow=False,
+                 stdout=True, stderr=True, since=None, until=None):
+        self.client = client
+        self.container_id = container_id
+        self.tail = tail
+        self.cursor = cursor
+        self.follow = follow
+        self.since = since
+        self.stdout = stdout
+        self.stderr = stderr
+        self.until = until
+        self._stream = None
+        self._closed = False
+
+    def batches(self):
+        cursor_timestamp, skip = parse_cursor(self.cursor)
+        since = timestamp_to_epoch(cursor_timestamp) if cursor_timestamp else self.since
+        last_timestamp, seen = cursor_timestamp, skip
+
+        self._stream = self.client.api.logs(
+            self.container_id, stream=True, follow=self.follow, timestamps=True,
+            tail=self.tail, since=since, until=self.until,
+            stdout=self.stdout, stderr=self.stderr
+        )
+        try:
+            if self._closed:
+                return
+            for lines in split_lines(self._stream):
+                batch = []
+                for line in lines:
+                    entry = parse_log_line(line)
+                    timestamp = entry['timestamp']
+                    if cursor_timestamp and timestamp:
+                        # `since` has second/microsecond granularity; drop what
+                        # the client already has
+                        if timestamp < cursor_timestamp:
+                            continue
+                        if timestamp == cursor_timestamp and skip > 0:
+                            skip -= 1
+                            continue
+                    if timestamp == last_timestamp:
+                        seen += 1
+                    else:
+                        last_timestamp, seen = timestamp, 1
+                    entry['cursor'] = format_cursor(timestamp, seen)
+                    batch.append(entry)
+                if batch:
+                    yield batch
+        finally:
+            self.close()
+
+    def close(self):
+        self._closed = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+async def iterate_batches(reader, max_batches=16):
+    """Drive a blocking reader on its own thread and yield its batches.
+
+    At most `max_batches` batches are buffered; the reader thread blocks
+    until the client catches up, so a slow follower can't grow memory.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(max_batches)
+    stopped = threading.Event()
+    done = object()
+
+    def deliver(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed
+            stopped.set()
+
+    def produce():
+        try:
+            for batch in reader.batches():
+                while not slots.acquire(timeout=1):
+                    if stopped.is_set():
+                        return
+                if stopped.is_set():
+                    return
+                deliver(batch)
+        except Exception as e:
+            debug_print(f"Error reading logs for container {reader.container_id[:12]}: {str(e)}", ERROR)
+            deliver(e)
+        finally:
+            reader.close()
+            deliver(done)
+
+    threading.Thread(
+        target=produce, name=f"logs-read-{reader.container_id[:12]}", daemon=True
+    ).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            slots.release()
+            yield item
+    finally:
+        stopped.set()
+        reader.close()
+
+
+async def ndjson_lines(batches):
+    """Encode batches of entries as newline-delimited JSON chunks."""
+    try:
+        async for batch in batches:
+            yield ''.join(json.dumps(entry) + '\n' for entry in batch)
+    except Exception as e:
+        # Headers are already sent; report the failure in-band
+        yield json.dumps({'error': str(e)}) + '\n'
+
+
+class LogFollower:
+    """Follows one container's log stream and hands parsed lines to a callback.
+
+    A single follower serves every subscriber of a container, so the daemon
+    sees one log stream no matter how many clients are watching. It starts
+    just after `cursor`, normally the end of the snapshot its first subscriber
+    was sent, or at the start of the log when that was empty, and resumes from
+    the last line it delivered when it reconnects.
+    """
+
+    def __init__(self, client, container_id, callback, cursor=None):
+        self.client = client
+        self.container_id = container_id
+        self.callback = callback
+        self.cursor = cursor
+        self._stop = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"logs-{self.container_id[:12]}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        timestamp, seen = parse_cursor(self.cursor)
+        # [timestamp, lines at it] of the last line delivered
+        position = [timestamp, seen] if timestamp else None
+        backoff = 1
+        while not self._stop.is_set():
+            boundary = list(position) if position else []
+            since = timestamp_to_epoch(position[0]) if position else None
+            try:
+                # `since` is rounded to microseconds, so start a little early and
+                # drop what subscribers already have
+                self._stream = self.client.api.logs(
+                    self.container_id, stream=True, follow=True, timestamps=True,
+                    tail='all', since=since - 0.001 if since else None
+                )
+                for lines in split_lines(self._stream):
+                    entries = skip_to_cursor([parse_log_line(line) for line in lines], boundary)
+                    if not entries:
+                        continue
+                    for entry in entries:
+                        if not entry['timestamp']:
+                            continue
+                        if position and entry['timestamp'] == position[0]:
+                            position[1] += 1
+                        else:
+                            position = [entry['timestamp'], 1]
+                    self.callback(self.container_id, entries)
+                    backoff = 1
+            except Exception as e:
+                debug_print(f"Error following logs for container {self.container_id[:12]}: {str(e)}", ERROR)
+            finally:
+                self._stream = None
+
+            # The stream ends when the container stops; retry until unsubscribed
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, 30)
@@ -1,12 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import docker
 from typing import List, Dict, Optional, Any
-from pydantic import BaseModel
-import psutil
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+import asyncio
 import datetime
+import json
+import os
+import re
+import time
+from collections import Counter
 
-app = FastAPI(title="Dockeranium API")
+from bulk import ActionNotAllowed, BulkOperation, bulk_executor
+from executor import ExecutorBusy, ExecutorTimeout, blocking, executor
+from exporter import OPENMETRICS_CONTENT_TYPE, MetricsExporter
+from hosts import HostBusy, HostRegistry, UnknownHost
+from http_cache import CachedBody, FastJSONResponse, ResponseCache, accepted_encodings, etag_for
+from inventory import InventoryUnavailable
+from listing import ListQuery, project
+from live import LiveHub
+from log_search import LogIndexRegistry, LogSearch
+from logs import LogReader, iterate_batches, ndjson_lines, parse_time, valid_cursor
+from metrics_store import HOST_SERIES, HostRecorder, MetricsStore
+from perf import PerfMiddleware, SamplingProfiler, perf
+from singleflight import SingleFlight
+from stats_collector import empty_container_stats
+from utils import DEBUG, ERROR, WARNING, debug_print, env_float, env_int
+
+@asynccontextmanager
+async def lifespan(app):
+    # Nothing here waits on a daemon: hosts connect and load in the background
+    perf.start()
+    hosts.start()
+    host_recorder.start()
+    metrics_exporter.start()
+    live_hub.start()
+    warmup = asyncio.create_task(warm_up())
+    yield
+    warmup.cancel()
+    live_hub.stop()
+    metrics_exporter.stop()
+    host_recorder.stop()
+    hosts.stop()
+    profiler.stop()
+    perf.stop()
+    bulk_executor.shutdown()
+    executor.shutdown()
+
+app = FastAPI(title="Dockeranium API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -15,14 +58,217 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Fleet-Errors", "X-Next-Cursor", "X-Total-Count"],
 )
 
-# Initialize Docker client
-docker_client = docker.from_env()
+# Browser origins trusted to change containers; empty trusts any origin
+trusted_origins = {
+    origin.strip() for origin in os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',') if origin.strip()
+}
+
+def check_origin(request):
+    # CORS above lets any page send requests; state-changing ones must come
+    # from a trusted origin or from a client that sends no Origin at all
+    origin = request.headers.get('origin')
+    if origin and trusted_origins and origin not in trusted_origins:
+        raise HTTPException(status_code=403, detail=f"Origin {origin} is not allowed to make this request")
+
+# Per-route latency and Docker call counts; outermost so it times everything
+app.add_middleware(PerfMiddleware, recorder=perf)
+
+# Opt-in sampling profiler (PROFILER_ENABLED=1)
+profiler = SamplingProfiler()
+
+# Docker hosts, each with its own client, cached inventory (kept current from
+# the event stream) and streaming stats collector
+hosts = HostRegistry()
+
+# The default host serves requests that don't name one
+docker_client = hosts.default.client
+inventory = hosts.default.inventory
+stats_collector = hosts.default.stats_collector
+
+# Set when start-up warming has finished or given up (STARTUP_WARM_TIMEOUT)
+warmed = asyncio.Event()
+
+async def warm_up():
+    # Every host loads its inventory in parallel on its own thread; once they
+    # have, render the derived caches so the first dashboard load finds them
+    started = time.monotonic()
+    deadline = started + env_float('STARTUP_WARM_TIMEOUT', 30.0)
+    while not hosts.loaded() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    try:
+        await executor.run(metrics_exporter.refresh)
+    except Exception as e:
+        debug_print(f"Error warming caches: {str(e)}", ERROR)
+    warmed.set()
+    debug_print("Warm-up finished", seconds=round(time.monotonic() - started, 3),
+                hosts={host.name: host.inventory.loaded for host in hosts.select()})
+
+@app.exception_handler(ExecutorTimeout)
+async def executor_timeout_handler(request: Request, exc: ExecutorTimeout):
+    debug_print(f"Timeout in {request.url.path}: {str(exc)}", WARNING)
+    return JSONResponse(status_code=504, content={'detail': str(exc)})
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    debug_print(f"Executor busy in {request.url.path}: {str(exc)}", WARNING)
+    return JSONResponse(status_code=503, content={'detail': str(exc)})
+
+@app.exception_handler(InventoryUnavailable)
+@app.exception_handler(HostBusy)
+async def host_unavailable_handler(request: Request, exc: Exception):
+    debug_print(f"Host unavailable in {request.url.path}: {str(exc)}", WARNING)
+    return JSONResponse(status_code=503, content={'detail': str(exc)})
+
+@app.exception_handler(UnknownHost)
+async def unknown_host_handler(request: Request, exc: UnknownHost):
+    return JSONResponse(status_code=404, content={'detail': str(exc)})
+
+# Serialized list responses, reused while the inventory is unchanged
+response_cache = ResponseCache()
+
+# Identical concurrent queries share one build or daemon call (COALESCE_TTL)
+fleet_flights = SingleFlight('fleet')
+inspect_flights = SingleFlight('inspect')
+
+async def fleet_response(host, build, merge=None, request=None, listing=None):
+    # Run build(docker_host) on every selected host concurrently; hosts that
+    # fail or time out are reported in X-Fleet-Errors alongside the others' rows.
+    # With a request, the response is cached and ETagged by inventory epoch and generation;
+    # with a listing, merged rows are sorted, paged and projected.
+    selected = hosts.select(host)
+    etag = None
+    key = None
+    if request is not None:
+        key = (request.url.path, str(request.query_params))
+        if not any(h.inventory.is_stale() for h in selected):
+            etag = etag_for(key, tuple((h.name, h.inventory.epoch, h.inventory.generation) for h in selected))
+            entry = response_cache.get(key, etag)
+            if entry is not None:
+                return response_cache.respond(request, entry)
+    
+    if key is None:
+        results, errors = await hosts.gather(build, selected)
+    else:
+        # Identical requests in flight share one gather; the ETag is part of
+        # the key so results never outlive the inventory generation they're from
+        results, errors = await fleet_flights.run((key, etag), hosts.gather, build, selected)
+        if etag is not None and not errors:
+            entry = response_cache.get(key, etag)
+            if entry is not None:
+                return response_cache.respond(request, entry)
+    if not results:
+        if len(errors) == 1:
+            error = next(iter(errors.values()))
+            if isinstance(error, (ExecutorTimeout, ExecutorBusy, InventoryUnavailable, HostBusy)):
+                raise error
+            raise HTTPException(status_code=500, detail=str(error))
+        raise HTTPException(status_code=502, detail={name: str(e) for name, e in errors.items()})
+    content = merge(results) if merge else [row for rows in results.values() for row in rows]
+    headers = {'X-Fleet-Errors': json.dumps({name: str(e) for name, e in errors.items()})} if errors else {}
+    if listing is not None:
+        content, page_headers = listing.page(content)
+        headers.update(page_headers)
+    if request is None:
+        return FastJSONResponse(content=content, headers=headers)
+    if etag is not None and not errors:
+        return response_cache.respond(request, response_cache.store(key, content, etag, headers))
+    # Partial results are compressed but never cached
+    return response_cache.respond(request, CachedBody(content), headers)
+
+def container_name(container):
+    return container.get('Name', '').lstrip('/')
+
+def container_status(container):
+    return container.get('State', {}).get('Status', '')
+
+def container_image(container, docker_host=None):
+    # Resolve the image tag from the cache instead of inspecting the image
+    image_id = container.get('Image', '')
+    tag = (docker_host or hosts.default).inventory.image_tag(image_id)
+    return tag or container.get('Config', {}).get('Image') or image_id
+
+def image_created(image):
+    created = image['Created']
+    return created if isinstance(created, str) else datetime.datetime.fromtimestamp(created).isoformat()
 
-def debug_print(message):
-    # Print to stdout which shows in docker logs
-    print(message, flush=True)
+def image_usage(docker_host=None):
+    # Containers per image, from the inventory's reverse index
+    return Counter((docker_host or hosts.default).inventory.image_usage())
+
+# List rows, shared by the list endpoints and the live updates hub
+def container_summary(container, docker_host=None):
+    return {
+        'host': (docker_host or hosts.default).name,
+        'id': container['Id'],
+        'name': container_name(container),
+        'image': container_image(container, docker_host),
+        'status': container_status(container),
+        'state': container.get('State', {}),
+        'created': container.get('Created', ''),
+        'ports': container.get('NetworkSettings', {}).get('Ports', {}),
+        'networks': list(container.get('NetworkSettings', {}).get('Networks', {}).keys())
+    }
+
+def network_summary(network, docker_host=None):
+    return {
+        'host': (docker_host or hosts.default).name,
+        'id': network['Id'],
+        'name': network['Name'],
+        'driver': network['Driver'],
+        'scope': network['Scope'],
+        'ipam': network['IPAM']['Config'] if 'IPAM' in network else None,
+        'internal': network.get('Internal', False),
+        'containers': len(network.get('Containers') or {}),
+        'inUse': len(network.get('Containers') or {}) > 0
+    }
+
+def image_summary(image, usage, docker_host=None):
+    docker_host = docker_host or hosts.default
+    # Bytes in layers other images also use, and bytes only this image has
+    shared_size, unique_size = docker_host.layers.sizes(image['Id'])
+    return {
+        'host': docker_host.name,
+        'id': image['Id'],
+        'tags': image.get('RepoTags') or [],
+        'created': image_created(image),
+        'size': image['Size'],
+        'sharedSize': shared_size,
+        'uniqueSize': unique_size,
+        'containers': usage[image['Id']]
+    }
+
+def volume_summary(volume, docker_host=None):
+    return {
+        'host': (docker_host or hosts.default).name,
+        'id': volume['Name'],
+        'name': volume['Name'],
+        'driver': volume['Driver'],
+        'mountpoint': volume['Mountpoint'],
+        'created': volume['CreatedAt'],
+        'status': volume.get('Status', {}),
+        'labels': volume.get('Labels', {})
+    }
+
+def summarize(kind, attrs):
+    if kind == 'container':
+        return container_summary(attrs)
+    if kind == 'network':
+        return network_summary(attrs)
+    if kind == 'image':
+        return image_summary(attrs, image_usage())
+    return volume_summary(attrs)
+
+def inventory_snapshot():
+    usage = image_usage()
+    return {
+        'containers': [container_summary(c) for c in inventory.containers()],
+        'images': [image_summary(i, usage) for i in inventory.images()],
+        'networks': [network_summary(n) for n in inventory.networks()],
+        'volumes': [volume_summary(v) for v in inventory.volumes()]
+    }
 
 # Models
 class PortMapping(BaseModel):
@@ -65,350 +311,689 @@ class SystemStats(BaseModel):
     disk_used: int
     disk_free: int
 
+class BulkSelector(BaseModel):
+    ids: Optional[List[str]] = None
+    name: Optional[str] = None
+    status: Optional[str] = None
+    label: Optional[str] = None
+    image: Optional[str] = None
+    network: Optional[str] = None
+
+class BulkAction(BaseModel):
+    action: str
+    selector: BulkSelector
+    parallelism: int = Field(10, ge=1)
+    timeout: Optional[float] = Field(None, gt=0)
+    stop_timeout: int = Field(10, ge=0)
+    signal: str = 'SIGKILL'
+    force: bool = False
+    max_failures: Optional[int] = Field(None, ge=1)
+
+# Metrics history for the ContainerStats and SystemStats fields
+metrics_store = MetricsStore(
+    ContainerStats.model_fields,
+    SystemStats.model_fields,
+    os.environ.get('METRICS_TIERS'),
+)
+for node in hosts.select():
+    node.stats_collector.add_listener(metrics_store.record_container)
+    node.inventory.add_listener(metrics_store.on_inventory_change)
+host_recorder = HostRecorder(metrics_store)
+
+# Prometheus exposition, re-rendered in the background for cheap scrapes
+metrics_exporter = MetricsExporter(hosts, host_recorder, container_image)
+
+# Batches buffered per streaming log reader before it waits for the client
+log_stream_buffer = env_int('LOG_STREAM_BUFFER', 16)
+# Lines in one non-streaming logs response; clients page on with its cursor
+log_response_max_lines = env_int('LOG_RESPONSE_MAX_LINES', 10000)
+
+# Optional on-disk log index used by log search; disabled unless LOG_INDEX_DIR is set
+log_index_dir = os.environ.get('LOG_INDEX_DIR')
+log_indexes = {
+    node.name: LogIndexRegistry(
+        node.client,
+        log_index_dir and os.path.join(log_index_dir, node.name),
+        env_int('LOG_INDEX_MAX_BYTES', 256 * 1024 * 1024),
+        env_int('LOG_INDEX_TOTAL_BYTES', 2 * 1024 * 1024 * 1024),
+    )
+    for node in hosts.select()
+}
+for node in hosts.select():
+    node.inventory.add_listener(log_indexes[node.name].on_inventory_change)
+
+# Live updates fan out from the shared upstream sources to every session
+live_hub = LiveHub(
+    docker_client,
+    inventory,
+    stats_collector,
+    host_recorder,
+    summarize,
+    inventory_snapshot,
+)
+
 # Routes
-@app.get("/api/networks")
-async def list_networks():
+def list_query(kind, **params):
     try:
-        networks = docker_client.networks.list()
-        return [{
-            'id': network.id,
-            'name': network.name,
-            'driver': network.attrs['Driver'],
-            'scope': network.attrs['Scope'],
-            'ipam': network.attrs['IPAM']['Config'] if 'IPAM' in network.attrs else None,
-            'internal': network.attrs.get('Internal', False),
-            'containers': len(network.attrs.get('Containers', {})),
-            'inUse': len(network.attrs.get('Containers', {})) > 0
-        } for network in networks]
-    except Exception as e:
-        debug_print(f"Error in list_networks: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return ListQuery(kind, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/networks")
+async def list_networks(
+    request: Request,
+    host: Optional[str] = None,
+    name: Optional[str] = None,
+    label: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
+):
+    listing = list_query('network', name=name, label=label, sort=sort, cursor=cursor, limit=limit, fields=fields)
+    def rows(docker_host):
+        networks = listing.select(docker_host.inventory)
+        return [network_summary(network, docker_host) for network in networks]
+    return await fleet_response(host, rows, request=request, listing=listing)
 
 @app.get("/api/networks/{network_id}")
-async def get_network(network_id: str):
+@blocking
+def get_network(network_id: str, host: Optional[str] = None):
+    docker_host = hosts.get(host)
     try:
-        network = docker_client.networks.get(network_id)
-        network_info = network.attrs
-        containers = network_info.get('Containers', {})
+        network_info = docker_host.inventory.network(network_id)
+        endpoints = network_info.get('Containers') or {}
+        
+        # Attached containers from the network index, plus any endpoints the
+        # cache hasn't seen yet, resolved together in one listing call
+        containers = {c['Id']: c for c in docker_host.inventory.network_users(network_info['Id'])}
+        containers.update(docker_host.inventory.resolve_containers([c for c in endpoints if c not in containers]))
         
         attachable_containers = []
-        for container_id, container_data in containers.items():
-            try:
-                container = docker_client.containers.get(container_id)
-                container_info = container.attrs
-                
-                ports = container_info['NetworkSettings']['Ports']
-                ipv4_address = container_data.get('IPv4Address', '').split('/')[0]
-                ipv6_address = container_data.get('IPv6Address', '').split('/')[0]
-                
-                attachable_containers.append({
-                    'id': container.id,
-                    'name': container.name.lstrip('/'),
-                    'ipv4Address': ipv4_address,
-                    'ipv6Address': ipv6_address,
-                    'macAddress': container_data.get('MacAddress', ''),
-                    'ports': ports,
-                    'state': {
-                        'Running': container.status == 'running',
-                        'Status': container.status
-                    }
-                })
-            except Exception as e:
-                debug_print(f"Error processing container {container_id}: {str(e)}")
-                continue
+        for container_id, container in containers.items():
+            container_data = endpoints.get(container_id) or {}
+            settings = container.get('NetworkSettings', {}).get('Networks', {}).get(network_info['Name']) or {}
+            ipv4_address = container_data.get('IPv4Address', '').split('/')[0] or settings.get('IPAddress', '')
+            ipv6_address = container_data.get('IPv6Address', '').split('/')[0] or settings.get('GlobalIPv6Address', '')
+            
+            attachable_containers.append({
+                'id': container['Id'],
+                'name': container_name(container),
+                'ipv4Address': ipv4_address,
+                'ipv6Address': ipv6_address,
+                'macAddress': container_data.get('MacAddress', '') or settings.get('MacAddress', ''),
+                'ports': container.get('NetworkSettings', {}).get('Ports', {}),
+                'state': {
+                    'Running': container_status(container) == 'running',
+                    'Status': container_status(container)
+                }
+            })
         
         return {
-            'id': network.id,
-            'name': network.name,
+            'id': network_info['Id'],
+            'name': network_info['Name'],
             'driver': network_info['Driver'],
             'scope': network_info['Scope'],
             'created': network_info['Created'],
             'ipam': network_info['IPAM']['Config'] if 'IPAM' in network_info else [],
             'internal': network_info.get('Internal', False),
             'attachableContainers': attachable_containers,
-            'options': network_info.get('Options', {}),
+            'options': docker_host.inventory.inspect('network', network_info['Id']).get('Options') or {},
             'labels': network_info.get('Labels', {}),
             'enableIPv6': network_info.get('EnableIPv6', False)
         }
     except docker.errors.NotFound:
         raise HTTPException(status_code=404, detail="Network not found")
     except Exception as e:
-        debug_print(f"Error in get_network: {str(e)}")
+        debug_print(f"Error in get_network: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/networks/{network_id}/disconnected")
-async def get_disconnected_containers(network_id: str):
+@blocking
+def get_disconnected_containers(network_id: str, host: Optional[str] = None):
+    docker_host = hosts.get(host)
     try:
-        network = docker_client.networks.get(network_id)
-        network_info = network.attrs
-        
-        debug_print(f"Network info for {network_id}: {network_info}")
-        
-        previously_connected = set()
-        if 'Containers' in network_info:
-            previously_connected = set(network_info.get('Containers', {}).keys())
-            debug_print(f"Previously connected containers: {previously_connected}")
+        network_info = docker_host.inventory.network(network_id)
+        previously_connected = (network_info.get('Containers') or {}).keys()
         
-        containers = docker_client.containers.list(all=True)
+        # Only the network's endpoints can qualify; resolve them in one batch
+        containers = docker_host.inventory.resolve_containers(previously_connected)
         
         disconnected = []
-        for container in containers:
-            container_networks = container.attrs['NetworkSettings']['Networks']
-            debug_print(f"Container {container.name} networks: {container_networks.keys()}")
-            
-            if (container.id in previously_connected and 
-                network.name not in container_networks):
+        for container in containers.values():
+            container_networks = container.get('NetworkSettings', {}).get('Networks', {})
+            if network_info['Name'] not in container_networks:
                 disconnected.append({
-                    'id': container.id,
-                    'name': container.name.lstrip('/'),
+                    'id': container['Id'],
+                    'name': container_name(container),
                     'state': {
-                        'Running': container.status == 'running',
-                        'Status': container.status
+                        'Running': container_status(container) == 'running',
+                        'Status': container_status(container)
                     }
                 })
         
-        debug_print(f"Disconnected containers: {disconnected}")
         return disconnected
         
     except docker.errors.NotFound:
         raise HTTPException(status_code=404, detail="Network not found")
     except Exception as e:
-        debug_print(f"Error in get_disconnected_containers: {str(e)}")
+        debug_print(f"Error in get_disconnected_containers: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ports")
-async def list_ports():
-    try:
-        containers = docker_client.containers.list()
-        
-        ports_data = []
-        for container in containers:
-            container_info = container.attrs
-            
-            networks = container_info.get('NetworkSettings', {}).get('Networks', {})
-            for network_name, network_info in networks.items():
-                network_id = network_info.get('NetworkID', '')
-                
-                ports = container_info.get('NetworkSettings', {}).get('Ports', {})
-                
-                if ports:
-                    ports_data.append({
-                        'containerId': container.id,
-                        'containerName': container.name.lstrip('/'),
-                        'networkId': network_id,
-                        'networkName': network_name,
-                        'ports': ports
-                    })
-        
-        debug_print(f"Ports data: {ports_data}")
-        return ports_data
-    except Exception as e:
-        debug_print(f"Error in list_ports: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def list_ports(request: Request, host: Optional[str] = None):
+    return await fleet_response(host, host_ports, request=request)
+
+@app.get("/api/ports/owner")
+async def port_owner(
+    request: Request,
+    port: int = Query(..., ge=1, le=65535),
+    proto: str = 'tcp',
+    host_ip: Optional[str] = None,
+    host: Optional[str] = None
+):
+    return await fleet_response(host, lambda docker_host: host_port_owners(docker_host, port, proto, host_ip), request=request)
+
+@app.get("/api/ports/free")
+async def free_ports(
+    request: Request,
+    count: int = Query(1, ge=1, le=100),
+    start: int = Query(8000, ge=1, le=65535),
+    end: int = Query(32767, ge=1, le=65535),
+    proto: str = 'tcp',
+    host_ip: str = '',
+    host: Optional[str] = None
+):
+    def build(docker_host):
+        return [{
+            'host': docker_host.name,
+            'proto': proto,
+            'ports': docker_host.inventory.free_ports(count, start, end, proto, host_ip),
+        }]
+    return await fleet_response(host, build, request=request)
+
+@app.get("/api/ports/conflicts")
+async def port_conflicts(request: Request, host: Optional[str] = None):
+    return await fleet_response(host, host_port_conflicts, request=request)
+
+def port_binding(docker_host, host_ip, container, container_port):
+    return {
+        'host': docker_host.name,
+        'hostIp': host_ip,
+        'containerId': container['Id'],
+        'containerName': container_name(container),
+        'containerPort': container_port,
+    }
+
+def host_ports(docker_host):
+    # One row per running container that publishes ports, from the inventory's
+    # port index; `networkId`/`networkName` name the first network for older clients
+    rows = []
+    for container in docker_host.inventory.publishing_containers():
+        settings = container.get('NetworkSettings') or {}
+        networks = [
+            {'id': (info or {}).get('NetworkID', ''), 'name': name}
+            for name, info in (settings.get('Networks') or {}).items()
+        ]
+        rows.append({
+            'host': docker_host.name,
+            'containerId': container['Id'],
+            'containerName': container_name(container),
+            'networkId': networks[0]['id'] if networks else '',
+            'networkName': networks[0]['name'] if networks else '',
+            'networks': networks,
+            'ports': settings.get('Ports') or {},
+        })
+    return rows
+
+def host_port_owners(docker_host, port, proto, host_ip):
+    return [
+        {**port_binding(docker_host, ip, container, container_port), 'hostPort': port, 'proto': proto}
+        for ip, container, container_port in docker_host.inventory.port_owners(port, proto, host_ip)
+    ]
+
+def host_port_conflicts(docker_host):
+    return [
+        {
+            'host': docker_host.name,
+            'hostPort': port,
+            'proto': proto,
+            'bindings': [
+                port_binding(docker_host, ip, container, container_port)
+                for ip, container, container_port in bindings
+            ],
+        }
+        for (port, proto), bindings in docker_host.inventory.port_conflicts().items()
+    ]
 
 # Container Routes
 @app.get("/api/containers")
-async def list_containers():
-    try:
-        containers = docker_client.containers.list(all=True)
-        return [{
-            'id': container.id,
-            'name': container.name.lstrip('/'),
-            'image': container.image.tags[0] if container.image.tags else container.image.id,
-            'status': container.status,
-            'state': container.attrs.get('State', {}),
-            'created': container.attrs.get('Created', ''),
-            'ports': container.attrs.get('NetworkSettings', {}).get('Ports', {}),
-            'networks': list(container.attrs.get('NetworkSettings', {}).get('Networks', {}).keys())
-        } for container in containers]
-    except Exception as e:
-        debug_print(f"Error in list_containers: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def list_containers(
+    request: Request,
+    host: Optional[str] = None,
+    name: Optional[str] = None,
+    status: Optional[str] = None,
+    label: Optional[str] = None,
+    network: Optional[str] = None,
+    image: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
+):
+    listing = list_query(
+        'container', name=name, status=status, label=label, network=network, image=image,
+        sort=sort, cursor=cursor, limit=limit, fields=fields
+    )
+    def rows(docker_host):
+        containers = listing.select(docker_host.inventory)
+        return [container_summary(container, docker_host) for container in containers]
+    return await fleet_response(host, rows, request=request, listing=listing)
 
 @app.get("/api/containers/running")
-async def list_running_containers():
+async def list_running_containers(request: Request, host: Optional[str] = None):
+    def rows(docker_host):
+        containers = [c for c in docker_host.inventory.containers() if container_status(c) == 'running']
+        return [container_summary(container, docker_host) for container in containers]
+    return await fleet_response(host, rows, request=request)
+
+@app.get("/api/containers/stats")
+async def get_container_stats(host: Optional[str] = None):
+    return await fleet_response(host, host_container_stats)
+
+def host_container_stats(docker_host):
     try:
-        containers = docker_client.containers.list(filters={"status": "running"})
-        return [{
-            'id': container.id,
-            'name': container.name.lstrip('/'),
-            'image': container.image.tags[0] if container.image.tags else container.image.id,
-            'status': container.status,
-            'state': container.attrs.get('State', {}),
-            'created': container.attrs.get('Created', ''),
-            'ports': container.attrs.get('NetworkSettings', {}).get('Ports', {}),
-            'networks': list(container.attrs.get('NetworkSettings', {}).get('Networks', {}).keys())
-        } for container in containers]
+        containers = [c for c in docker_host.inventory.containers() if container_status(c) == 'running']
+        stats = []
+        
+        for container in containers:
+            # Latest sample from the background collector; zeros until the first one arrives
+            sample = docker_host.stats_collector.latest(container['Id']) or empty_container_stats()
+            stats.append({
+                'host': docker_host.name,
+                'id': container['Id'],
+                'name': container_name(container),
+                'cpu_percentage': sample['cpu_percentage'],
+                'memory_usage': sample['memory_usage'],
+                'memory_limit': sample['memory_limit'],
+                'memory_percentage': sample['memory_percentage'],
+                'network_rx': sample['network_rx'],
+                'network_tx': sample['network_tx'],
+                'block_read': sample['block_read'],
+                'block_write': sample['block_write']
+            })
+                
+        return stats
     except Exception as e:
-        debug_print(f"Error in list_running_containers: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        debug_print(f"Error in get_container_stats: {str(e)}", ERROR)
+        raise
 
 @app.get("/api/containers/{container_id}")
-async def get_container(container_id: str):
+@blocking
+def get_container(container_id: str, host: Optional[str] = None, fields: Optional[str] = None):
+    docker_host = hosts.get(host)
     try:
-        debug_print(f"Attempting to get container with ID: {container_id}")
-        
-        # List all containers to check if the ID exists
-        all_containers = docker_client.containers.list(all=True)
-        container_ids = [c.id for c in all_containers]
-        debug_print(f"Available container IDs: {container_ids}")
+        debug_print(f"Attempting to get container with ID: {container_id}", DEBUG)
         
-        # Try to get the container
-        container = docker_client.containers.get(container_id)
-        debug_print(f"Found container: {container.name}")
-        
-        network_settings = container.attrs.get('NetworkSettings', {})
-        debug_print(f"Network settings: {network_settings.keys()}")
+        # The inventory only keeps list fields; details come from its inspect
+        # cache, with one daemon call shared by concurrent requests on a miss
+        container = inspect_flights.do(
+            (docker_host.name, container_id), docker_host.inventory.inspect, 'container', container_id
+        )
+        network_settings = container.get('NetworkSettings', {})
         
         response_data = {
-            'id': container.id,
-            'name': container.name.lstrip('/'),
-            'image': container.image.tags[0] if container.image.tags else container.image.id,
-            'status': container.status,
-            'state': container.attrs.get('State', {}),
-            'created': container.attrs.get('Created', ''),
+            'id': container['Id'],
+            'name': container_name(container),
+            'image': container_image(container, docker_host),
+            'status': container_status(container),
+            'state': container.get('State', {}),
+            'created': container.get('Created', ''),
             'ports': network_settings.get('Ports', {}),
             'networks': network_settings.get('Networks', {}),
-            'mounts': container.attrs.get('Mounts', []),
-            'config': container.attrs.get('Config', {})
+            'mounts': container.get('Mounts', []),
+            'config': container.get('Config', {})
         }
-        debug_print(f"Returning container data: {response_data}")
-        return response_data
+        return project(response_data, [f for f in fields.split(',') if f]) if fields else response_data
         
     except docker.errors.NotFound:
-        debug_print(f"Container not found: {container_id}")
+        debug_print(f"Container not found: {container_id}", DEBUG)
         raise HTTPException(
             status_code=404,
-            detail=f"Container not found: {container_id}. Available containers: {[c.id[:12] + '...' for c in docker_client.containers.list(all=True)]}"
+            detail=f"Container not found: {container_id}"
         )
     except Exception as e:
-        debug_print(f"Error in get_container: {str(e)}")
-        debug_print(f"Error type: {type(e)}")
-        debug_print(f"Error args: {e.args}")
+        debug_print(f"Error in get_container: {str(e)}", ERROR)
+        debug_print(f"Error type: {type(e)}", ERROR)
+        debug_print(f"Error args: {e.args}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/containers/{container_id}/logs")
-async def get_container_logs(container_id: str):
+@blocking
+def get_container_logs(
+    container_id: str,
+    tail: Optional[str] = None,
+    since: Optional[str] = None,
+    follow: bool = False,
+    stream: bool = False,
+    host: Optional[str] = None
+):
+    docker_host = hosts.get(host)
     try:
-        debug_print(f"Attempting to get logs for container with ID: {container_id}")
-        container = docker_client.containers.get(container_id)
+        debug_print(f"Attempting to get logs for container with ID: {container_id}", DEBUG)
+        container = docker_host.inventory.container(container_id)
+        if tail is None:
+            # Resuming from a cursor returns everything after it
+            tail = 'all' if since else '1000'
+        if tail != 'all' and not tail.isdigit():
+            raise HTTPException(status_code=400, detail="tail must be a number or 'all'")
+        if since and not valid_cursor(since):
+            # Otherwise read as no cursor at all, returning the whole log
+            raise HTTPException(status_code=400, detail="since must be a log cursor (a log line timestamp)")
         
-        # Get logs with timestamps
-        logs = container.logs(timestamps=True, tail=1000).decode('utf-8')
+        reader = LogReader(
+            docker_host.client,
+            container['Id'],
+            tail=tail if tail == 'all' else int(tail),
+            cursor=since,
+            follow=follow and stream
+        )
+        
+        if stream:
+            # NDJSON, one entry per line as the daemon produces them
+            return StreamingResponse(
+                ndjson_lines(iterate_batches(reader, log_stream_buffer)),
+                media_type='application/x-ndjson'
+            )
         
-        # Split logs into lines and parse timestamps
+        # Capped, so `tail=all` can't buffer a whole log; `truncated` tells the
+        # client to request the rest from the returned cursor
         log_lines = []
-        for line in logs.splitlines():
-            # Docker logs format: timestamp message
-            # Split only on first space to preserve spaces in message
-            parts = line.split(' ', 1)
-            if len(parts) == 2:
-                timestamp, message = parts
-                log_lines.append({
-                    'timestamp': timestamp,
-                    'message': message
-                })
-            else:
-                log_lines.append({
-                    'timestamp': None,
-                    'message': line
-                })
+        truncated = False
+        try:
+            for batch in reader.batches():
+                log_lines.extend(batch)
+                if len(log_lines) >= log_response_max_lines:
+                    del log_lines[log_response_max_lines:]
+                    truncated = True
+                    break
+        finally:
+            reader.close()
         
         return {
-            'container_id': container.id,
-            'container_name': container.name,
-            'logs': log_lines
+            'container_id': container['Id'],
+            'container_name': container_name(container),
+            'logs': log_lines,
+            'cursor': log_lines[-1]['cursor'] if log_lines else since,
+            'truncated': truncated
         }
         
+    except HTTPException:
+        raise
     except docker.errors.NotFound:
-        debug_print(f"Container not found: {container_id}")
+        debug_print(f"Container not found: {container_id}", DEBUG)
         raise HTTPException(
             status_code=404,
             detail=f"Container not found: {container_id}"
         )
     except Exception as e:
-        debug_print(f"Error getting logs for container {container_id}: {str(e)}")
+        debug_print(f"Error getting logs for container {container_id}: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
-# Image Routes
-@app.get("/api/images")
-async def list_images():
+@app.get("/api/containers/{container_id}/logs/search")
+@blocking
+def search_container_logs(
+    container_id: str,
+    q: str,
+    regex: bool = False,
+    ignore_case: bool = False,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    stdout: bool = True,
+    stderr: bool = True,
+    limit: int = Query(1000, ge=0),
+    index: bool = True,
+    host: Optional[str] = None
+):
+    docker_host = hosts.get(host)
     try:
-        images = docker_client.images.list()
-        return [{
-            'id': image.id,
-            'tags': image.tags,
-            'created': image.attrs['Created'] if isinstance(image.attrs['Created'], str) else datetime.datetime.fromtimestamp(image.attrs['Created']).isoformat(),
-            'size': image.attrs['Size'],
-            'containers': len(docker_client.containers.list(all=True, filters={'ancestor': image.id}))
-        } for image in images]
+        debug_print(f"Searching logs for container with ID: {container_id}", DEBUG)
+        container = docker_host.inventory.container(container_id)
+        try:
+            start, end = parse_time(since), parse_time(until)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        log_index = log_indexes[docker_host.name]
+        try:
+            search = LogSearch(
+                docker_host.client,
+                container['Id'],
+                q,
+                regex=regex,
+                ignore_case=ignore_case,
+                since=start,
+                until=end,
+                stdout=stdout,
+                stderr=stderr,
+                limit=limit,
+                index=log_index.get(container['Id']) if index and log_index.enabled else None
+            )
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid pattern: {str(e)}")
+        
+        # NDJSON, matches are sent as soon as they are found
+        return StreamingResponse(
+            ndjson_lines(iterate_batches(search, log_stream_buffer)),
+            media_type='application/x-ndjson'
+        )
+        
+    except HTTPException:
+        raise
+    except docker.errors.NotFound:
+        debug_print(f"Container not found: {container_id}", DEBUG)
+        raise HTTPException(
+            status_code=404,
+            detail=f"Container not found: {container_id}"
+        )
     except Exception as e:
-        debug_print(f"Error in list_images: {str(e)}")
+        debug_print(f"Error searching logs for container {container_id}: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/containers/bulk")
+async def bulk_container_action(request: Request, body: BulkAction, host: Optional[str] = None):
+    check_origin(request)
+    docker_host = hosts.get(host)
+    selector = body.selector
+    if not any(selector.model_dump().values()):
+        # Never act on every container by accident
+        raise HTTPException(status_code=400, detail="Selector must name ids or at least one filter")
+    filters = list_query(
+        'container',
+        name=selector.name,
+        status=selector.status,
+        label=selector.label,
+        image=selector.image,
+        network=selector.network
+    )
+
+    def targets():
+        containers = filters.select(docker_host.inventory) if filters.filters else None
+        if selector.ids is None:
+            return containers, []
+        selected = None if containers is None else {c['Id'] for c in containers}
+        found = {}
+        missing = []
+        for ref in dict.fromkeys(selector.ids):
+            try:
+                container = docker_host.inventory.container(ref)
+            except docker.errors.NotFound:
+                missing.append(ref)
+                continue
+            if selected is None or container['Id'] in selected:
+                found[container['Id']] = container
+        return list(found.values()), missing
+
+    containers, missing = await executor.run(targets)
+    try:
+        operation = BulkOperation(
+            docker_host,
+            body.action,
+            containers,
+            missing,
+            parallelism=body.parallelism,
+            item_timeout=body.timeout,
+            stop_timeout=body.stop_timeout,
+            signal=body.signal,
+            force=body.force,
+            max_failures=body.max_failures
+        )
+    except ActionNotAllowed as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # NDJSON progress, one line per container as it finishes
+    return StreamingResponse(ndjson_lines(operation.batches()), media_type='application/x-ndjson')
+
+# Image Routes
+@app.get("/api/images")
+async def list_images(
+    request: Request,
+    host: Optional[str] = None,
+    name: Optional[str] = None,
+    label: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
+):
+    listing = list_query('image', name=name, label=label, sort=sort, cursor=cursor, limit=limit, fields=fields)
+    def rows(docker_host):
+        images = listing.select(docker_host.inventory)
+        usage = image_usage(docker_host)
+        return [image_summary(image, usage, docker_host) for image in images]
+    return await fleet_response(host, rows, request=request, listing=listing)
+
+@app.get("/api/images/unused")
+async def list_unused_images(request: Request, host: Optional[str] = None):
+    def rows(docker_host):
+        # Images no container (running or stopped) was created from
+        images = docker_host.inventory.images()
+        usage = image_usage(docker_host)
+        return [image_summary(image, usage, docker_host) for image in images if not usage[image['Id']]]
+    return await fleet_response(host, rows, request=request)
+
+@app.get("/api/images/layers")
+async def get_image_layers(request: Request, host: Optional[str] = None):
+    # Deduplicated layer usage per host, from the cached layer graph
+    def summary(docker_host):
+        return docker_host.layers.summary(in_use=image_usage(docker_host))
+    return await fleet_response(host, summary, lambda results: results, request=request)
+
 @app.get("/api/images/{image_id}")
-async def get_image(image_id: str):
+@blocking
+def get_image(image_id: str, host: Optional[str] = None):
+    docker_host = hosts.get(host)
     try:
-        image = docker_client.images.get(image_id)
-        containers = docker_client.containers.list(all=True, filters={'ancestor': image.id})
+        image = docker_host.inventory.image(image_id)
+        containers = docker_host.inventory.image_users(image['Id'])
+        history = docker_host.layers.history(image['Id'])
         
         return {
-            'id': image.id,
-            'tags': image.tags,
-            'created': image.attrs['Created'] if isinstance(image.attrs['Created'], str) else datetime.datetime.fromtimestamp(image.attrs['Created']).isoformat(),
-            'size': image.attrs['Size'],
-            'architecture': image.attrs.get('Architecture', ''),
-            'os': image.attrs.get('Os', ''),
-            'author': image.attrs.get('Author', ''),
+            'id': image['Id'],
+            'tags': image.get('RepoTags') or [],
+            'created': image_created(image),
+            'size': image['Size'],
+            'architecture': image.get('Architecture', ''),
+            'os': image.get('Os', ''),
+            'author': image.get('Author', ''),
             'containers': [
                 {
-                    'id': container.id,
-                    'name': container.name.lstrip('/'),
-                    'status': container.status,
-                    'state': container.attrs['State'],
-                    'created': container.attrs['Created']
+                    'id': container['Id'],
+                    'name': container_name(container),
+                    'status': container_status(container),
+                    'state': container['State'],
+                    'created': container['Created']
                 }
                 for container in containers
             ],
-            'config': image.attrs.get('Config', {}),
-            'history': image.history()
+            # Records keep only the labels; the full config is in the inspect
+            'config': docker_host.inventory.inspect('image', image['Id']).get('Config') or {},
+            'history': history,
+            'layers': docker_host.layers.image(image['Id'])
         }
-    except docker.errors.ImageNotFound:
+    except docker.errors.NotFound:
         raise HTTPException(status_code=404, detail="Image not found")
     except Exception as e:
-        debug_print(f"Error in get_image: {str(e)}")
+        debug_print(f"Error in get_image: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Volume Routes
 @app.get("/api/volumes")
-async def list_volumes():
-    try:
-        volumes = docker_client.volumes.list()
-        return [{
-            'id': volume.id,
-            'name': volume.name,
-            'driver': volume.attrs['Driver'],
-            'mountpoint': volume.attrs['Mountpoint'],
-            'created': volume.attrs['CreatedAt'],
-            'status': volume.attrs.get('Status', {}),
-            'labels': volume.attrs.get('Labels', {})
-        } for volume in volumes]
-    except Exception as e:
-        debug_print(f"Error in list_volumes: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def list_volumes(
+    request: Request,
+    host: Optional[str] = None,
+    name: Optional[str] = None,
+    label: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
+):
+    listing = list_query('volume', name=name, label=label, sort=sort, cursor=cursor, limit=limit, fields=fields)
+    def rows(docker_host):
+        volumes = listing.select(docker_host.inventory)
+        return [volume_summary(volume, docker_host) for volume in volumes]
+    return await fleet_response(host, rows, request=request, listing=listing)
+
+@app.get("/api/volumes/usage")
+async def get_volume_usage(
+    host: Optional[str] = None,
+    unused: bool = False,
+    limit: Optional[int] = Query(20, ge=1)
+):
+    # Largest volumes first, straight from the scanner's cache
+    def rows(docker_host):
+        volumes = docker_host.disk_usage.volumes()
+        if unused:
+            volumes = [volume for volume in volumes if not volume['containers']]
+        return [{'host': docker_host.name, **volume} for volume in volumes]
+    def merge(results):
+        volumes = [row for rows in results.values() for row in rows]
+        volumes.sort(key=lambda volume: (volume['size'] is None, -(volume['size'] or 0), volume['name']))
+        return volumes[:limit] if limit else volumes
+    return await fleet_response(host, rows, merge)
 
 # Stats Routes
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request, host: Optional[str] = None):
+    return await fleet_response(host, host_stats, merge_stats, request=request)
+
+def merge_stats(results):
+    # Fleet-wide totals, with each host's own counts under 'hosts'
+    containers = Counter()
+    totals = Counter()
+    for stats in results.values():
+        containers.update(stats['containers'])
+        totals.update({key: stats[key] for key in ('images', 'networks', 'volumes')})
+    return {
+        'containers': {key: containers[key] for key in ('total', 'running', 'stopped')},
+        'images': totals['images'],
+        'networks': totals['networks'],
+        'volumes': totals['volumes'],
+        'hosts': results
+    }
+
+def host_stats(docker_host):
     try:
         # Get container stats
-        all_containers = docker_client.containers.list(all=True)
-        running_containers = docker_client.containers.list(filters={"status": "running"})
+        all_containers = docker_host.inventory.containers()
+        running_containers = [c for c in all_containers if container_status(c) == 'running']
         
         # Get other resource counts
-        images = docker_client.images.list()
-        networks = docker_client.networks.list()
-        volumes = docker_client.volumes.list()
+        images = docker_host.inventory.images()
+        networks = docker_host.inventory.networks()
+        volumes = docker_host.inventory.volumes()
         
         return {
             'containers': {
@@ -421,174 +1006,144 @@ async def get_stats():
             'volumes': len(volumes)
         }
     except Exception as e:
-        debug_print(f"Error in get_stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        debug_print(f"Error in get_stats: {str(e)}", ERROR)
+        raise
 
-@app.get("/api/containers/stats")
-async def get_container_stats():
+# Live Updates
+@app.websocket("/api/live")
+async def live_updates(websocket: WebSocket):
+    await live_hub.serve(websocket)
+
+@app.get("/api/live/stats")
+async def get_live_stats():
+    return live_hub.stats()
+
+# Metrics Routes
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    # Pre-rendered buffer; a scrape costs the same whatever the container count
+    body = metrics_exporter.body
+    if body is None:
+        raise HTTPException(status_code=503, detail="Metrics are not available yet")
+    headers = {'Vary': 'Accept-Encoding'}
+    if 'gzip' in accepted_encodings(request.headers.get('accept-encoding')):
+        body = metrics_exporter.gzipped
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, media_type=OPENMETRICS_CONTENT_TYPE, headers=headers)
+
+@app.get("/api/metrics/history")
+@blocking
+def get_metrics_history(
+    ids: str = HOST_SERIES,
+    start: Optional[float] = Query(None, alias='from'),
+    end: Optional[float] = Query(None, alias='to'),
+    step: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    host: Optional[str] = None
+):
+    docker_host = hosts.get(host)
     try:
-        containers = docker_client.containers.list()
-        stats = []
-        
-        for container in containers:
-            try:
-                stats_dict = container.stats(stream=False)
-                
-                # CPU stats with safety checks
-                cpu_stats = stats_dict.get('cpu_stats', {})
-                precpu_stats = stats_dict.get('precpu_stats', {})
-                
-                cpu_usage = cpu_stats.get('cpu_usage', {})
-                precpu_usage = precpu_stats.get('cpu_usage', {})
-                
-                cpu_delta = cpu_usage.get('total_usage', 0) - precpu_usage.get('total_usage', 0)
-                system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
-                
-                # Get number of CPUs
-                online_cpus = cpu_stats.get('online_cpus', 1)
-                if online_cpus == 0:
-                    online_cpus = 1
-                
-                # Calculate CPU percentage
-                cpu_percentage = 0.0
-                if system_delta > 0:
-                    cpu_percentage = (cpu_delta / system_delta) * 100.0 * online_cpus
-                
-                # Memory stats with safety checks
-                memory_stats = stats_dict.get('memory_stats', {})
-                memory_usage = memory_stats.get('usage', 0)
-                if memory_usage is None:
-                    memory_usage = 0
-                    
-                memory_limit = memory_stats.get('limit', 0)
-                if memory_limit is None or memory_limit == 0:
-                    memory_limit = psutil.virtual_memory().total  # Fallback to system total memory
-                
-                memory_percentage = 0.0
-                if memory_limit > 0:
-                    memory_percentage = (memory_usage / memory_limit) * 100.0
-                
-                # Network stats with safety checks
-                network_stats = stats_dict.get('networks', {})
-                if network_stats is None:
-                    network_stats = {}
-                    
-                rx_bytes = sum(interface.get('rx_bytes', 0) or 0 for interface in network_stats.values())
-                tx_bytes = sum(interface.get('tx_bytes', 0) or 0 for interface in network_stats.values())
-                
-                # Block IO stats with safety checks
-                blkio_stats = stats_dict.get('blkio_stats', {})
-                if blkio_stats is None:
-                    blkio_stats = {}
-                    
-                io_service_bytes = blkio_stats.get('io_service_bytes_recursive', [])
-                if io_service_bytes is None:
-                    io_service_bytes = []
-                    
-                read_bytes = sum(stat.get('value', 0) for stat in io_service_bytes if stat.get('op') == 'read')
-                write_bytes = sum(stat.get('value', 0) for stat in io_service_bytes if stat.get('op') == 'write')
-                
-                stats.append({
-                    'id': container.id,
-                    'name': container.name.lstrip('/'),
-                    'cpu_percentage': round(cpu_percentage, 2),
-                    'memory_usage': int(memory_usage),  # Ensure integer
-                    'memory_limit': int(memory_limit),  # Ensure integer
-                    'memory_percentage': round(memory_percentage, 2),
-                    'network_rx': int(rx_bytes),  # Ensure integer
-                    'network_tx': int(tx_bytes),  # Ensure integer
-                    'block_read': int(read_bytes),  # Ensure integer
-                    'block_write': int(write_bytes)  # Ensure integer
-                })
-            except Exception as e:
-                debug_print(f"Error getting stats for container {container.name}: {str(e)}")
-                # Add default stats for containers with errors
-                stats.append({
-                    'id': container.id,
-                    'name': container.name.lstrip('/'),
-                    'cpu_percentage': 0.0,
-                    'memory_usage': 0,
-                    'memory_limit': psutil.virtual_memory().total,
-                    'memory_percentage': 0.0,
-                    'network_rx': 0,
-                    'network_tx': 0,
-                    'block_read': 0,
-                    'block_write': 0
-                })
-                continue
-                
-        return stats
+        end = end or time.time()
+        start = start if start is not None else end - 600
+        field_names = [f for f in fields.split(',') if f] if fields else None
+
+        series = {}
+        for ref in [i for i in ids.split(',') if i]:
+            series_id = ref if ref == HOST_SERIES else docker_host.inventory.container(ref)['Id']
+            resolution, data = metrics_store.query(series_id, start, end, step, field_names)
+            data['resolution'] = resolution
+            series[ref] = data
+
+        return {
+            'from': start,
+            'to': end,
+            'step': step,
+            'series': series
+        }
+    except docker.errors.NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        debug_print(f"Error in get_container_stats: {str(e)}")
+        debug_print(f"Error in get_metrics_history: {str(e)}", ERROR)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/system/executor")
+async def get_executor_stats():
+    # Served on the event loop so it still answers when the pool is saturated
+    return executor.stats()
+
+@app.get("/api/system/http-cache")
+async def get_http_cache_stats():
+    return response_cache.stats()
+
+@app.get("/api/system/coalescing")
+async def get_coalescing_stats():
+    return {flights.name: flights.stats() for flights in (fleet_flights, inspect_flights)}
+
+@app.get("/api/system/df")
+async def get_disk_usage(host: Optional[str] = None):
+    # Image, build cache and volume usage per host, from the background refresh
+    def usage(docker_host):
+        return docker_host.disk_usage.summary()
+    return await fleet_response(host, usage, lambda results: results)
+
 @app.get("/api/system/stats")
 async def get_system_stats():
-    try:
-        # Get CPU info
-        cpu_percent_per_core = psutil.cpu_percent(interval=1, percpu=True)
-        cpu_freq = psutil.cpu_freq()
-        cpu_info = {
-            'cores': psutil.cpu_count(),
-            'usage_per_core': cpu_percent_per_core,
-            'average_usage': sum(cpu_percent_per_core) / len(cpu_percent_per_core),
-            'frequency': {
-                'current': cpu_freq.current if cpu_freq else None,
-                'min': cpu_freq.min if cpu_freq else None,
-                'max': cpu_freq.max if cpu_freq else None
-            } if cpu_freq else None
-        }
+    # Latest snapshot from the background sampler; never waits on psutil
+    snapshot = host_recorder.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="System stats are not available yet")
+    return snapshot 
 
-        # Get memory info
-        memory = psutil.virtual_memory()
-        memory_info = {
-            'total': memory.total,
-            'available': memory.available,
-            'used': memory.used,
-            'percent': memory.percent
-        }
+# Health checks; answered on the event loop without touching a daemon
+@app.get("/api/health/live")
+async def liveness():
+    # The process is up and its event loop is turning
+    return {
+        'status': 'ok',
+        'uptime': round(time.time() - perf.started_at, 1),
+        'loopLagMs': round(perf.loop_lag_ms, 3),
+    }
 
-        # Get disk info
-        disk = psutil.disk_usage('/')
-        disk_info = {
-            'total': disk.total,
-            'used': disk.used,
-            'free': disk.free,
-            'percent': disk.percent
-        }
+@app.get("/api/health/ready")
+async def readiness():
+    # Ready once warm-up is done and the default host serves from a current cache;
+    # other fleet hosts are reported but don't hold back the rest
+    status = [docker_host.status() for docker_host in hosts.select()]
+    ready = warmed.is_set() and hosts.default.ready
+    content = {'status': 'ready' if ready else 'starting', 'warmed': warmed.is_set(), 'hosts': status}
+    return JSONResponse(status_code=200 if ready else 503, content=content)
 
-        # Get network info
-        net_if_addrs = psutil.net_if_addrs()
-        net_io = psutil.net_io_counters()
-        
-        network_info = {
-            'interfaces': {
-                interface: {
-                    'addresses': [
-                        {
-                            'address': addr.address,
-                            'family': str(addr.family),
-                            'netmask': addr.netmask if hasattr(addr, 'netmask') else None
-                        }
-                        for addr in addrs
-                    ]
-                }
-                for interface, addrs in net_if_addrs.items()
-            },
-            'io': {
-                'bytes_sent': net_io.bytes_sent,
-                'bytes_recv': net_io.bytes_recv,
-                'packets_sent': net_io.packets_sent,
-                'packets_recv': net_io.packets_recv
-            }
-        }
+# Internal diagnostics
+@app.get("/api/_debug/perf")
+async def get_perf_stats():
+    # Served on the event loop so it still answers when the pool is saturated
+    return {
+        **perf.stats(),
+        'executor': executor.stats(),
+        'fleet_executor': hosts.executor.stats(),
+        'bulk_executor': bulk_executor.stats(),
+        'inspect_cache': {docker_host.name: docker_host.inventory.inspect_stats() for docker_host in hosts.select()},
+        'profiler': {'enabled': profiler.enabled, 'running': profiler.running},
+    }
 
-        return {
-            'cpu': cpu_info,
-            'memory': memory_info,
-            'disk': disk_info,
-            'network': network_info
-        }
-    except Exception as e:
-        debug_print(f"Error in get_system_stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+@app.post("/api/_debug/profile")
+async def start_profile(seconds: float = Query(30, gt=0), interval: float = Query(0.01, ge=0.001)):
+    if not profiler.enabled:
+        raise HTTPException(status_code=403, detail="Profiler is disabled; set PROFILER_ENABLED=1")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    profiler.start(seconds, interval)
+    return profiler.report()
+
+@app.delete("/api/_debug/profile")
+@blocking
+def stop_profile():
+    profiler.stop()
+    return profiler.report()
+
+@app.get("/api/_debug/profile")
+async def get_profile(format: str = 'json', limit: int = Query(30, ge=1)):
+    if format == 'collapsed':
+        # Folded stacks for flamegraph.pl or speedscope
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(limit)
@@ -0,0 +1,295 @@
+"""
+Fixed-memory time-series store for container and host metrics.
+
+Each series keeps one ring buffer per resolution tier (1s/10s/1m by default).
+Buckets hold min/avg/max per field in flat `array` columns, so memory is
+allocated once per series and range queries are answered by slicing.
+Columns are float64: byte counters lose precision in float32 above 16 MiB.
+A bucket costs 10 + 24 * fields bytes, so with the 8 container fields the
+default tiers (1200 buckets) take about 237 KiB per container.
+"""
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from host_sampler import HostSampler, summary_fields
+from utils import ERROR, debug_print, env_float
+
+# resolution seconds: number of buckets
+DEFAULT_TIERS = '1:120,10:360,60:720'
+HOST_SERIES = 'host'
+
+
+def _rounded(column):
+    # Trim the noise of running means from the output
+    return [round(value, 3) for value in column]
+
+
+def parse_tiers(spec):
+    tiers = []
+    for part in spec.split(','):
+        resolution, capacity = part.split(':')
+        tiers.append((int(resolution), int(capacity)))
+    return sorted(tiers)
+
+
+class _Tier:
+    __slots__ = ('resolution', 'capacity', 'head', 'size', 'times', 'counts', 'mins', 'maxs', 'avgs')
+
+    def __init__(self, resolution, capacity, field_count):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.head = -1
+        self.size = 0
+        self.times = array('d', bytes(8 * capacity))
+        self.counts = array('H', bytes(2 * capacity))
+        self.mins = [array('d', bytes(8 * capacity)) for _ in range(field_count)]
+        self.maxs = [array('d', bytes(8 * capacity)) for _ in range(field_count)]
+        self.avgs = [array('d', bytes(8 * capacity)) for _ in range(field_count)]
+
+    def add(self, timestamp, values):
+        bucket = timestamp - timestamp % self.resolution
+        head = self.head
+        if head >= 0 and self.times[head] == bucket:
+            count = self.counts[head]
+            if count < 0xFFFF:
+                count += 1
+                self.counts[head] = count
+            for i, value in enumerate(values):
+                if value < self.mins[i][head]:
+                    self.mins[i][head] = value
+                if value > self.maxs[i][head]:
+                    self.maxs[i][head] = value
+                # Running mean avoids keeping large float sums per bucket
+                self.avgs[i][head] += (value - self.avgs[i][head]) / count
+            return
+        if head >= 0 and bucket < self.times[head]:
+            # Out-of-order sample older than the newest bucket
+            return
+        head = (head + 1) % self.capacity
+        self.head = head
+        self.size = min(self.size + 1, self.capacity)
+        self.times[head] = bucket
+        self.counts[head] = 1
+        for i, value in enumerate(values):
+            self.mins[i][head] = value
+            self.maxs[i][head] = value
+            self.avgs[i][head] = value
+
+    def oldest(self):
+        if self.size == 0:
+            return math.inf
+        return self.times[(self.head + 1) % self.capacity] if self.size == self.capacity else self.times[0]
+
+    def _ordered(self, column):
+        # Unroll the ring so index 0 is the oldest bucket
+        if self.size < self.capacity:
+            return column[:self.size]
+        start = self.head + 1
+        return column[start:] + column[:start]
+
+    def window(self, start, end, field_indexes):
+        times = self._ordered(self.times)
+        lo = bisect_left(times, start - start % self.resolution)
+        hi = bisect_right(times, end)
+        return (
+            times[lo:hi],
+            self._ordered(self.counts)[lo:hi],
+            {i: (self._ordered(self.mins[i])[lo:hi],
+                 self._ordered(self.avgs[i])[lo:hi],
+                 self._ordered(self.maxs[i])[lo:hi]) for i in field_indexes},
+        )
+
+
+class _Series:
+    __slots__ = ('tiers', 'lock')
+
+    def __init__(self, tiers, field_count):
+        self.tiers = [_Tier(resolution, capacity, field_count) for resolution, capacity in tiers]
+        self.lock = threading.Lock()
+
+    def add(self, timestamp, values):
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+
+
+class MetricsStore:
+    def __init__(self, container_fields, host_fields, tiers=None):
+        self.container_fields = tuple(container_fields)
+        self.host_fields = tuple(host_fields)
+        self.tiers = parse_tiers(tiers or DEFAULT_TIERS)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def fields(self, series_id):
+        return self.host_fields if series_id == HOST_SERIES else self.container_fields
+
+    def record(self, series_id, timestamp, sample):
+        fields = self.fields(series_id)
+        values = [float(sample.get(name) or 0) for name in fields]
+        series = self._series.get(series_id)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(series_id, _Series(self.tiers, len(fields)))
+        series.add(timestamp, values)
+
+    def record_container(self, container_id, sample):
+        self.record(container_id, sample.get('timestamp') or time.time(), sample)
+
+    def drop(self, series_id):
+        with self._lock:
+            self._series.pop(series_id, None)
+
+    def on_inventory_change(self, kind, action, key, attrs):
+        # History is kept across restarts but released once a container is removed
+        if kind == 'container' and action == 'remove':
+            self.drop(key)
+
+    def series_ids(self):
+        with self._lock:
+            return list(self._series)
+
+    def query(self, series_id, start, end, step=None, fields=None):
+        """Return min/avg/max columns for [start, end] downsampled to `step` seconds."""
+        all_fields = self.fields(series_id)
+        names = [name for name in (fields or all_fields) if name in all_fields]
+        indexes = [all_fields.index(name) for name in names]
+        empty = {
+            'timestamps': [],
+            'fields': {name: {'min': [], 'avg': [], 'max': []} for name in names},
+        }
+        series = self._series.get(series_id)
+        if series is None:
+            return None, empty
+
+        tier = self._pick_tier(series, start, step)
+        with series.lock:
+            times, counts, columns = tier.window(start, end, indexes)
+        step = max(step or tier.resolution, tier.resolution)
+
+        if step == tier.resolution:
+            return tier.resolution, {
+                'timestamps': times.tolist(),
+                'fields': {
+                    name: {
+                        'min': _rounded(columns[i][0]),
+                        'avg': _rounded(columns[i][1]),
+                        'max': _rounded(columns[i][2]),
+                    } for name, i in zip(names, indexes)
+                },
+            }
+        return tier.resolution, self._rollup(times, counts, columns, names, indexes, step)
+
+    def _pick_tier(self, series, start, step):
+        tiers = series.tiers
+        candidates = [tier for tier in tiers if not step or tier.resolution <= step] or tiers[:1]
+        # Tiers reaching back to `start`, or that have not wrapped yet and so
+        # still hold the whole history of the series
+        covering = [
+            tier for tier in candidates
+            if tier.oldest() <= start or tier.size < tier.capacity
+        ]
+        if covering:
+            # With a step, the coarsest tier that is still fine enough; otherwise the finest
+            return covering[-1] if step else covering[0]
+        # Nothing reaches back to `start`; use the tier with the longest history
+        return min(tiers, key=lambda tier: (tier.oldest(), tier.resolution))
+
+    @staticmethod
+    def _rollup(times, counts, columns, names, indexes, step):
+        out_times = []
+        out = {i: ([], [], []) for i in indexes}
+        current = None
+        acc_count = 0
+        acc = {}
+        for position, timestamp in enumerate(times):
+            bucket = timestamp - timestamp % step
+            if bucket != current:
+                if current is not None:
+                    out_times.append(current)
+                    for i in indexes:
+                        low, total, high = acc[i]
+                        out[i][0].append(low)
+                        out[i][1].append(total / acc_count if acc_count else 0.0)
+                        out[i][2].append(high)
+                current = bucket
+                acc_count = 0
+                acc = {i: (math.inf, 0.0, -math.inf) for i in indexes}
+            count = counts[position]
+            acc_count += count
+            for i in indexes:
+                mins, avgs, maxs = columns[i]
+                low, total, high = acc[i]
+                acc[i] = (min(low, mins[position]), total + avgs[position] * count, max(high, maxs[position]))
+        if current is not None:
+            out_times.append(current)
+            for i in indexes:
+                low, total, high = acc[i]
+                out[i][0].append(low)
+                out[i][1].append(total / acc_count if acc_count else 0.0)
+                out[i][2].append(high)
+        return {
+            'timestamps': out_times,
+            'fields': {
+                name: {'min': _rounded(out[i][0]), 'avg': _rounded(out[i][1]), 'max': _rounded(out[i][2])}
+                for name, i in zip(names, indexes)
+            },
+        }
+
+
+class HostRecorder:
+    """Samples the host at a fixed interval and records it into the store.
+
+    `snapshot` holds the full system snapshot, `latest` its SystemStats fields.
+    """
+
+    def __init__(self, store, interval=None, sampler=None):
+        self.store = store
+        self.interval = interval or env_float('METRICS_HOST_INTERVAL', 1.0)
+        self.sampler = sampler or HostSampler()
+        self.snapshot = None
+        self.latest = None
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Register callback(sample) for every host sample."""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.sampler.prime()
+        try:
+            # Something to serve until the first full interval has elapsed
+            self.snapshot = self.sampler.sample()
+        except Exception as e:
+            debug_print(f"Error sampling host: {str(e)}", ERROR)
+        self._thread = threading.Thread(target=self._run, name='metrics-host', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                snapshot = self.sampler.sample()
+                sample = summary_fields(snapshot)
+                sample['timestamp'] = snapshot['timestamp']
+                self.snapshot = snapshot
+                self.latest = sample
+                self.store.record(HOST_SERIES, sample['timestamp'], sample)
+            except Exception as e:
+                debug_print(f"Error recording host metrics: {str(e)}", ERROR)
+                continue
+            for callback in self._listeners:
+                try:
+                    callback(sample)
+                except Exception as e:
+                    debug_print(f"Error in host metrics listener: {str(e)}", ERROR)
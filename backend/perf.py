@@ -0,0 +1,378 @@
+"""
+Request instrumentation and an opt-in sampling profiler.
+
+`PerfMiddleware` times every HTTP request per route template and counts the
+Docker daemon calls made on its behalf: each host's API client is wrapped by
+`PerfRecorder.instrument_client`, and the executor carries the request's
+context into its worker threads, so calls made in blocking handlers are
+attributed to the request that caused them. Event-loop lag is measured by a
+task that checks how late its own wakeups are. Everything is kept in
+fixed-bucket histograms and exposed at /api/_debug/perf.
+
+`SamplingProfiler` periodically captures the stack of every thread while it
+runs. It is only available with `PROFILER_ENABLED=1`.
+"""
+import asyncio
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from utils import DEBUG, WARNING, debug_print, env_float, env_int
+
+# Upper bounds in milliseconds
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Daemon API collections whose second path segment is an object id or name
+_COLLECTIONS = {'containers', 'images', 'networks', 'volumes', 'exec', 'plugins',
+                'services', 'nodes', 'tasks', 'secrets', 'configs'}
+# ...unless it is one of these collection-level actions
+_COLLECTION_ACTIONS = {'json', 'create', 'prune', 'search', 'load', 'get', 'build'}
+
+_current = contextvars.ContextVar('perf_request', default=None)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        index = 0
+        for bound in BUCKETS_MS:
+            if ms <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, round(self.max, 3))
+        return round(self.max, 3)
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(BUCKETS_MS, self.counts)},
+                '+Inf': self.counts[-1],
+            },
+        }
+
+
+class _RequestCalls:
+    __slots__ = ('calls', 'seconds', 'lock')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        # Fleet requests make calls from several worker threads at once
+        self.lock = threading.Lock()
+
+
+class _RouteStats:
+    __slots__ = ('latency', 'errors', 'daemon_calls', 'daemon_seconds', 'max_daemon_calls')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.daemon_calls = 0
+        self.daemon_seconds = 0.0
+        self.max_daemon_calls = 0
+
+
+def daemon_endpoint(method, url):
+    """Collapse a daemon API URL to a template, e.g. `GET /containers/{id}/json`."""
+    path = re.sub(r'^/v\d+(\.\d+)?', '', urlsplit(url).path)
+    parts = path.strip('/').split('/')
+    if parts[0] in _COLLECTIONS and len(parts) > 1 and parts[1] not in _COLLECTION_ACTIONS:
+        # Image references may contain slashes; keep only the trailing action
+        action = parts[-1] if len(parts) > 2 else None
+        parts = [parts[0], '{id}'] + ([action] if action else [])
+    return f"{method} /{'/'.join(parts)}"
+
+
+class PerfRecorder:
+    def __init__(self, slow_ms=None, lag_interval=None):
+        self.slow_ms = slow_ms or env_float('SLOW_REQUEST_MS', 1000.0)
+        self.lag_interval = lag_interval or env_float('LOOP_LAG_INTERVAL', 0.5)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._daemon = {}
+        self._daemon_errors = Counter()
+        self._loop_lag = Histogram()
+        self._last_lag = 0.0
+        self._lag_task = None
+
+    # Docker calls
+
+    def instrument_client(self, client):
+        """Time every HTTP request the client's low-level API makes."""
+        api = client.api
+        send = api.send
+
+        def timed_send(request, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                response = send(request, **kwargs)
+                failed = False
+                return response
+            finally:
+                self._record_daemon_call(request.method, request.url, time.perf_counter() - started, failed)
+
+        # requests.Session.request() calls self.send, so an instance attribute is enough
+        api.send = timed_send
+        return client
+
+    def _record_daemon_call(self, method, url, seconds, failed):
+        endpoint = daemon_endpoint(method, url)
+        with self._lock:
+            histogram = self._daemon.get(endpoint)
+            if histogram is None:
+                histogram = self._daemon[endpoint] = Histogram()
+            histogram.observe(seconds * 1000)
+            if failed:
+                self._daemon_errors[endpoint] += 1
+        calls = _current.get()
+        if calls is not None:
+            with calls.lock:
+                calls.calls += 1
+                calls.seconds += seconds
+
+    # Requests
+
+    def record_request(self, method, route, status, seconds, calls):
+        ms = seconds * 1000
+        key = f"{method} {route}"
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _RouteStats()
+            stats.latency.observe(ms)
+            if status >= 500:
+                stats.errors += 1
+            stats.daemon_calls += calls.calls
+            stats.daemon_seconds += calls.seconds
+            stats.max_daemon_calls = max(stats.max_daemon_calls, calls.calls)
+        if ms >= self.slow_ms:
+            debug_print("Slow request", WARNING, route=key, status=status, ms=round(ms, 1),
+                        daemon_calls=calls.calls, daemon_ms=round(calls.seconds * 1000, 1))
+        else:
+            debug_print("Request", DEBUG, route=key, status=status, ms=round(ms, 1), daemon_calls=calls.calls)
+
+    # Event loop
+
+    @property
+    def loop_lag_ms(self):
+        return self._last_lag
+
+    def start(self):
+        if self._lag_task is None:
+            self._lag_task = asyncio.get_running_loop().create_task(self._watch_loop())
+
+    def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    async def _watch_loop(self):
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            # How long the loop was busy with something else when we were due
+            lag = max(0.0, time.perf_counter() - expected) * 1000
+            self._last_lag = lag
+            self._loop_lag.observe(lag)
+
+    def stats(self):
+        with self._lock:
+            routes = {}
+            for key, stats in sorted(self._routes.items()):
+                count = stats.latency.count
+                routes[key] = {
+                    **stats.latency.stats(),
+                    'errors': stats.errors,
+                    'daemon_calls': stats.daemon_calls,
+                    'daemon_calls_per_request': round(stats.daemon_calls / count, 3) if count else 0.0,
+                    'max_daemon_calls': stats.max_daemon_calls,
+                    'daemon_ms': round(stats.daemon_seconds * 1000, 3),
+                }
+            daemon = {
+                key: {**histogram.stats(), 'errors': self._daemon_errors[key]}
+                for key, histogram in sorted(self._daemon.items())
+            }
+        return {
+            'uptime': round(time.time() - self.started_at, 1),
+            'routes': routes,
+            'daemon': daemon,
+            'loop_lag': {**self._loop_lag.stats(), 'last_ms': round(self._last_lag, 3)},
+        }
+
+
+perf = PerfRecorder()
+
+
+class PerfMiddleware:
+    """ASGI middleware timing each request up to its response headers."""
+
+    def __init__(self, app, recorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        calls = _RequestCalls()
+        token = _current.set(calls)
+        started = time.perf_counter()
+        # Streaming responses are timed to their first byte, not their end
+        outcome = {'status': 500, 'seconds': None}
+
+        async def timed_send(message):
+            if message['type'] == 'http.response.start':
+                outcome['status'] = message['status']
+                outcome['seconds'] = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _current.reset(token)
+            route = scope.get('route')
+            endpoint = scope.get('endpoint')
+            # Route templates keep the key space bounded; never key on raw paths
+            name = getattr(route, 'path', None) or getattr(endpoint, '__name__', None) or '<unmatched>'
+            seconds = outcome['seconds'] if outcome['seconds'] is not None else time.perf_counter() - started
+            self.recorder.record_request(scope['method'], name, outcome['status'], seconds, calls)
+
+
+def _thread_group(name):
+    # Collapse per-container and per-worker thread names into one group
+    return re.sub(r'[-_][0-9a-f]+$', '', name)
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.enabled = os.environ.get('PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')
+        self.max_seconds = env_float('PROFILER_MAX_SECONDS', 300.0)
+        self.max_depth = env_int('PROFILER_MAX_DEPTH', 64)
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._samples = 0
+        self._interval = None
+        self._started_at = None
+        self._stopped_at = None
+        self._stop = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, interval):
+        """Sample all threads every `interval` seconds for up to `seconds`."""
+        seconds = min(seconds, self.max_seconds)
+        with self._lock:
+            self._stacks = Counter()
+            self._samples = 0
+            self._interval = interval
+            self._started_at = time.time()
+            self._stopped_at = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(time.monotonic() + seconds, interval, self._stop),
+            name='profiler', daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self, deadline, interval, stop):
+        own = threading.get_ident()
+        try:
+            while not stop.wait(interval) and time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                sampled = []
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(_thread_group(names.get(ident, str(ident))))
+                    sampled.append(';'.join(reversed(stack)))
+                with self._lock:
+                    self._stacks.update(sampled)
+                    self._samples += 1
+        finally:
+            self._stopped_at = time.time()
+
+    def collapsed(self):
+        """Folded stacks (`frame;frame;... count`) for flame graph tools."""
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def report(self, limit=30):
+        with self._lock:
+            stacks = self._stacks.copy()
+            samples = self._samples
+        total = sum(stacks.values())
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        def top(counter):
+            return [
+                {'function': name, 'samples': count, 'percent': round(count / total * 100, 2)}
+                for name, count in counter.most_common(limit)
+            ]
+
+        return {
+            'enabled': self.enabled,
+            'running': self.running,
+            'started_at': self._started_at,
+            'stopped_at': self._stopped_at,
+            'interval': self._interval,
+            'samples': samples,
+            'thread_samples': total,
+            'self': top(own) if total else [],
+            'inclusive': top(inclusive) if total else [],
+        }
@@ -0,0 +1,145 @@
+"""
+Compact records for cached Docker objects.
+
+The inventory keeps one record per container, image, network and volume.
+A record holds only the fields that list views, filters and indexes read,
+in slots rather than a per-object dict. It is still read like the inspect
+payload it came from (`attrs['Id']`, `attrs.get('Config')`), so code written
+against raw attrs keeps working. Nested values that repeat across many
+objects, like container states, are interned and shared. Records are
+read-only by convention.
+
+Full inspect data for a detail view is fetched on demand; see
+`Inventory.inspect`.
+"""
+from collections.abc import Mapping
+
+# Interned nested values shared by every record with the same content
+_interned = {}
+
+
+def _intern(key, value):
+    return _interned.setdefault(key, value)
+
+
+def compact_state(status):
+    """Inspect-style `State` for a list status, shared between containers."""
+    return _intern(('state', status), {
+        'Status': status,
+        # Matches inspect, where paused and restarting containers are still running
+        'Running': status in ('running', 'paused', 'restarting'),
+        'Paused': status == 'paused',
+        'Restarting': status == 'restarting',
+        'Dead': status == 'dead',
+    })
+
+
+def compact_host_config(network_mode):
+    return _intern(('host_config', network_mode), {'NetworkMode': network_mode} if network_mode else {})
+
+
+class Record(Mapping):
+    """Read-only, dict-like view over a slots object."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class ContainerRecord(Record):
+    __slots__ = ('Id', 'Name', 'Image', 'Created', 'State', 'Config', 'HostConfig', 'Mounts', 'NetworkSettings')
+
+    def __init__(self, Id, Name, Image, Created, State, Config, HostConfig, Mounts, NetworkSettings):
+        self.Id = Id
+        self.Name = Name
+        self.Image = Image
+        self.Created = Created
+        self.State = State
+        self.Config = Config
+        self.HostConfig = HostConfig
+        self.Mounts = Mounts
+        self.NetworkSettings = NetworkSettings
+
+
+class ImageRecord(Record):
+    __slots__ = ('Id', 'RepoTags', 'Created', 'Size', 'Architecture', 'Os', 'Author', 'Config', 'RootFS')
+
+    def __init__(self, attrs):
+        self.Id = attrs['Id']
+        self.RepoTags = attrs.get('RepoTags') or []
+        self.Created = attrs.get('Created', '')
+        self.Size = attrs.get('Size') or 0
+        self.Architecture = attrs.get('Architecture', '')
+        self.Os = attrs.get('Os', '')
+        self.Author = attrs.get('Author', '')
+        # Labels only; the rest of Config is in the full inspect
+        self.Config = {'Labels': (attrs.get('Config') or {}).get('Labels') or {}}
+        self.RootFS = {'Layers': (attrs.get('RootFS') or {}).get('Layers') or []}
+
+    def with_summary(self, summary):
+        """This record updated from an /images/json entry, the same object if unchanged."""
+        tags = [tag for tag in summary.get('RepoTags') or [] if tag != '<none>:<none>']
+        size = summary.get('Size') or self.Size
+        if tags == self.RepoTags and size == self.Size:
+            return self
+        return ImageRecord({**self, 'RepoTags': tags, 'Size': size})
+
+
+class NetworkRecord(Record):
+    __slots__ = ('Id', 'Name', 'Driver', 'Scope', 'Created', 'Internal', 'EnableIPv6', 'IPAM', 'Labels',
+                 'Containers')
+
+    def __init__(self, attrs):
+        self.Id = attrs['Id']
+        self.Name = attrs.get('Name', '')
+        self.Driver = attrs.get('Driver', '')
+        self.Scope = attrs.get('Scope', '')
+        self.Created = attrs.get('Created', '')
+        self.Internal = attrs.get('Internal', False)
+        self.EnableIPv6 = attrs.get('EnableIPv6', False)
+        self.IPAM = {'Config': (attrs.get('IPAM') or {}).get('Config') or []}
+        self.Labels = attrs.get('Labels') or {}
+        # Endpoint addresses by container id, for the attached-containers view
+        self.Containers = {
+            container_id: {
+                'IPv4Address': endpoint.get('IPv4Address', ''),
+                'IPv6Address': endpoint.get('IPv6Address', ''),
+                'MacAddress': endpoint.get('MacAddress', ''),
+            }
+            for container_id, endpoint in (attrs.get('Containers') or {}).items()
+        }
+
+
+class VolumeRecord(Record):
+    __slots__ = ('Name', 'Driver', 'Mountpoint', 'CreatedAt', 'Status', 'Labels', 'Scope')
+
+    def __init__(self, attrs):
+        self.Name = attrs['Name']
+        self.Driver = attrs.get('Driver', '')
+        self.Mountpoint = attrs.get('Mountpoint', '')
+        self.CreatedAt = attrs.get('CreatedAt', '')
+        self.Status = attrs.get('Status') or {}
+        self.Labels = attrs.get('Labels') or {}
+        self.Scope = attrs.get('Scope', '')
@@ -0,0 +1,129 @@
+"""
+Single-flight coalescing of identical concurrent work.
+
+When several requests ask for the same thing at once, e.g. a dozen dashboard
+tabs polling the same list or opening the same container, a `SingleFlight`
+group does the work once and hands the result to every caller waiting on the
+same key. A successful result is also kept for `ttl` seconds
+(`COALESCE_TTL`), so polls that arrive just after it finished share it too.
+Failures go to the callers already waiting but are never kept.
+
+Each group counts calls that did the work, joined one in flight or were
+served within the TTL; see /api/system/coalescing.
+"""
+import asyncio
+import threading
+import time
+
+from utils import env_float, env_int
+
+
+def _error(future):
+    if future.cancelled():
+        return asyncio.CancelledError()
+    return future.exception()
+
+
+class _Flight:
+    __slots__ = ('event', 'future', 'loop', 'result', 'error', 'finished_at')
+
+    def __init__(self, loop=None):
+        self.event = threading.Event() if loop is None else None
+        self.future = None
+        self.loop = loop
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    def __init__(self, name, ttl=None, max_entries=None):
+        self.name = name
+        self.ttl = ttl if ttl is not None else env_float('COALESCE_TTL', 0.5)
+        self.max_entries = max_entries or env_int('COALESCE_MAX_ENTRIES', 1024)
+        self._lock = threading.Lock()
+        # key -> flight, while in flight and then for `ttl` if it succeeded
+        self._flights = {}
+        self._executed = 0
+        self._joined = 0
+        self._cached = 0
+        self._errors = 0
+
+    def _join(self, key, loop=None):
+        """Return (flight, leader); called with the lock held."""
+        flight = self._flights.get(key)
+        if flight is not None and flight.loop is loop:
+            if flight.finished_at is None:
+                self._joined += 1
+                return flight, False
+            if flight.error is None and time.monotonic() - flight.finished_at < self.ttl:
+                self._cached += 1
+                return flight, False
+        if len(self._flights) >= self.max_entries:
+            self._trim()
+        flight = self._flights[key] = _Flight(loop)
+        self._executed += 1
+        return flight, True
+
+    def _trim(self):
+        now = time.monotonic()
+        for key, flight in list(self._flights.items()):
+            if flight.finished_at is not None and (flight.error is not None or now - flight.finished_at >= self.ttl):
+                del self._flights[key]
+
+    def _finish(self, key, flight, error):
+        with self._lock:
+            flight.error = error
+            flight.finished_at = time.monotonic()
+            if error is not None:
+                self._errors += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def do(self, key, fn, *args):
+        """Return fn(*args), sharing the call with threads asking for the same key."""
+        with self._lock:
+            flight, leader = self._join(key)
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        error = None
+        try:
+            flight.result = fn(*args)
+            return flight.result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, flight, error)
+            flight.event.set()
+
+    async def run(self, key, fn, *args):
+        """Await fn(*args), sharing it with coroutines asking for the same key."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight, leader = self._join(key, loop)
+            if leader:
+                # Its own task, so the leader's client going away doesn't cancel the others
+                flight.future = asyncio.ensure_future(fn(*args))
+                flight.future.add_done_callback(lambda future: self._finish(key, flight, _error(future)))
+        return await asyncio.shield(flight.future)
+
+    def stats(self):
+        with self._lock:
+            inflight = sum(1 for flight in self._flights.values() if flight.finished_at is None)
+            executed, joined, cached, errors = self._executed, self._joined, self._cached, self._errors
+        calls = executed + joined + cached
+        return {
+            'ttl': self.ttl,
+            'calls': calls,
+            'executed': executed,
+            'joined': joined,
+            'cached': cached,
+            'errors': errors,
+            'inflight': inflight,
+            # Share of calls that didn't do the work themselves
+            'hit_rate': round((joined + cached) / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,189 @@
+"""
+Background container stats collector.
+
+Keeps one streaming `stats` subscription per running container, driven by the
+inventory's container lifecycle, and stores the latest computed sample in a
+shared table so the stats endpoint never waits on the daemon.
+"""
+import threading
+import time
+
+import psutil
+
+from inventory import CONTAINER
+from utils import ERROR, debug_print
+
+
+def compute_container_stats(stats_dict, memory_fallback=None):
+    """Derive CPU/memory/network/block IO figures from a raw stats frame."""
+    # CPU stats with safety checks
+    cpu_stats = stats_dict.get('cpu_stats', {}) or {}
+    precpu_stats = stats_dict.get('precpu_stats', {}) or {}
+
+    cpu_usage = cpu_stats.get('cpu_usage', {}) or {}
+    precpu_usage = precpu_stats.get('cpu_usage', {}) or {}
+
+    cpu_delta = cpu_usage.get('total_usage', 0) - precpu_usage.get('total_usage', 0)
+    system_delta = cpu_stats.get('system_cpu_usage', 0) - precpu_stats.get('system_cpu_usage', 0)
+
+    # Get number of CPUs
+    online_cpus = cpu_stats.get('online_cpus', 1)
+    if not online_cpus:
+        online_cpus = 1
+
+    # Calculate CPU percentage
+    cpu_percentage = 0.0
+    if system_delta > 0:
+        cpu_percentage = (cpu_delta / system_delta) * 100.0 * online_cpus
+
+    # Memory stats with safety checks
+    memory_stats = stats_dict.get('memory_stats', {}) or {}
+    memory_usage = memory_stats.get('usage', 0)
+    if memory_usage is None:
+        memory_usage = 0
+
+    memory_limit = memory_stats.get('limit', 0)
+    if memory_limit is None or memory_limit == 0:
+        # Fallback to system total memory
+        memory_limit = memory_fallback or psutil.virtual_memory().total
+
+    memory_percentage = 0.0
+    if memory_limit > 0:
+        memory_percentage = (memory_usage / memory_limit) * 100.0
+
+    # Network stats with safety checks
+    network_stats = stats_dict.get('networks', {}) or {}
+    rx_bytes = sum(interface.get('rx_bytes', 0) or 0 for interface in network_stats.values())
+    tx_bytes = sum(interface.get('tx_bytes', 0) or 0 for interface in network_stats.values())
+
+    # Block IO stats with safety checks
+    blkio_stats = stats_dict.get('blkio_stats', {}) or {}
+    io_service_bytes = blkio_stats.get('io_service_bytes_recursive', []) or []
+    read_bytes = sum(stat.get('value', 0) for stat in io_service_bytes if stat.get('op', '').lower() == 'read')
+    write_bytes = sum(stat.get('value', 0) for stat in io_service_bytes if stat.get('op', '').lower() == 'write')
+
+    return {
+        'cpu_percentage': round(cpu_percentage, 2),
+        'memory_usage': int(memory_usage),
+        'memory_limit': int(memory_limit),
+        'memory_percentage': round(memory_percentage, 2),
+        'network_rx': int(rx_bytes),
+        'network_tx': int(tx_bytes),
+        'block_read': int(read_bytes),
+        'block_write': int(write_bytes),
+    }
+
+
+def empty_container_stats():
+    """Placeholder sample for containers without a reading yet."""
+    return {
+        'cpu_percentage': 0.0,
+        'memory_usage': 0,
+        'memory_limit': psutil.virtual_memory().total,
+        'memory_percentage': 0.0,
+        'network_rx': 0,
+        'network_tx': 0,
+        'block_read': 0,
+        'block_write': 0,
+    }
+
+
+class StatsCollector:
+    def __init__(self, client, inventory):
+        self.client = client
+        self.inventory = inventory
+        self._lock = threading.Lock()
+        self._latest = {}
+        # container id -> stop event of its streaming thread
+        self._streams = {}
+        self._memory_total = psutil.virtual_memory().total
+        self._running = False
+        self._listeners = []
+
+    def start(self):
+        self._running = True
+        self.inventory.add_listener(self._on_inventory_change)
+        # Containers the inventory already knows about; later ones arrive via the listener
+        for key, attrs in self.inventory.snapshot(CONTAINER).items():
+            self._on_inventory_change(CONTAINER, 'update', key, attrs)
+
+    def stop(self):
+        self._running = False
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stop_event in streams:
+            stop_event.set()
+
+    def add_listener(self, callback):
+        """Register callback(container_id, sample) for every new sample."""
+        self._listeners.append(callback)
+
+    def latest(self, container_id):
+        with self._lock:
+            return self._latest.get(container_id)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._latest)
+
+    def _on_inventory_change(self, kind, action, key, attrs):
+        if kind != CONTAINER or not self._running:
+            return
+        running = attrs is not None and attrs.get('State', {}).get('Running', False)
+        if running:
+            self._ensure_stream(key)
+        else:
+            self._stop_stream(key)
+
+    def _ensure_stream(self, container_id):
+        with self._lock:
+            if container_id in self._streams:
+                return
+            stop_event = threading.Event()
+            self._streams[container_id] = stop_event
+        threading.Thread(
+            target=self._follow,
+            args=(container_id, stop_event),
+            name=f"stats-{container_id[:12]}",
+            daemon=True,
+        ).start()
+
+    def _stop_stream(self, container_id):
+        with self._lock:
+            stop_event = self._streams.pop(container_id, None)
+            self._latest.pop(container_id, None)
+        if stop_event is not None:
+            stop_event.set()
+
+    def _follow(self, container_id, stop_event):
+        backoff = 1
+        while not stop_event.is_set():
+            try:
+                stream = self.client.api.stats(container_id, stream=True, decode=True)
+                try:
+                    for frame in stream:
+                        if stop_event.is_set():
+                            break
+                        sample = compute_container_stats(frame, self._memory_total)
+                        sample['timestamp'] = time.time()
+                        with self._lock:
+                            if container_id not in self._streams:
+                                break
+                            self._latest[container_id] = sample
+                        for callback in self._listeners:
+                            try:
+                                callback(container_id, sample)
+                            except Exception as e:
+                                debug_print(f"Error in stats listener: {str(e)}", ERROR)
+                        backoff = 1
+                finally:
+                    stream.close()
+            except Exception as e:
+                debug_print(f"Error streaming stats for container {container_id[:12]}: {str(e)}", ERROR)
+
+            # The daemon ends the stream when the container stops; the
+            # inventory listener then stops us. Otherwise reconnect.
+            if stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, 30)
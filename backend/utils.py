@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import sys
+import time
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+logger = logging.getLogger('dockeranium')
+
+
+class _Formatter(logging.Formatter):
+    # LOG_FORMAT=json emits one object per line with the extra fields inline
+    def __init__(self, as_json):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.as_json:
+            return json.dumps({
+                'time': round(record.created, 3),
+                'level': record.levelname.lower(),
+                'message': record.getMessage(),
+                **fields,
+            }, default=str)
+        message = record.getMessage()
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))} {record.levelname} {message}"
+
+
+def configure_logging():
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_Formatter(os.environ.get('LOG_FORMAT', 'text').lower() == 'json'))
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    logger.setLevel(level if level in logging._nameToLevel else 'INFO')
+
+
+configure_logging()
+
+
+def debug_print(message, level=INFO, **fields):
+    # Goes to stdout, which shows in docker logs; below LOG_LEVEL it's dropped
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': fields})
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        debug_print(f"Invalid integer for {name}: {value!r}, using {default}", WARNING)
+        return default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        debug_print(f"Invalid number for {name}: {value!r}, using {default}", WARNING)
+        return default
@@ -35,7 +35,6 @@ export default function PortsPage() {
       const response = await fetch(`${API_URL}/api/ports/`)
       if (!response.ok) throw new Error('Failed to fetch ports')
       const data = await response.json()
-      console.log('Ports data:', data)
       setPorts(data)
     } catch (err) {
       console.error('Error fetching ports:', err)